@@ -7,6 +7,7 @@ from .models import User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ("email", "full_name", "is_active", "date_joined")
+    list_display = ("email", "full_name", "is_active", "is_agency", "date_joined")
+    list_filter = ("is_agency", "is_staff", "is_active")
     search_fields = ("email", "full_name", "phone_number")
     ordering = ("-date_joined",)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:40
+
+from django.db import migrations, models
+
+
+def backfill_active_ads_count(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    Ad = apps.get_model("ads", "Ad")
+    counts = (
+        Ad.objects.filter(status="APPROVED", is_active=True)
+        .values("owner")
+        .annotate(total=models.Count("pk"))
+        .order_by()
+    )
+    for row in counts:
+        User.objects.filter(pk=row["owner"]).update(active_ads_count=row["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_alter_user_groups_alter_user_id_and_more"),
+        ("ads", "0002_rename_ads_ad_status_idx_ads_ad_status_eb9ea6_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="active_ads_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Approved and active ads owned by the user"
+            ),
+        ),
+        migrations.RunPython(backfill_active_ads_count, migrations.RunPython.noop),
+    ]
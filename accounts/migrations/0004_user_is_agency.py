@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_user_active_ads_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="is_agency",
+            field=models.BooleanField(default=False, help_text="Verified agency partner allowed to bulk import ads"),
+        ),
+    ]
@@ -43,6 +43,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
+    active_ads_count = models.PositiveIntegerField(
+        default=0, help_text="Approved and active ads owned by the user"
+    )
+    is_agency = models.BooleanField(
+        default=False, help_text="Verified agency partner allowed to bulk import ads"
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["full_name"]
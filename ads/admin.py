@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from django.contrib import admin
 
-from .models import Ad, AdImage, Amenity
+from .models import Ad, AdImage, AdStats, Amenity
 
 
 class AdImageInline(admin.TabularInline):
@@ -26,5 +26,17 @@ class AmenityAdmin(admin.ModelAdmin):
 
 @admin.register(AdImage)
 class AdImageAdmin(admin.ModelAdmin):
-    list_display = ("ad", "order", "created_at")
+    list_display = ("ad", "order", "variants_status", "created_at")
+    list_filter = ("variants_status",)
     search_fields = ("ad__title",)
+
+
+@admin.register(AdStats)
+class AdStatsAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "available", "pending", "rented", "rent_median", "updated_at")
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
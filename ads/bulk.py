@@ -0,0 +1,296 @@
+"""Bulk ad import and export for agency partners.
+
+Imports accept JSONL (one object per line) or CSV (a header row, amenities
+separated by ``|``). Rows are validated with ``AdImportSerializer`` in
+batches of ``BATCH_SIZE``: amenities are resolved once per upload, duplicate
+titles are checked with one query per batch, and valid rows are written with
+``bulk_create`` for the ads and their amenity links. The signal-driven side
+effects (slug, geohash, stats, search index, response cache) are applied in
+bulk. Invalid rows are skipped and reported by their 1-based row number.
+
+Exports stream a user's ads as JSONL or CSV with the import columns plus
+``id``, ``status`` and ``created_at``, so an export can be edited and
+re-imported. The staff inventory export streams ``values()`` rows of every
+ad with owner, amenities and image count for analytics, through the
+``/api/ads/export/`` endpoint or the ``export_ads`` command.
+
+Django buffers a sync iterator in full before an ASGI server sends it, so
+under ASGI the export views wrap the lines in :func:`aiter_lines`, which
+produces them batch by batch in a worker thread; under WSGI the sync
+iterator streams as is.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from collections import defaultdict
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save
+from rest_framework import serializers
+
+from .cache import bump_version
+from .models import Ad, AdStatus, Amenity
+from .search import get_search_backend
+from .serializers import AdImportSerializer
+from .stats import add_ads
+
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+MAX_IMPORT_ROWS = 1000
+MAX_IMPORT_BYTES = 5 * 1024 * 1024
+BATCH_SIZE = 200
+AMENITY_SEPARATOR = "|"
+IMPORT_FIELDS = tuple(AdImportSerializer.Meta.fields)
+EXPORT_FIELDS = ("id", "status", "created_at", *IMPORT_FIELDS)
+INVENTORY_AD_FIELDS = (
+    "id",
+    "slug",
+    "status",
+    "is_active",
+    "title",
+    "property_type",
+    "monthly_rent",
+    "bedrooms",
+    "bathrooms",
+    "area_m2",
+    "address",
+    "latitude",
+    "longitude",
+    "geohash",
+    "contact_name",
+    "contact_phone",
+    "created_at",
+    "updated_at",
+    "owner_id",
+)
+INVENTORY_FIELDS = (*INVENTORY_AD_FIELDS, "owner_email", "owner_name", "amenities", "image_count")
+INVENTORY_CHUNK_SIZE = 2000
+
+
+class BulkImportError(ValueError):
+    """The upload as a whole cannot be imported."""
+
+
+def detect_format(upload) -> str:
+    name = (getattr(upload, "name", "") or "").lower()
+    if name.endswith(".csv") or getattr(upload, "content_type", "") == "text/csv":
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise BulkImportError("Upload a .csv or .jsonl file.")
+
+
+def _lines(upload) -> Iterator[str]:
+    """Decode ``upload`` line by line so errors can name the line."""
+    for number, line in enumerate(upload, start=1):
+        try:
+            yield line.decode("utf-8-sig" if number == 1 else "utf-8")
+        except UnicodeDecodeError:
+            raise BulkImportError(f"Line {number} is not valid UTF-8 text.") from None
+
+
+def read_rows(upload, file_format: str) -> Iterator[dict | str]:
+    """Yield each record as a dict, or an error message for unreadable lines.
+
+    Raises :class:`BulkImportError` for text that is not UTF-8 or CSV that
+    cannot be parsed.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(_lines(upload))
+        try:
+            for row in reader:
+                # Empty cells mean "not given" so optional fields keep their defaults.
+                row = {key: value for key, value in row.items() if key and value not in ("", None)}
+                if "amenities" in row:
+                    row["amenities"] = [a.strip() for a in row["amenities"].split(AMENITY_SEPARATOR) if a.strip()]
+                yield row
+        except csv.Error as exc:
+            raise BulkImportError(f"Line {reader.line_num + 1}: {exc}.") from None
+        return
+    for line in _lines(upload):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            yield "Invalid JSON."
+            continue
+        yield row if isinstance(row, dict) else "Each line must be a JSON object."
+
+
+def _batches(rows: Iterator, size: int) -> Iterator[list]:
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def import_ads(user, upload) -> dict:
+    """Create pending ads for ``user`` from an uploaded file.
+
+    Raises :class:`BulkImportError`, creating nothing, when the file is too
+    large, too long or in an unknown format. Returns
+    ``{"created": [ids], "errors": [{"row": n, "errors": {...}}]}``.
+    """
+    if upload.size > MAX_IMPORT_BYTES:
+        raise BulkImportError(f"Files are limited to {MAX_IMPORT_BYTES // (1024 * 1024)} MB.")
+    rows = enumerate(read_rows(upload, detect_format(upload)), start=1)
+    amenity_ids = {}
+    for pk, slug in Amenity.objects.values_list("pk", "slug"):
+        amenity_ids[str(pk)] = amenity_ids[slug] = pk
+    serializer = AdImportSerializer(context={"amenity_ids": amenity_ids})
+    defaults = {
+        "contact_name": user.full_name,
+        "contact_phone": user.phone_number or "",
+    }
+    seen_titles: set[str] = set()
+    created: list[Ad] = []
+    errors: list[dict] = []
+    with transaction.atomic():
+        for batch in _batches(rows, BATCH_SIZE):
+            if batch[-1][0] > MAX_IMPORT_ROWS:
+                raise BulkImportError(f"Imports are limited to {MAX_IMPORT_ROWS} rows.")
+            valid = []
+            for number, row in batch:
+                if isinstance(row, str):
+                    errors.append({"row": number, "errors": {"non_field_errors": [row]}})
+                    continue
+                try:
+                    valid.append((number, serializer.run_validation(row)))
+                except serializers.ValidationError as exc:
+                    errors.append({"row": number, "errors": exc.detail})
+            created.extend(_create_batch(user, valid, defaults, seen_titles, errors))
+        _after_create(created)
+    errors.sort(key=lambda error: error["row"])
+    return {"created": [ad.pk for ad in created], "errors": errors}
+
+
+def _create_batch(user, valid: list, defaults: dict, seen_titles: set, errors: list) -> list[Ad]:
+    titles = {data["title"] for _, data in valid}
+    taken = set(
+        Ad.objects.filter(
+            owner=user,
+            title__in=titles,
+            status__in=[AdStatus.PENDING, AdStatus.APPROVED],
+        ).values_list("title", flat=True)
+    )
+    ads, amenities = [], []
+    for number, data in valid:
+        if data["title"] in taken or data["title"] in seen_titles:
+            errors.append(
+                {"row": number, "errors": {"title": ["You already have an active ad with this title."]}}
+            )
+            continue
+        seen_titles.add(data["title"])
+        amenities.append(data.pop("amenities", []))
+        for field, value in defaults.items():
+            data[field] = data.get(field) or value
+        ad = Ad(owner=user, status=AdStatus.PENDING, **data)
+        # bulk_create skips signals; fill the slug and geohash like a save would.
+        pre_save.send(sender=Ad, instance=ad, raw=False, using=Ad.objects.db, update_fields=None)
+        ads.append(ad)
+    Ad.objects.bulk_create(ads)
+    Through = Ad.amenities.through
+    Through.objects.bulk_create(
+        [
+            Through(ad_id=ad.pk, amenity_id=amenity_id)
+            for ad, amenity_list in zip(ads, amenities)
+            for amenity_id in set(amenity_list)
+        ]
+    )
+    return ads
+
+
+def _after_create(ads: list[Ad]) -> None:
+    if not ads:
+        return
+    add_ads(ads)
+    get_search_backend().index_many(ads)
+    transaction.on_commit(bump_version)
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the line for streaming."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return AMENITY_SEPARATOR.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def serialize_rows(rows: Iterator[dict], fields: tuple[str, ...], file_format: str) -> Iterator[str]:
+    """Yield ``rows`` as CSV (with a header) or JSONL lines."""
+    if file_format == "jsonl":
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+        return
+    writer = csv.DictWriter(_Echo(), fieldnames=fields)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow({key: _csv_value(value) for key, value in row.items()})
+
+
+def export_rows(queryset) -> Iterator[dict]:
+    ads = queryset.prefetch_related("amenities").order_by("pk")
+    for ad in ads.iterator(chunk_size=500):
+        row = {field: getattr(ad, field) for field in EXPORT_FIELDS if field != "amenities"}
+        row["contact_phone"] = str(ad.contact_phone or "")
+        row["amenities"] = [amenity.slug for amenity in ad.amenities.all()]
+        yield row
+
+
+def export_ads(queryset, file_format: str) -> Iterator[str]:
+    """Yield the ads in ``queryset`` as CSV or JSONL lines in the import format."""
+    return serialize_rows(export_rows(queryset), EXPORT_FIELDS, file_format)
+
+
+def inventory_rows(queryset, chunk_size: int = INVENTORY_CHUNK_SIZE) -> Iterator[dict]:
+    """Yield ``values()`` rows of ``queryset`` with owner, amenities and image count.
+
+    Rows are read with ``iterator()`` and amenity slugs are fetched with one
+    query per chunk, so memory stays flat however many ads are exported.
+    """
+    rows = (
+        queryset.order_by("pk")
+        .values(
+            *INVENTORY_AD_FIELDS,
+            "image_count",
+            owner_email=F("owner__email"),
+            owner_name=F("owner__full_name"),
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    slugs = dict(Amenity.objects.values_list("pk", "slug"))
+    Through = Ad.amenities.through
+    for chunk in _batches(rows, chunk_size):
+        amenities = defaultdict(list)
+        links = Through.objects.filter(ad_id__in=[row["id"] for row in chunk]).order_by("amenity_id")
+        for ad_id, amenity_id in links.values_list("ad_id", "amenity_id"):
+            amenities[ad_id].append(slugs.get(amenity_id, str(amenity_id)))
+        for row in chunk:
+            row["contact_phone"] = str(row["contact_phone"] or "")
+            row["amenities"] = amenities.get(row["id"], [])
+            yield {field: row[field] for field in INVENTORY_FIELDS}
+
+
+def export_inventory(queryset, file_format: str) -> Iterator[str]:
+    """Yield every ad in ``queryset`` as CSV or JSONL lines for staff analytics."""
+    return serialize_rows(inventory_rows(queryset), INVENTORY_FIELDS, file_format)
+
+
+async def aiter_lines(lines: Iterator[str], batch_size: int = INVENTORY_CHUNK_SIZE) -> AsyncIterator[str]:
+    """Yield ``lines`` joined in batches of ``batch_size``, each read in a worker thread."""
+    # Thread sensitive, so every batch runs on the thread holding the query cursor.
+    take = sync_to_async(lambda: "".join(islice(lines, batch_size)))
+    while chunk := await take():
+        yield chunk
@@ -0,0 +1,144 @@
+"""Response cache for public read endpoints.
+
+Responses are cached per endpoint, normalized URL and viewer class
+(anonymous, staff, or a specific signed-in user, whose listings include their
+own pending ads). Every key embeds a global version number that is bumped
+whenever an ``Ad``, ``AdImage`` or ``Amenity`` changes, which invalidates all
+cached responses at once without having to track individual keys.
+
+Configured through ``settings.ADS_RESPONSE_CACHE``::
+
+    {"TIMEOUT": 60, "BYPASS": ["ad-stats"]}
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+VERSION_KEY = "ads:response-cache:version"
+METRICS_KEY = "ads:response-cache:metrics:{endpoint}:{outcome}"
+CACHE_HEADER = "X-Cache"
+DEFAULT_TIMEOUT = 60
+ENDPOINTS = ("ad-list", "ad-detail", "ad-stats", "amenity-list", "amenity-detail")
+
+
+def cache_settings() -> dict:
+    return getattr(settings, "ADS_RESPONSE_CACHE", {})
+
+
+def is_bypassed(endpoint: str) -> bool:
+    config = cache_settings()
+    return not config.get("ENABLED", True) or endpoint in config.get("BYPASS", ())
+
+
+def get_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version() -> None:
+    """Invalidate every cached response."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def viewer_class(request) -> str:
+    user = request.user
+    if not user.is_authenticated:
+        return "anon"
+    if user.is_staff:
+        return "staff"
+    return f"user-{user.pk}"
+
+
+def cache_key(endpoint: str, request) -> str:
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    url = f"{request.get_host()}{request.path}?{urlencode(params)}"
+    digest = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    return f"ads:response-cache:{get_version()}:{endpoint}:{viewer_class(request)}:{digest}"
+
+
+def record(endpoint: str, outcome: str) -> None:
+    key = METRICS_KEY.format(endpoint=endpoint, outcome=outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:  # pragma: no cover - evicted between add and incr
+            cache.set(key, 1, timeout=None)
+
+
+def metrics(endpoints=ENDPOINTS) -> dict[str, dict[str, int]]:
+    """Return hit/miss counters per endpoint."""
+    keys = {
+        (endpoint, outcome): METRICS_KEY.format(endpoint=endpoint, outcome=outcome)
+        for endpoint in endpoints
+        for outcome in ("hit", "miss")
+    }
+    values = cache.get_many(keys.values())
+    result: dict[str, dict[str, int]] = {}
+    for (endpoint, outcome), key in keys.items():
+        result.setdefault(endpoint, {})[outcome] = values.get(key, 0)
+    return result
+
+
+def _lookup(endpoint: str, request) -> tuple[str, dict | None]:
+    """Return the cache key and the cached body, recording the hit or miss."""
+    key = cache_key(endpoint, request)
+    data = cache.get(key)
+    record(endpoint, "miss" if data is None else "hit")
+    return key, data
+
+
+def _store(key: str, response: Response) -> Response:
+    if response.status_code == 200:
+        timeout = cache_settings().get("TIMEOUT", DEFAULT_TIMEOUT)
+        cache.set(key, response.data, timeout)
+    response[CACHE_HEADER] = "MISS"
+    return response
+
+
+def cache_response(endpoint: str):
+    """Cache successful GET responses of a viewset action, sync or ``async def``."""
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(self, request, *args, **kwargs):
+                if request.method != "GET" or is_bypassed(endpoint):
+                    return await func(self, request, *args, **kwargs)
+                key, data = await sync_to_async(_lookup)(endpoint, request)
+                if data is not None:
+                    return Response(data, headers={CACHE_HEADER: "HIT"})
+                response = await func(self, request, *args, **kwargs)
+                return await sync_to_async(_store)(key, response)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != "GET" or is_bypassed(endpoint):
+                return func(self, request, *args, **kwargs)
+            key, data = _lookup(endpoint, request)
+            if data is not None:
+                return Response(data, headers={CACHE_HEADER: "HIT"})
+            return _store(key, func(self, request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
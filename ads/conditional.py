@@ -0,0 +1,143 @@
+"""ETag / Last-Modified handling for read endpoints.
+
+Validators are computed from a single aggregate query over the queryset the
+endpoint would serialize (``MAX(updated_at)`` and ``COUNT(*)``), combined with
+the request URL, the viewer class and the response cache version, so a
+matching ``If-None-Match``/``If-Modified-Since`` is answered with ``304``
+before anything is serialized. The validators are kept in the response cache
+under the same versioned key scheme, so repeated requests skip the aggregate
+too.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import DEFAULT_TIMEOUT, cache_key, cache_settings, get_version, viewer_class
+
+
+def compute_validators(queryset, request, timestamp_field: str | None = "updated_at"):
+    """Return ``(etag, last_modified)`` for ``queryset`` or ``(None, None)`` if empty.
+
+    Without a ``timestamp_field`` the rows themselves are fingerprinted, which
+    is only meant for small lookup tables such as amenities.
+    """
+    queryset = queryset.order_by()
+    if timestamp_field:
+        agg = queryset.aggregate(last=Max(timestamp_field), count=Count("pk"))
+        if not agg["count"]:
+            return None, None
+        last_modified = agg["last"]
+        fingerprint = f"{agg['count']}:{last_modified.isoformat()}"
+    else:
+        rows = list(queryset.order_by("pk").values_list())
+        if not rows:
+            return None, None
+        last_modified = None
+        fingerprint = repr(rows)
+    source = ":".join(
+        [
+            str(get_version()),
+            viewer_class(request),
+            cache_key("etag", request),
+            fingerprint,
+        ]
+    )
+    digest = hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"', last_modified
+
+
+def cached_validators(queryset, request, timestamp_field: str | None = "updated_at"):
+    """:func:`compute_validators` memoized until the next ad or amenity change."""
+    config = cache_settings()
+    if not config.get("ENABLED", True):
+        return compute_validators(queryset, request, timestamp_field)
+    key = cache_key("validators", request)
+    validators = cache.get(key)
+    if validators is None:
+        validators = compute_validators(queryset, request, timestamp_field)
+        cache.set(key, validators, config.get("TIMEOUT", DEFAULT_TIMEOUT))
+    return validators
+
+
+def check_conditions(queryset_func, timestamp_field, view, request, *args, **kwargs):
+    """Return ``(headers, not_modified)``, or ``None`` when validators do not apply."""
+    try:
+        queryset = queryset_func(view, request, *args, **kwargs)
+    except ValueError:
+        return None
+    etag, last_modified = cached_validators(queryset, request, timestamp_field)
+    if etag is None:
+        return None
+    headers = {"ETag": etag}
+    timestamp = None
+    if last_modified is not None:
+        # HTTP dates have second precision.
+        timestamp = int(last_modified.timestamp())
+        headers["Last-Modified"] = http_date(timestamp)
+    not_modified = get_conditional_response(
+        request._request, etag=etag, last_modified=timestamp
+    ) is not None
+    return headers, not_modified
+
+
+def _with_validators(response: Response, headers: dict) -> Response:
+    if response.status_code == status.HTTP_200_OK:
+        for header, value in headers.items():
+            response[header] = value
+    return response
+
+
+def conditional_get(queryset_func, timestamp_field: str | None = "updated_at"):
+    """Answer conditional GETs with 304 and add validators to 200 responses.
+
+    ``queryset_func(view, request, *args, **kwargs)`` returns the queryset the
+    action renders; it may raise ``ValueError`` for invalid input, in which case
+    the action runs unconditionally and reports the error itself. Works on
+    sync and ``async def`` actions.
+    """
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(self, request, *args, **kwargs):
+                checked = None
+                if request.method in ("GET", "HEAD"):
+                    checked = await sync_to_async(check_conditions)(
+                        queryset_func, timestamp_field, self, request, *args, **kwargs
+                    )
+                if checked is None:
+                    return await func(self, request, *args, **kwargs)
+                headers, not_modified = checked
+                if not_modified:
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+                return _with_validators(await func(self, request, *args, **kwargs), headers)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            checked = None
+            if request.method in ("GET", "HEAD"):
+                checked = check_conditions(
+                    queryset_func, timestamp_field, self, request, *args, **kwargs
+                )
+            if checked is None:
+                return func(self, request, *args, **kwargs)
+            headers, not_modified = checked
+            if not_modified:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return _with_validators(func(self, request, *args, **kwargs), headers)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,278 @@
+"""Fast read serialization for ad feeds and chat history.
+
+``AdDetailSerializer(many=True)`` spends most of its time in DRF's per-field
+``to_representation`` calls, decimal quantization and the nested amenity and
+image serializers. :class:`AdRenderer` builds the same dicts directly, either
+from ``values()`` rows (see :meth:`AdRenderer.values` and
+:meth:`AdRenderer.attach_relations`) or from loaded ads and their prefetched
+relations. The paginated feeds read rows, see ``ads.fieldsets``; other
+``many=True`` reads go through the list serializers of ``AdDetailSerializer``
+and ``ChatMessageSerializer``. The golden tests compare the JSON output with
+the per-field serializers byte for byte.
+
+Decimals read from the database are already quantized to the field's decimal
+places, so only other values go through DRF's ``quantize``.
+"""
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+from .models import Ad, AdImage
+
+Row = dict[str, Any]
+
+# Relative file names that ``filepath_to_uri`` and ``urljoin`` pass through unchanged.
+SAFE_NAME = re.compile(r"(?:(?!\.\.?/)[\w.~!*()'-]+/)*(?!\.\.?$)[\w.~!*()'-]+", re.ASCII)
+
+OWNER_COLUMNS = ("owner__email", "owner__full_name", "owner__active_ads_count")
+IMAGE_COLUMNS = (
+    "id",
+    "image",
+    "thumbnail",
+    "medium",
+    "width",
+    "height",
+    "variants_status",
+    "order",
+    "created_at",
+)
+AMENITY_COLUMNS = ("id", "name", "slug")
+DECIMAL_FIELDS = frozenset({"area_m2", "latitude", "longitude"})
+# Converted ``Ad`` columns and annotations.
+ATTRIBUTE_FIELDS = DECIMAL_FIELDS | {"contact_phone", "is_active", "created_at", "updated_at", "distance_km"}
+COMPUTED_FIELDS = ATTRIBUTE_FIELDS | {"owner", "amenities", "images", "cover"}
+# ``Ad`` fields rendered as stored, ``None`` included.
+PLAIN_FIELDS = frozenset(
+    {
+        "id",
+        "slug",
+        "status",
+        "title",
+        "description",
+        "monthly_rent",
+        "property_type",
+        "bedrooms",
+        "bathrooms",
+        "address",
+        "contact_name",
+        "moderation_note",
+    }
+)
+
+
+def supported() -> bool:
+    """Whether the REST framework settings produce the output the renderers assume."""
+    return api_settings.DATETIME_FORMAT == ISO_8601 and api_settings.UPLOADED_FILES_USE_URL
+
+
+def datetime_renderer() -> Callable[[Any], str | None]:
+    """``DateTimeField.to_representation`` for ISO 8601 output in the current time zone."""
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def render(value) -> str | None:
+        if not value:
+            return None
+        if tz is not None:
+            value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+    return render
+
+
+def url_renderer(request) -> Callable[[Any], str | None]:
+    """``ImageField.to_representation`` for a stored file name or ``FieldFile``."""
+    storage = AdImage._meta.get_field("image").storage
+    absolute = request.build_absolute_uri if request is not None else None
+
+    def resolve(name: str) -> str:
+        url = storage.url(name)
+        return absolute(url) if absolute else url
+
+    # ``storage.url`` and ``build_absolute_uri`` leave names of URL-safe
+    # characters without dot segments as is, so those are appended to the
+    # common prefix instead of going through ``urljoin`` twice per file.
+    prefix = None
+    if isinstance(storage, FileSystemStorage):
+        probe = resolve("probe")
+        if probe.endswith("/probe"):
+            prefix = probe[: -len("probe")]
+
+    def render(value) -> str | None:
+        name = getattr(value, "name", value)
+        if not name:
+            return None
+        if prefix is not None and SAFE_NAME.fullmatch(name):
+            return prefix + name
+        return resolve(name)
+
+    return render
+
+
+def decimal_renderer(field: serializers.DecimalField) -> Callable[[Any], Any]:
+    """``field.to_representation`` that skips quantizing values already at its places."""
+    exponent = -field.decimal_places
+    coerce = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+
+    def render(value):
+        if value is None:
+            return None
+        if not isinstance(value, Decimal) or value.as_tuple().exponent != exponent:
+            return field.to_representation(value)
+        return f"{value:f}" if coerce else value
+
+    return render
+
+
+class AdRenderer:
+    """Render ads as ``serializer``, an ``AdDetailSerializer`` or one of its cards, does.
+
+    Rows are keyed by ``Ad`` attribute names (``owner_id``), plus
+    ``owner__*`` columns, the ``cover_image`` and ``distance_km`` annotations
+    and ``amenities``/``images`` lists of dicts for the fields rendered.
+    """
+
+    def __init__(self, serializer: serializers.Serializer) -> None:
+        declared = serializer.fields
+        self.fields = [*declared]
+        dt = datetime_renderer()
+        url = url_renderer(serializer.context.get("request"))
+
+        def owner(row: Row) -> dict:
+            return {
+                "id": str(row["owner_id"]),
+                "username": row["owner__email"],
+                "full_name": row["owner__full_name"],
+                "active_ads": row["owner__active_ads_count"],
+            }
+
+        def amenities(row: Row) -> list[dict]:
+            return [{key: amenity[key] for key in AMENITY_COLUMNS} for amenity in row["amenities"]]
+
+        def images(row: Row) -> list[dict]:
+            return [
+                {
+                    "id": image["id"],
+                    "image": url(image["image"]),
+                    "thumbnail": url(image["thumbnail"]),
+                    "medium": url(image["medium"]),
+                    "width": image["width"],
+                    "height": image["height"],
+                    "variants_status": image["variants_status"],
+                    "order": image["order"],
+                    "created_at": dt(image["created_at"]),
+                }
+                for image in row["images"]
+            ]
+
+        special: dict[str, Callable[[Row], Any]] = {
+            "owner": owner,
+            "amenities": amenities,
+            "images": images,
+            "contact_phone": lambda row: None if row["contact_phone"] is None else str(row["contact_phone"]),
+            "is_active": lambda row: None if row["is_active"] is None else bool(row["is_active"]),
+            "created_at": lambda row: dt(row["created_at"]),
+            "updated_at": lambda row: dt(row["updated_at"]),
+            "cover": lambda row: url(row["cover_image"]),
+            "distance_km": lambda row: round(row["distance_km"], 3),
+        }
+        for name in DECIMAL_FIELDS.intersection(declared):
+            render = decimal_renderer(declared[name])
+            special[name] = lambda row, name=name, render=render: render(row[name])
+        # ``None`` marks a column copied as is.
+        self.renderers = [(name, special.get(name)) for name in self.fields]
+        self.columns = {name for name in self.fields if name in PLAIN_FIELDS or name in ATTRIBUTE_FIELDS}
+
+    @staticmethod
+    def handles(fields: Iterable[str]) -> bool:
+        """Whether every field in ``fields`` has a fast renderer."""
+        return all(name in PLAIN_FIELDS or name in COMPUTED_FIELDS for name in fields)
+
+    def render(self, rows: Iterable[Row]) -> list[dict]:
+        out = []
+        renderers = self.renderers
+        for row in rows:
+            item = {}
+            for name, render in renderers:
+                item[name] = row[name] if render is None else render(row)
+            out.append(item)
+        return out
+
+    def render_instances(self, ads: Iterable[Ad]) -> list[dict]:
+        """Render loaded ads, reading relations from the prefetch and ``select_related`` caches."""
+        fields = set(self.fields)
+        rows = []
+        for ad in ads:
+            row = dict(ad.__dict__)
+            if not self.columns <= row.keys():
+                # Deferred columns, loaded as the serializers would.
+                row.update((name, getattr(ad, name)) for name in self.columns - row.keys())
+            if "owner" in fields:
+                owner = ad.owner
+                row.update(
+                    owner__email=owner.email,
+                    owner__full_name=owner.full_name,
+                    owner__active_ads_count=owner.active_ads_count,
+                )
+            if "amenities" in fields:
+                row["amenities"] = [vars(amenity) for amenity in ad.amenities.all()]
+            if "images" in fields:
+                row["images"] = [vars(image) for image in ad.images.all()]
+            if "cover" in fields and "cover_image" not in row:
+                image = min(ad.images.all(), key=lambda image: image.order, default=None)
+                row["cover_image"] = image and (image.thumbnail.name or image.image.name)
+            rows.append(row)
+        return self.render(rows)
+
+    def values(self, queryset, *extra: str):
+        """``values()`` rows of ``queryset`` with the columns the fields read, plus ``extra``.
+
+        ``amenities`` and ``images`` are filled by :meth:`attach_relations`.
+        """
+        columns = {"id", *extra}
+        for name in self.fields:
+            if name == "owner":
+                columns.update(("owner_id", *OWNER_COLUMNS))
+            elif name == "cover":
+                if "cover_image" not in queryset.query.annotations:
+                    queryset = queryset.with_cover()
+                columns.add("cover_image")
+            elif name not in ("amenities", "images"):
+                columns.add(name)
+        return queryset.prefetch_related(None).values(*columns)
+
+    def attach_relations(self, rows: list[Row]) -> list[Row]:
+        """Add ``amenities`` and ``images`` to ``rows`` with one query each."""
+        ids = [row["id"] for row in rows]
+        if "amenities" in self.fields:
+            amenities = defaultdict(list)
+            through = Ad.amenities.through.objects.filter(ad_id__in=ids).order_by("pk")
+            for link in through.values("ad_id", *(f"amenity__{column}" for column in AMENITY_COLUMNS)):
+                amenities[link["ad_id"]].append({column: link[f"amenity__{column}"] for column in AMENITY_COLUMNS})
+            for row in rows:
+                row["amenities"] = amenities[row["id"]]
+        if "images" in self.fields:
+            images = defaultdict(list)
+            for image in AdImage.objects.filter(ad_id__in=ids).order_by("pk").values("ad_id", *IMAGE_COLUMNS):
+                images[image["ad_id"]].append(image)
+            for row in rows:
+                row["images"] = images[row["id"]]
+        return rows
+
+
+def render_messages(rows: Iterable[Row]) -> list[dict]:
+    """Render chat messages as ``ChatMessageSerializer`` does, from rows or ``__dict__``."""
+    dt = datetime_renderer()
+    return [
+        {"id": row["id"], "sender": row["sender_id"], "content": row["content"], "created_at": dt(row["created_at"])}
+        for row in rows
+    ]
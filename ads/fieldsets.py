@@ -0,0 +1,114 @@
+"""Sparse fieldsets for the ad feeds.
+
+List endpoints render :class:`~ads.serializers.AdCardSerializer` cards.
+``?fields=title,monthly_rent`` replaces the card's default fields and
+``?expand=amenities,images`` adds to them; any field of the serializer can be
+named. :func:`feed_queryset` then loads only what those fields read: the
+columns go through ``only()`` and the owner join, the amenity and image
+prefetches and the cover subquery are added only when rendered.
+
+Paginated feeds go one step further when ``ads.fastpath`` renders every
+field: the page is read as ``values()`` rows, with amenities and images
+attached in one query each, so no ``Ad`` instances are built.
+"""
+from __future__ import annotations
+
+from asgiref.sync import sync_to_async
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+
+from . import fastpath
+
+# Always loaded: the primary key and the keyset pagination keys.
+BASE_COLUMNS = ("id", "created_at", "monthly_rent")
+OWNER_COLUMNS = ("owner", "owner__id", "owner__email", "owner__full_name", "owner__active_ads_count")
+# Serializer fields that are not plain ``Ad`` columns.
+COMPUTED_FIELDS = frozenset({"owner", "amenities", "images", "cover", "distance_km"})
+
+PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        OpenApiTypes.STR,
+        description="Comma-separated fields to return instead of the default card fields.",
+    ),
+    OpenApiParameter(
+        "expand",
+        OpenApiTypes.STR,
+        description="Comma-separated fields to add to the card, e.g. amenities,images,owner.",
+    ),
+]
+
+
+def _names(value: str | None) -> list[str]:
+    return [name for name in (value or "").replace(" ", "").split(",") if name]
+
+
+def requested_fields(params, serializer_class) -> list[str]:
+    """Return the fields of ``serializer_class`` selected by ``fields``/``expand`` in ``params``."""
+    available = serializer_class.Meta.fields
+    fields, expand = _names(params.get("fields")), _names(params.get("expand"))
+    unknown = [name for name in (*fields, *expand) if name not in available]
+    if unknown:
+        raise ValidationError({"fields": f"Unknown fields: {', '.join(unknown)}."})
+    wanted = {*(fields or serializer_class.default_fields), *expand}
+    return [name for name in available if name in wanted]
+
+
+def feed_queryset(queryset, fields: list[str]):
+    """Trim ``queryset`` to the columns and relations read by ``fields``."""
+    columns = [*BASE_COLUMNS, *(name for name in fields if name not in COMPUTED_FIELDS)]
+    if "owner" in fields:
+        queryset = queryset.select_related("owner")
+        columns += OWNER_COLUMNS
+    related = [name for name in ("amenities", "images") if name in fields]
+    if related:
+        queryset = queryset.prefetch_related(*related)
+    if "cover" in fields:
+        queryset = queryset.with_cover()
+    return queryset.only(*columns)
+
+
+class SparseFieldsMixin:
+    """Apply ``fields``/``expand`` to the serializer of the actions in ``sparse_actions``."""
+
+    sparse_actions: frozenset[str] = frozenset()
+
+    def sparse_fields(self) -> list[str] | None:
+        """Fields requested for this action, or ``None`` where fieldsets do not apply."""
+        if self.action not in self.sparse_actions:
+            return None
+        if not hasattr(self, "_sparse_fields"):
+            # Schema generation describes the defaults.
+            params = {} if getattr(self, "swagger_fake_view", False) else self.request.query_params
+            self._sparse_fields = requested_fields(params, self.get_serializer_class())
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.sparse_fields()
+        if fields is not None:
+            context["fields"] = fields
+        return context
+
+    def feed_renderer(self) -> fastpath.AdRenderer | None:
+        """Renderer for this action's cards when it can work from ``values()`` rows."""
+        fields = self.sparse_fields()
+        if fields is None or not fastpath.supported() or not fastpath.AdRenderer.handles(fields):
+            return None
+        return fastpath.AdRenderer(self.get_serializer())
+
+    def paginate_queryset(self, queryset):
+        renderer = self.feed_renderer()
+        if renderer is None:
+            return super().paginate_queryset(queryset)
+        page = super().paginate_queryset(renderer.values(queryset, *BASE_COLUMNS))
+        return page if page is None else renderer.attach_relations(page)
+
+    async def apaginate_queryset(self, queryset):
+        """:meth:`paginate_queryset` for ``AsyncReadMixin`` views."""
+        renderer = self.feed_renderer()
+        if renderer is None:
+            return await super().apaginate_queryset(queryset)
+        page = await super().apaginate_queryset(renderer.values(queryset, *BASE_COLUMNS))
+        return page if page is None else await sync_to_async(renderer.attach_relations)(page)
@@ -24,3 +24,13 @@ class AdFilter(django_filters.FilterSet):
             "bathrooms",
             "amenities",
         ]
+
+
+class StaffAdFilter(AdFilter):
+    """``AdFilter`` plus moderation and ownership fields for staff exports."""
+
+    created_after = django_filters.IsoDateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before = django_filters.IsoDateTimeFilter(field_name="created_at", lookup_expr="lt")
+
+    class Meta(AdFilter.Meta):
+        fields = AdFilter.Meta.fields + ["status", "is_active", "owner"]
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import math
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from django.db.models import (
+    Avg,
+    Count,
+    ExpressionWrapper,
+    FloatField,
+    Max,
+    Min,
+    Q,
+    QuerySet,
+    Value,
+)
+from django.db.models.functions import ASin, Cast, Cos, Floor, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Geohash length stored on ``Ad.geohash`` (cells of roughly 5 x 5 meters).
+GEOHASH_PRECISION = 9
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Sorts after every geohash character, used to turn a prefix into a range.
+_GEOHASH_UPPER = "{"
+
+# Zoom levels follow the web map convention (0 = whole world, ~18 = street).
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+# From this zoom level on individual ads are returned instead of clusters.
+CLUSTER_MAX_ZOOM = 15
+# Grid cells per 256px map tile along each axis.
+CELLS_PER_TILE = 4
+
+
+def parse_bbox(value: str | None) -> tuple[Decimal, Decimal, Decimal, Decimal] | None:
+    """Parse ``west,south,east,north`` into decimals.
+
+    Returns ``None`` when no value is given and raises ``ValueError`` on
+    malformed input.
+    """
+    if not value:
+        return None
+    try:
+        west, south, east, north = (Decimal(part) for part in value.split(","))
+    except (InvalidOperation, ValueError) as exc:
+        raise ValueError("Invalid bbox.") from exc
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError("Invalid bbox.")
+    return west, south, east, north
+
+
+def filter_bbox(qs: QuerySet, bbox: tuple[Decimal, Decimal, Decimal, Decimal] | None) -> QuerySet:
+    """Restrict ``qs`` to ads inside ``bbox``."""
+    if bbox is None:
+        return qs
+    west, south, east, north = bbox
+    return qs.filter(latitude__range=(south, north), longitude__range=(west, east))
+
+
+def cell_size(zoom: int) -> float:
+    """Return the grid cell edge in degrees for a zoom level."""
+    return 360.0 / (2**zoom * CELLS_PER_TILE)
+
+
+def cluster_queryset(qs: QuerySet, zoom: int) -> QuerySet:
+    """Group ``qs`` into grid cells in the database, one row per cell.
+
+    The grid is anchored at 0/0 so cells stay stable while the map is panned.
+    """
+    size = cell_size(zoom)
+    lat = Cast("latitude", FloatField())
+    lng = Cast("longitude", FloatField())
+    return (
+        qs.annotate(cell_x=Floor(lng / size), cell_y=Floor(lat / size))
+        .values("cell_x", "cell_y")
+        .annotate(
+            count=Count("id"),
+            center_lat=Avg(lat),
+            center_lng=Avg(lng),
+            min_price=Min("monthly_rent"),
+            max_price=Max("monthly_rent"),
+        )
+        .order_by("cell_y", "cell_x")
+    )
+
+
+def cluster_row(row: dict[str, Any]) -> dict[str, Any]:
+    """Turn a :func:`cluster_queryset` row into the cluster's count, centroid and price range."""
+    return {
+        "count": row["count"],
+        "latitude": round(row["center_lat"], 6),
+        "longitude": round(row["center_lng"], 6),
+        "min_price": row["min_price"],
+        "max_price": row["max_price"],
+    }
+
+
+def cluster_ads(qs: QuerySet, zoom: int) -> list[dict[str, Any]]:
+    """Aggregate ads into grid cells with their count, centroid and price range."""
+    return [cluster_row(row) for row in cluster_queryset(qs, zoom)]
+
+
+def encode_geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate pair as a geohash string."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        bounds, value = (lng_range, float(lng)) if even else (lat_range, float(lat))
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            bounds[0] = mid
+        else:
+            bits *= 2
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def geohash_cell_degrees(precision: int) -> tuple[float, float]:
+    """Return the ``(height, width)`` in degrees of a geohash cell."""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lng_bits
+
+
+def geohash_cover(lat: float, lng: float, radius_km: float) -> list[str]:
+    """Return geohash prefixes whose cells cover a circle.
+
+    Picks the finest precision whose cell is at least ``radius_km`` on each
+    side and returns the cell containing the center plus its eight
+    neighbours. An empty list means the radius is too large to narrow the
+    search by geohash.
+    """
+    lat_extent = min(abs(lat) + radius_km / KM_PER_DEGREE, 89.9)
+    km_per_lng_degree = KM_PER_DEGREE * math.cos(math.radians(lat_extent))
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        height, width = geohash_cell_degrees(candidate)
+        if height * KM_PER_DEGREE < radius_km or width * km_per_lng_degree < radius_km:
+            break
+        precision = candidate
+    if precision == 0:
+        return []
+
+    height, width = geohash_cell_degrees(precision)
+    prefixes = set()
+    for dy in (-1, 0, 1):
+        cell_lat = lat + dy * height
+        if not -90 <= cell_lat <= 90:
+            continue
+        for dx in (-1, 0, 1):
+            cell_lng = (lng + dx * width + 180) % 360 - 180
+            prefixes.add(encode_geohash(cell_lat, cell_lng, precision))
+    return sorted(prefixes)
+
+
+def filter_geohash_prefixes(qs: QuerySet, prefixes: list[str]) -> QuerySet:
+    """Restrict ``qs`` to the given geohash cells using index range scans."""
+    if not prefixes:
+        return qs
+    condition = Q()
+    for prefix in prefixes:
+        condition |= Q(geohash__gte=prefix, geohash__lt=prefix + _GEOHASH_UPPER)
+    return qs.filter(condition)
+
+
+def haversine_km(lat: float, lng: float) -> ExpressionWrapper:
+    """Database expression for the great-circle distance from a point in km."""
+    ad_lat = Radians(Cast("latitude", FloatField()))
+    ad_lng = Radians(Cast("longitude", FloatField()))
+    origin_lat = math.radians(lat)
+    half_dlat = (ad_lat - Value(origin_lat)) / 2
+    half_dlng = (ad_lng - Value(math.radians(lng))) / 2
+    a = Power(Sin(half_dlat), 2) + Value(math.cos(origin_lat)) * Cos(ad_lat) * Power(
+        Sin(half_dlng), 2
+    )
+    return ExpressionWrapper(
+        Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a)), output_field=FloatField()
+    )
+
+
+def within_radius(qs: QuerySet, lat: float, lng: float, radius_km: float) -> QuerySet:
+    """Return ads within ``radius_km`` annotated with and ordered by ``distance_km``."""
+    qs = filter_geohash_prefixes(qs, geohash_cover(lat, lng, radius_km))
+    return (
+        qs.annotate(distance_km=haversine_km(lat, lng))
+        .filter(distance_km__lte=radius_km)
+        .order_by("distance_km", "id")
+    )
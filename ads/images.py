@@ -0,0 +1,98 @@
+"""Background generation of resized image variants.
+
+Uploaded images are stored as-is and marked ``PENDING``; the
+``process_images`` management command picks them up, writes EXIF-free
+thumbnail and medium variants and records the original dimensions. The
+``AdImage`` table doubles as the job queue.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .models import AdImage, VariantStatus
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SIZES = {
+    "thumbnail": (320, 320),
+    "medium": (1024, 1024),
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+
+def variant_format() -> tuple[str, str]:
+    """Return the Pillow format and extension used for variants."""
+    if features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def render_variant(img: Image.Image, size: tuple[int, int], fmt: str) -> bytes:
+    """Downscale ``img`` to fit ``size`` and encode it without metadata."""
+    variant = img.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    if fmt == "JPEG" and variant.mode not in ("RGB", "L"):
+        variant = variant.convert("RGB")
+    elif variant.mode not in ("RGB", "RGBA", "L"):
+        variant = variant.convert("RGBA" if "transparency" in variant.info else "RGB")
+    buffer = io.BytesIO()
+    quality = WEBP_QUALITY if fmt == "WEBP" else JPEG_QUALITY
+    # Saving a fresh copy without ``exif=`` drops EXIF (GPS, device) data.
+    variant.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def process_image(ad_image: AdImage) -> None:
+    """Generate variants for one image and mark it ready."""
+    fmt, ext = variant_format()
+    stem = os.path.splitext(os.path.basename(ad_image.image.name))[0]
+    with ad_image.image.open("rb") as fh, Image.open(fh) as img:
+        img = ImageOps.exif_transpose(img)
+        ad_image.width, ad_image.height = img.size
+        for field, size in VARIANT_SIZES.items():
+            content = render_variant(img, size, fmt)
+            getattr(ad_image, field).save(f"{stem}_{field}.{ext}", ContentFile(content), save=False)
+    ad_image.variants_status = VariantStatus.READY
+    ad_image.save(update_fields=["thumbnail", "medium", "width", "height", "variants_status"])
+
+
+def process_pending_images(limit: int = 50) -> int:
+    """Process up to ``limit`` pending images and return how many were handled.
+
+    Each image is claimed in its own transaction with ``SKIP LOCKED`` where
+    the database supports it, so several workers can run side by side.
+    """
+    handled = 0
+    ids = list(
+        AdImage.objects.filter(variants_status=VariantStatus.PENDING)
+        .order_by("id")
+        .values_list("id", flat=True)[:limit]
+    )
+    for pk in ids:
+        with transaction.atomic():
+            qs = AdImage.objects.filter(pk=pk, variants_status=VariantStatus.PENDING)
+            if connection.features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            ad_image = qs.first()
+            if ad_image is None:
+                continue
+            try:
+                # Savepoint, so a failed write still leaves the claim usable below.
+                with transaction.atomic():
+                    process_image(ad_image)
+            except (OSError, UnidentifiedImageError, ValueError, Image.DecompressionBombError):
+                logger.exception("Failed to process image %s", pk)
+                AdImage.objects.filter(pk=pk).update(variants_status=VariantStatus.FAILED)
+            except Exception:
+                # Mark it failed too, or the image would be retried on every run.
+                logger.exception("Unexpected error processing image %s", pk)
+                AdImage.objects.filter(pk=pk).update(variants_status=VariantStatus.FAILED)
+        handled += 1
+    return handled
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+
+from ads.models import Ad, AdImage
+from chat.models import ChatMessage, ChatThread
+from uyqidir_backend.metrics import RequestMetrics
+
+# Replaces the default ``ad_post`` rate, which chat shares, while the
+# benchmark repeats requests as one user; the throttle itself still runs.
+BENCHMARK_THROTTLE_RATE = "1000000/s"
+
+
+class Command(BaseCommand):
+    """Benchmark the main read endpoints through the Django test client.
+
+    Runs against the configured database (seed it with
+    ``seed_benchmark_data``) with the response cache disabled and the
+    ``ad_post`` throttle rate raised to :data:`BENCHMARK_THROTTLE_RATE`, and reports
+    p50/p95 latency, query counts and peak traced memory per scenario.
+    ``--output`` saves the results as JSON and ``--compare`` prints the change
+    against an earlier results file.
+    """
+
+    help = "Benchmark API endpoints and optionally save the results as JSON."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--only", nargs="*", help="Run only these scenarios.")
+        parser.add_argument("--output", help="Write results to this JSON file.")
+        parser.add_argument("--compare", help="Earlier results file to compare against.")
+
+    def handle(self, *args, **options) -> None:
+        scenarios = self.scenarios()
+        if options["only"]:
+            unknown = set(options["only"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in options["only"]}
+
+        results = {}
+        self.stdout.write(
+            f"{'scenario':<18}{'p50 ms':>9}{'p95 ms':>9}{'db ms':>8}{'queries':>9}{'peak KiB':>10}"
+        )
+        with (
+            override_settings(ADS_RESPONSE_CACHE={"ENABLED": False}),
+            patch.dict(SimpleRateThrottle.THROTTLE_RATES, ad_post=BENCHMARK_THROTTLE_RATE),
+        ):
+            for name, (user, url) in scenarios.items():
+                client = APIClient(HTTP_HOST="localhost")
+                if user is not None:
+                    client.force_authenticate(user=user)
+                results[name] = self.measure(client, url, options["iterations"], options["warmup"])
+                row = results[name]
+                self.stdout.write(
+                    f"{name:<18}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['db_p50_ms']:>8.2f}"
+                    f"{row['queries']:>9}{row['peak_kib']:>10.0f}"
+                )
+
+        report = {"meta": self.meta(options), "results": results}
+        if options["output"]:
+            path = Path(options["output"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Saved {path}")
+        if options["compare"]:
+            self.compare(json.loads(Path(options["compare"]).read_text()), report)
+
+    def scenarios(self) -> dict:
+        ad = Ad.objects.publicly_active().order_by("-id").first()
+        thread = (
+            ChatThread.objects.annotate(total=Count("messages"))
+            .filter(total__gt=0)
+            .order_by("-total", "id")
+            .first()
+        )
+        if ad is None:
+            raise CommandError("No approved ads; run seed_benchmark_data first.")
+        lat, lng = float(ad.latitude or 41.3), float(ad.longitude or 69.25)
+        bbox = f"{lng - 0.05},{lat - 0.05},{lng + 0.05},{lat + 0.05}"
+        list_url = reverse("ad-list")
+        scenarios = {
+            "list": (None, list_url),
+            "list_deep_page": (None, f"{list_url}?page=200"),
+            "list_keyset": (None, f"{list_url}?cursor="),
+            "filter": (None, f"{list_url}?property_type=APARTMENT&min_price=2000000&max_price=9000000"),
+            "order_price": (None, f"{list_url}?ordering=monthly_rent"),
+            "search": (None, f"{list_url}?search=kvartira metro"),
+            "detail": (None, reverse("ad-detail", args=[ad.pk])),
+            "similar": (None, reverse("ad-similar", args=[ad.pk])),
+            "nearby": (None, f"{reverse('ad-nearby')}?lat={lat}&lng={lng}&radius_km=2"),
+            "locations_city": (None, f"{reverse('ad-locations')}?zoom=11"),
+            "locations_street": (None, f"{reverse('ad-locations')}?zoom=16&bbox={bbox}"),
+            "stats": (None, reverse("ad-stats")),
+            "amenities": (None, reverse("amenity-list")),
+        }
+        if thread is not None:
+            user = thread.participants.first()
+            scenarios["chat_threads"] = (user, reverse("chat-list"))
+            scenarios["chat_messages"] = (user, reverse("chat-messages", args=[thread.pk]))
+            last = ChatMessage.objects.filter(thread=thread).order_by("-id").values_list("id", flat=True).first()
+            scenarios["chat_poll"] = (user, f"{reverse('chat-messages', args=[thread.pk])}?after={last}")
+        return scenarios
+
+    def measure(self, client: APIClient, url: str, iterations: int, warmup: int) -> dict:
+        for _ in range(warmup):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+        samples = []
+        db_samples = []
+        for _ in range(iterations):
+            metrics = RequestMetrics()
+            with connection.execute_wrapper(metrics):
+                start = time.perf_counter()
+                response = client.get(url)
+                samples.append((time.perf_counter() - start) * 1000)
+            db_samples.append(metrics.db_ms)
+        # Traced separately: tracemalloc slows down the timed runs.
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        cuts = statistics.quantiles(samples, n=20, method="inclusive") if len(samples) > 1 else samples * 19
+        return {
+            "url": url,
+            "iterations": iterations,
+            "p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(cuts[18], 3),
+            "max_ms": round(max(samples), 3),
+            "db_p50_ms": round(statistics.median(db_samples), 3),
+            "queries": metrics.queries,
+            "response_bytes": len(response.content),
+            "peak_kib": round(peak / 1024, 1),
+        }
+
+    def meta(self, options) -> dict:
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "iterations": options["iterations"],
+            "rows": {
+                "ads": Ad.objects.count(),
+                "images": AdImage.objects.count(),
+                "threads": ChatThread.objects.count(),
+                "messages": ChatMessage.objects.count(),
+            },
+        }
+
+    def compare(self, before: dict, after: dict) -> None:
+        self.stdout.write(f"\n{'scenario':<18}{'p50 change':>12}{'p95 change':>12}{'queries':>12}")
+        for name, new in after["results"].items():
+            old = before.get("results", {}).get(name)
+            if old is None:
+                continue
+
+            def change(key: str) -> str:
+                return f"{(new[key] - old[key]) / old[key] * 100:+.0f}%" if old[key] else "n/a"
+
+            self.stdout.write(
+                f"{name:<18}{change('p50_ms'):>12}{change('p95_ms'):>12}"
+                f"{old['queries']:>6} -> {new['queries']:<3}"
+            )
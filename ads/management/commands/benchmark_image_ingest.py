@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import base64
+import io
+import multiprocessing
+import re
+import resource
+import tracemalloc
+import uuid
+from binascii import Error as BinasciiError
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+from rest_framework import serializers
+
+from ads.serializers import Base64ImageField
+
+
+class LegacyBase64ImageField(serializers.ImageField):
+    """The pre-streaming implementation, kept for comparison."""
+
+    def to_internal_value(self, data):
+        if data.startswith("data:image"):
+            header, data = data.split(";base64,", 1)
+        data = re.sub(r"\s", "", data)
+        missing_padding = len(data) % 4
+        if missing_padding:
+            data += "=" * (4 - missing_padding)
+        try:
+            decoded_file = base64.b64decode(data)
+        except (BinasciiError, ValueError) as exc:
+            raise serializers.ValidationError("Invalid image data") from exc
+        with Image.open(io.BytesIO(decoded_file)) as img:
+            file_extension = img.format.lower()
+        file_name = f"{uuid.uuid4().hex[:12]}.{file_extension}"
+        return super().to_internal_value(ContentFile(decoded_file, name=file_name))
+
+
+FIELDS = {"legacy": LegacyBase64ImageField, "streaming": Base64ImageField}
+
+
+def _ingest(field_name: str, payload: list[str], results) -> None:
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    field = FIELDS[field_name]()
+    files = [field.to_internal_value(item) for item in payload]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((field_name, len(files), peak, (rss_after - rss_before) * 1024))
+
+
+class Command(BaseCommand):
+    """Measure memory used to ingest a 10-image base64 create payload.
+
+    Each implementation runs in a forked child so peak RSS is measured in
+    isolation; traced Python allocations are reported as well.
+    """
+
+    help = "Compare peak memory of legacy and streaming base64 image decoding."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--images", type=int, default=10)
+        parser.add_argument("--side", type=int, default=1600, help="Image edge in px.")
+
+    def handle(self, *args, **options) -> None:
+        buffer = io.BytesIO()
+        Image.effect_noise((options["side"], options["side"]), 60).convert("RGB").save(
+            buffer, format="JPEG", quality=95
+        )
+        encoded = "data:image/jpeg;base64," + base64.encodebytes(buffer.getvalue()).decode()
+        payload = [encoded] * options["images"]
+        mb = 1024 * 1024
+        self.stdout.write(
+            f"{options['images']} images x {len(buffer.getvalue()) / mb:.1f} MB "
+            f"({len(encoded) * options['images'] / mb:.1f} MB base64)"
+        )
+        context = multiprocessing.get_context("fork")
+        for name in FIELDS:
+            results = context.Queue()
+            process = context.Process(target=_ingest, args=(name, payload, results))
+            process.start()
+            field_name, count, peak, rss = results.get()
+            process.join()
+            self.stdout.write(
+                f"{field_name:<10} traced peak {peak / mb:8.1f} MB   "
+                f"RSS growth {rss / mb:8.1f} MB   ({count} files)"
+            )
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from ads.models import Ad, AdStatus, PropertyType
+from ads.search import get_search_backend, search_terms
+
+WORDS = (
+    "kvartira uy hovli ofis studiya yangi ta'mirlangan keng yorug' metro "
+    "bozor maktab bog'cha chilonzor yunusobod mirzo ulug'bek sergeli yakkasaroy "
+    "квартира дом ремонт метро рядом центр просторная уютная новый двор"
+).split()
+QUERIES = ("kvartira", "metro", "yunusobod", "квартира ремонт", "ta'mirlangan uy", "zzz")
+
+
+class Command(BaseCommand):
+    """Compare the full-text backend with the old ``icontains`` search.
+
+    Seeds ads inside a transaction that is rolled back, so it is safe to run
+    against a development database.
+    """
+
+    help = "Benchmark ad search backends."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--ads", type=int, default=20_000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options) -> None:
+        with transaction.atomic():
+            self.seed(options["ads"])
+            backend = get_search_backend()
+            backend.rebuild()
+            self.stdout.write(f"{options['ads']} ads, backend {type(backend).__name__}")
+            self.stdout.write(f"{'query':<20}{'icontains ms':>14}{'backend ms':>12}{'hits':>8}")
+            for query in QUERIES:
+                legacy = self.time(lambda: self.legacy(query), options["repeat"])
+                terms = search_terms(query)
+                fts = self.time(
+                    lambda: list(
+                        backend.search(Ad.objects.all(), terms)
+                        .order_by("-search_rank")
+                        .values_list("id", flat=True)[:20]
+                    ),
+                    options["repeat"],
+                )
+                hits = backend.search(Ad.objects.all(), terms).count()
+                self.stdout.write(f"{query:<20}{legacy:>14.2f}{fts:>12.2f}{hits:>8}")
+            transaction.set_rollback(True)
+
+    def seed(self, count: int) -> None:
+        User = get_user_model()
+        owner = User.objects.create_user(
+            email="search-benchmark@example.com", full_name="Benchmark", password=None
+        )
+        rng = random.Random(42)
+        # Pseudo-words so keywords are as selective as in real listings.
+        filler = [
+            "".join(rng.choices("abdeghiklmnoprstuvxyz", k=rng.randint(3, 9)))
+            for _ in range(5000)
+        ]
+
+        def text(keywords: int, words: int) -> str:
+            return " ".join(rng.choices(WORDS, k=keywords) + rng.choices(filler, k=words))
+
+        ads = [
+            Ad(
+                owner=owner,
+                title=f"{text(1, 3)} #{i}",
+                description=text(3, 40),
+                address=text(1, 2),
+                monthly_rent=rng.randint(1_000_000, 20_000_000),
+                property_type=rng.choice(PropertyType.values),
+                area_m2=rng.randint(20, 200),
+                status=AdStatus.APPROVED,
+                slug=f"search-benchmark-{i}",
+            )
+            for i in range(count)
+        ]
+        Ad.objects.bulk_create(ads, batch_size=2000)
+
+    def legacy(self, query: str) -> list:
+        terms = query.split()
+        qs = Ad.objects.all()
+        for term in terms:
+            qs = qs.filter(
+                reduce(
+                    or_,
+                    [
+                        Q(**{f"{field}__icontains": term})
+                        for field in ("title", "description", "address")
+                    ],
+                )
+            )
+        return list(qs.order_by("-created_at").values_list("id", flat=True)[:20]) + [qs.count()]
+
+    def time(self, func, repeat: int) -> float:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIRequestFactory
+
+from ads.fieldsets import feed_queryset
+from ads.models import Ad
+from ads.serializers import AdCardSerializer, AdDetailSerializer
+from chat.models import ChatMessage
+from chat.serializers import ChatMessageSerializer
+
+
+class Command(BaseCommand):
+    """Compare DRF field-by-field serialization with ``ads.fastpath``.
+
+    For each row count, loads the latest ads (as feed cards and with every
+    detail field) and chat messages from the configured database, seeded with
+    ``seed_benchmark_data``, and reports the median time to:
+
+    * ``load``: fetch the model instances the views serialize,
+    * ``drf``: render them with the per-field serializers,
+    * ``fast``: render them with the list serializers' fast path.
+    """
+
+    help = "Benchmark read serialization of ads and chat messages."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--rows", type=int, nargs="*", default=[1000, 10000])
+        parser.add_argument("--iterations", type=int, default=5)
+        parser.add_argument("--output", help="Write results to this JSON file.")
+
+    def handle(self, *args, **options) -> None:
+        request = APIRequestFactory().get("/api/ads/", HTTP_HOST="localhost")
+        scenarios = {
+            "ad_cards": (AdCardSerializer, None),
+            "ad_detail": (AdDetailSerializer, [*AdDetailSerializer.Meta.fields]),
+            "chat_messages": (ChatMessageSerializer, None),
+        }
+        results: dict[str, dict] = {}
+        self.stdout.write(
+            f"{'scenario':<15}{'rows':>7}{'load ms':>9}{'drf ms':>9}{'fast ms':>9}{'fast x':>8}"
+        )
+        for name, (serializer_class, fields) in scenarios.items():
+            results[name] = {}
+            for rows in options["rows"]:
+                context = {"request": request, "fields": fields}
+                if serializer_class is ChatMessageSerializer:
+                    queryset = ChatMessage.objects.order_by("-id")[:rows]
+                else:
+                    queryset = feed_queryset(Ad.objects.order_by("-id"), fields or AdCardSerializer.default_fields)
+                    queryset = queryset[:rows]
+                loaded = list(queryset)
+                if len(loaded) < rows:
+                    raise CommandError(f"{name} needs {rows} rows, found {len(loaded)}; seed more data.")
+                serializer = serializer_class(loaded, many=True, context=context)
+                row = {
+                    "load_ms": self.time(lambda: list(queryset.all()), options["iterations"]),
+                    "drf_ms": self.time(
+                        lambda: ListSerializer.to_representation(serializer, loaded), options["iterations"]
+                    ),
+                    "fast_ms": self.time(lambda: serializer.to_representation(loaded), options["iterations"]),
+                }
+                row["fast_speedup"] = round(row["drf_ms"] / row["fast_ms"], 1)
+                results[name][rows] = row
+                self.stdout.write(
+                    f"{name:<15}{rows:>7}{row['load_ms']:>9.1f}{row['drf_ms']:>9.1f}{row['fast_ms']:>9.1f}"
+                    f"{row['fast_speedup']:>7.1f}x"
+                )
+
+        if options["output"]:
+            path = Path(options["output"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            report = {"meta": self.meta(options), "results": results}
+            path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Saved {path}")
+
+    def time(self, func, iterations: int) -> float:
+        """Median milliseconds of ``func()`` over ``iterations`` runs after one warmup."""
+        func()
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return round(statistics.median(timings), 2)
+
+    def meta(self, options) -> dict:
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "iterations": options["iterations"],
+        }
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from importlib.util import find_spec
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ads.management.commands.benchmark_api import BENCHMARK_THROTTLE_RATE
+from ads.models import Ad
+from chat.models import ChatThread
+
+SERVERS = {
+    # Thread-per-request sync views, the usual production WSGI setup.
+    "wsgi": lambda port, workers, threads: [
+        "gunicorn",
+        "uyqidir_backend.wsgi:application",
+        "--worker-class=gthread",
+        f"--workers={workers}",
+        f"--threads={threads}",
+        f"--bind=127.0.0.1:{port}",
+        "--log-level=warning",
+    ],
+    # Async views on the event loop, see uyqidir_backend/async_views.py.
+    "asgi": lambda port, workers, threads: [
+        "uvicorn",
+        "uyqidir_backend.asgi:application",
+        f"--workers={workers}",
+        f"--port={port}",
+        "--log-level=warning",
+        "--no-access-log",
+    ],
+}
+STARTUP_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    """Compare sync WSGI and async ASGI throughput under concurrent load.
+
+    Starts gunicorn (gthread workers) and uvicorn in turn against the
+    configured database, then keeps ``--concurrency`` keep-alive connections
+    busy on each read endpoint for ``--duration`` seconds and reports
+    requests per second and latency percentiles. The response cache is off so
+    every request reaches the database. Both servers must be installed
+    (``pip install gunicorn uvicorn``); seed data with ``seed_benchmark_data``.
+    """
+
+    help = "Benchmark read endpoints under WSGI and ASGI servers."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--servers", nargs="*", choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument("--only", nargs="*", help="Run only these scenarios.")
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario.")
+        parser.add_argument("--workers", type=int, default=1, help="Server processes.")
+        parser.add_argument("--threads", type=int, default=8, help="Threads per gunicorn worker.")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--output", help="Write results to this JSON file.")
+
+    def handle(self, *args, **options) -> None:
+        for name in options["servers"]:
+            if find_spec(SERVERS[name](0, 1, 1)[0]) is None:
+                raise CommandError(f"{SERVERS[name](0, 1, 1)[0]} is not installed.")
+        scenarios = self.scenarios()
+        if options["only"]:
+            unknown = set(options["only"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in options["only"]}
+
+        results: dict[str, dict] = {}
+        self.stdout.write(
+            f"{'server':<7}{'scenario':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+        )
+        for server in options["servers"]:
+            results[server] = {}
+            with self.serve(server, options):
+                for name, (path, headers) in scenarios.items():
+                    row = asyncio.run(
+                        self.load(options["port"], path, headers, options["concurrency"], options["duration"])
+                    )
+                    results[server][name] = row
+                    self.stdout.write(
+                        f"{server:<7}{name:<18}{row['rps']:>9.0f}{row['p50_ms']:>9.1f}"
+                        f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['errors']:>8}"
+                    )
+        if {"wsgi", "asgi"} <= set(results):
+            self.stdout.write(f"\n{'scenario':<18}{'asgi/wsgi req/s':>16}")
+            for name in scenarios:
+                wsgi, asgi = results["wsgi"][name]["rps"], results["asgi"][name]["rps"]
+                ratio = f"{asgi / wsgi:.2f}x" if wsgi else "n/a"
+                self.stdout.write(f"{name:<18}{ratio:>16}")
+
+        if options["output"]:
+            path = Path(options["output"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            report = {"meta": self.meta(options), "results": results}
+            path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Saved {path}")
+
+    def scenarios(self) -> dict[str, tuple[str, dict]]:
+        ad = Ad.objects.publicly_active().order_by("-id").first()
+        if ad is None:
+            raise CommandError("No approved ads; run seed_benchmark_data first.")
+        list_url = reverse("ad-list")
+        scenarios = {
+            "list": (list_url, {}),
+            "list_keyset": (f"{list_url}?cursor=", {}),
+            "filter": (f"{list_url}?property_type=APARTMENT&min_price=2000000&max_price=9000000", {}),
+            "detail": (reverse("ad-detail", args=[ad.pk]), {}),
+            "stats": (reverse("ad-stats"), {}),
+            "locations_city": (f"{reverse('ad-locations')}?zoom=11", {}),
+        }
+        thread = (
+            ChatThread.objects.annotate(total=Count("messages"))
+            .filter(total__gt=0)
+            .order_by("-total", "id")
+            .first()
+        )
+        if thread is not None:
+            token = AccessToken.for_user(thread.participants.first())
+            scenarios["chat_messages"] = (
+                reverse("chat-messages", args=[thread.pk]),
+                {"Authorization": f"Bearer {token}"},
+            )
+        return scenarios
+
+    def serve(self, server: str, options):
+        command = SERVERS[server](options["port"], options["workers"], options["threads"])
+        env = {
+            **os.environ,
+            "ADS_RESPONSE_CACHE_ENABLED": "False",
+            "DEBUG": "False",
+            "AD_POST_RATE": BENCHMARK_THROTTLE_RATE,
+        }
+        return _Server([sys.executable, "-m", *command], env, options["port"])
+
+    async def load(self, port: int, path: str, headers: dict, concurrency: int, duration: float) -> dict:
+        request = "".join(
+            [f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"]
+            + [f"{name}: {value}\r\n" for name, value in headers.items()]
+            + ["\r\n"]
+        ).encode()
+        latencies: list[float] = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def client() -> None:
+            nonlocal errors
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    writer.write(request)
+                    status = await _read_response(reader)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    errors += status != 200
+            finally:
+                writer.close()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+        return {
+            "path": path,
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(cuts[94], 2),
+            "p99_ms": round(cuts[98], 2),
+        }
+
+    def meta(self, options) -> dict:
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            **{key: options[key] for key in ("concurrency", "duration", "workers", "threads")},
+        }
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    """Read one HTTP/1.1 response and return its status code."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    fields = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        fields[name.strip().lower()] = value.strip()
+    if "content-length" in fields:
+        await reader.readexactly(int(fields["content-length"]))
+    elif fields.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).strip(), 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    return status
+
+
+class _Server:
+    """Run a server subprocess for the duration of a ``with`` block."""
+
+    def __init__(self, command: list[str], env: dict, port: int) -> None:
+        self.command, self.env, self.port = command, env, port
+
+    def __enter__(self) -> "_Server":
+        self.process = subprocess.Popen(self.command, env=self.env)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"{' '.join(self.command)} exited with {self.process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.process.terminate()
+        raise CommandError(f"{' '.join(self.command)} did not start within {STARTUP_TIMEOUT}s")
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from ads.cache import get_version, metrics
+
+
+class Command(BaseCommand):
+    """Print response cache hit/miss counters."""
+
+    help = "Show hit and miss counts of the ads response cache."
+
+    def handle(self, *args, **options) -> None:
+        self.stdout.write(f"cache version {get_version()}")
+        self.stdout.write(f"{'endpoint':<16}{'hits':>10}{'misses':>10}{'hit rate':>10}")
+        for endpoint, counts in metrics().items():
+            total = counts["hit"] + counts["miss"]
+            rate = f"{counts['hit'] / total:.0%}" if total else "-"
+            self.stdout.write(f"{endpoint:<16}{counts['hit']:>10}{counts['miss']:>10}{rate:>10}")
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import lzma
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from ads.bulk import export_inventory
+from ads.filters import StaffAdFilter
+from ads.models import Ad
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+class Command(BaseCommand):
+    """Write the staff ad inventory export to a file, compressed by its suffix.
+
+    ``--filter`` takes the ``/api/ads/export/`` query parameters, e.g.
+    ``--filter status=APPROVED --filter property_type=HOUSE``.
+    """
+
+    help = "Export every ad with owner, amenities and image count as CSV or JSONL."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("output", help="Target path; .gz, .bz2 and .xz are compressed, - is stdout.")
+        parser.add_argument("--format", dest="file_format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--filter", action="append", default=[], metavar="NAME=VALUE")
+
+    def handle(self, *args, **options) -> None:
+        params = QueryDict(mutable=True)
+        for item in options["filter"]:
+            name, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Filters look like name=value, got {item!r}.")
+            params.appendlist(name, value)
+        filterset = StaffAdFilter(params, queryset=Ad.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_text())
+
+        start = time.perf_counter()
+        lines = export_inventory(filterset.qs, options["file_format"])
+        path = options["output"]
+        if path == "-":
+            written = self.write(sys.stdout, lines)
+        else:
+            opener = next((op for suffix, op in OPENERS.items() if path.endswith(suffix)), open)
+            with opener(path, "wt", encoding="utf-8", newline="") as output:
+                written = self.write(output, lines)
+        rows = written - (options["file_format"] == "csv")
+        self.stderr.write(f"Exported {rows} ad(s) in {time.perf_counter() - start:.1f}s.")
+
+    @staticmethod
+    def write(output, lines) -> int:
+        written = 0
+        for line in lines:
+            output.write(line)
+            written += 1
+        return written
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads.images import process_pending_images
+
+
+class Command(BaseCommand):
+    """Worker that generates thumbnail and medium variants for ad images."""
+
+    help = "Process pending ad images into resized WebP/JPEG variants."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch", type=int, default=50)
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep polling for new images."
+        )
+        parser.add_argument("--interval", type=float, default=2.0)
+
+    def handle(self, *args, **options) -> None:
+        while True:
+            handled = process_pending_images(options["batch"])
+            if handled:
+                self.stdout.write(f"Processed {handled} image(s).")
+            if not options["loop"]:
+                break
+            if handled < options["batch"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from ads.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """Re-index all ads, e.g. after bulk inserts that bypass signals."""
+
+    help = "Rebuild the full-text search index for ads."
+
+    def handle(self, *args, **options) -> None:
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {count} ad(s) with {type(backend).__name__}.")
+        )
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from ads.models import recount_active_ads
+
+
+class Command(BaseCommand):
+    """Backfill or repair ``User.active_ads_count`` from the ads table."""
+
+    help = "Recompute each user's approved and active ad counter."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="users",
+            help="Only reconcile the given user ID (repeatable).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        updated = recount_active_ads(options["users"])
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} user counter(s)."))
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from ads.cache import bump_version
+from ads.stats import recompute_ad_stats
+
+
+class Command(BaseCommand):
+    """Backfill or repair the precomputed ``AdStats`` rows from the ads table."""
+
+    help = "Recompute the ad counts and rent percentiles served by /api/ads/stats/."
+
+    def handle(self, *args, **options) -> None:
+        updated = recompute_ad_stats()
+        if updated:
+            bump_version()
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} stats row(s)."))
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads.similarity import rebuild_similar_ads, refresh_similar_ads
+
+
+class Command(BaseCommand):
+    """Worker that keeps the precomputed similar-ads lists current."""
+
+    help = "Recompute similar-ads neighbor lists for queued ads."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch", type=int, default=100)
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep polling for queued ads."
+        )
+        parser.add_argument("--interval", type=float, default=5.0)
+        parser.add_argument(
+            "--rebuild", action="store_true", help="Recompute every list, e.g. after changing weights."
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["rebuild"]:
+            written = rebuild_similar_ads()
+            self.stdout.write(f"Rebuilt {written} neighbor list(s).")
+        # Feature matrices by property type, reused while they are current.
+        matrices = {}
+        while True:
+            handled = refresh_similar_ads(options["batch"], matrices)
+            if handled:
+                self.stdout.write(f"Refreshed {handled} queued ad(s).")
+            if not options["loop"]:
+                break
+            if handled < options["batch"]:
+                time.sleep(options["interval"])
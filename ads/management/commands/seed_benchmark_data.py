@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from ads.cache import bump_version
+from ads.geo import encode_geohash
+from ads.models import MAX_IMAGES, Ad, AdImage, AdStatus, Amenity, PropertyType, VariantStatus
+from ads.search import get_search_backend
+from ads.similarity import rebuild_similar_ads
+from ads.stats import recompute_ad_stats
+from chat.models import ChatMessage, ChatThread
+
+from .benchmark_search import WORDS
+
+EMAIL_DOMAIN = "bench.invalid"
+SLUG_PREFIX = "bench-"
+# Unusable password hash; hashing a real password per user would dominate seeding.
+UNUSABLE_PASSWORD = "!benchmark"
+AMENITIES = ("elevator", "parking", "wifi", "furniture", "balcony", "air-conditioner", "washer")
+# Roughly Tashkent.
+LAT_RANGE = (41.20, 41.40)
+LNG_RANGE = (69.10, 69.40)
+STATUS_WEIGHTS = {
+    AdStatus.APPROVED: 80,
+    AdStatus.PENDING: 10,
+    AdStatus.ARCHIVED: 5,
+    AdStatus.REJECTED: 5,
+}
+
+
+class Command(BaseCommand):
+    """Seed large volumes of users, ads, images and chat messages.
+
+    Rows are written with ``bulk_create`` in batches, bypassing per-row
+    signals; denormalized counters, ad stats, similar-ads lists, the search
+    index and chat thread pointers are filled in afterwards. Seeded rows are tagged
+    (``@bench.invalid`` users, ``bench-`` slugs) and ``--clear`` removes them.
+    Image rows point at a placeholder file instead of real uploads.
+    """
+
+    help = "Seed a large benchmark dataset."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--users", type=int, default=50_000)
+        parser.add_argument("--ads", type=int, default=100_000)
+        parser.add_argument("--images-per-ad", type=int, default=5)
+        parser.add_argument("--messages", type=int, default=1_000_000)
+        parser.add_argument("--messages-per-thread", type=int, default=20)
+        parser.add_argument(
+            "--scale", type=float, default=1.0, help="Multiply every volume, e.g. 0.01 for a smoke run."
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--clear", action="store_true", help="Only delete previously seeded rows.")
+
+    def handle(self, *args, **options) -> None:
+        self.batch_size = options["batch_size"]
+        self.rng = random.Random(options["seed"])
+        if options["clear"]:
+            self.clear()
+            return
+        scale = options["scale"]
+        users = max(int(options["users"] * scale), 2)
+        ads = int(options["ads"] * scale)
+        messages = int(options["messages"] * scale)
+
+        with transaction.atomic():
+            user_ids = self.step("users", self.seed_users, users)
+            ad_ids = self.step("ads", self.seed_ads, ads, user_ids)
+            self.step("images", self.seed_images, ad_ids, options["images_per_ad"])
+            self.step("amenities", self.seed_amenities, ad_ids)
+            self.step(
+                "chat messages",
+                self.seed_chat,
+                messages,
+                options["messages_per_thread"],
+                user_ids,
+                ad_ids,
+            )
+            self.step("counters", self.seed_counters, user_ids)
+        self.step("search index", get_search_backend().rebuild)
+        self.step("stats", recompute_ad_stats)
+        self.step("similar ads", rebuild_similar_ads)
+        bump_version()
+
+    def step(self, label: str, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        count = len(result) if isinstance(result, list) else result
+        self.stdout.write(f"{label:<15}{count!s:>10} in {time.perf_counter() - start:.1f}s")
+        return result
+
+    def batches(self, total: int):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def text(self, words: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=words))
+
+    def seed_users(self, count: int) -> list:
+        User = get_user_model()
+        ids = []
+        for batch in self.batches(count):
+            users = User.objects.bulk_create(
+                [
+                    User(
+                        email=f"user{i}@{EMAIL_DOMAIN}",
+                        full_name=f"Benchmark User {i}",
+                        password=UNUSABLE_PASSWORD,
+                    )
+                    for i in batch
+                ]
+            )
+            ids.extend(user.pk for user in users)
+        return ids
+
+    def seed_ads(self, count: int, user_ids: list) -> list:
+        rng = self.rng
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        ids = []
+        for batch in self.batches(count):
+            ads = []
+            for i in batch:
+                lat = Decimal(f"{rng.uniform(*LAT_RANGE):.6f}")
+                lng = Decimal(f"{rng.uniform(*LNG_RANGE):.6f}")
+                bedrooms = rng.randint(0, 5)
+                ads.append(
+                    Ad(
+                        owner_id=rng.choice(user_ids),
+                        title=f"{self.text(3)} #{i}",
+                        description=self.text(rng.randint(20, 60)),
+                        monthly_rent=rng.randint(1_000_000, 30_000_000),
+                        property_type=rng.choice(PropertyType.values),
+                        bedrooms=bedrooms,
+                        bathrooms=max(bedrooms // 2, 1),
+                        area_m2=rng.randint(18, 250),
+                        address=self.text(2),
+                        latitude=lat,
+                        longitude=lng,
+                        geohash=encode_geohash(lat, lng),
+                        status=rng.choices(statuses, weights)[0],
+                        is_active=rng.random() > 0.05,
+                        slug=f"{SLUG_PREFIX}{i}",
+                    )
+                )
+            ids.extend(ad.pk for ad in Ad.objects.bulk_create(ads))
+        return ids
+
+    def seed_images(self, ad_ids: list, per_ad: int) -> int:
+        total = 0
+        for batch in self.batches(len(ad_ids)):
+            images = [
+                AdImage(
+                    ad_id=ad_ids[i],
+                    image="ads/bench/placeholder.jpg",
+                    width=1600,
+                    height=1200,
+                    variants_status=VariantStatus.READY,
+                    order=order,
+                )
+                for i in batch
+                for order in range(min(self.rng.randint(0, per_ad * 2), MAX_IMAGES))
+            ]
+            AdImage.objects.bulk_create(images)
+            Ad.objects.filter(pk__in=[ad_ids[i] for i in batch]).recount_images()
+            total += len(images)
+        return total
+
+    def seed_amenities(self, ad_ids: list) -> int:
+        amenity_ids = [
+            Amenity.objects.get_or_create(slug=slug, defaults={"name": slug.replace("-", " ").title()})[0].pk
+            for slug in AMENITIES
+        ]
+        Through = Ad.amenities.through
+        total = 0
+        for batch in self.batches(len(ad_ids)):
+            rows = [
+                Through(ad_id=ad_ids[i], amenity_id=amenity_id)
+                for i in batch
+                for amenity_id in self.rng.sample(amenity_ids, self.rng.randint(0, 4))
+            ]
+            Through.objects.bulk_create(rows)
+            total += len(rows)
+        return total
+
+    def seed_chat(self, messages: int, per_thread: int, user_ids: list, ad_ids: list) -> int:
+        if not messages or not ad_ids:
+            return 0
+        rng = self.rng
+        owners = dict(Ad.objects.filter(pk__in=ad_ids).values_list("pk", "owner_id").iterator())
+        Participant = ChatThread.participants.through
+        keys = set()
+        pairs = []
+        wanted = max(messages // per_thread, 1)
+        for _ in range(wanted * 2):
+            if len(pairs) >= wanted:
+                break
+            ad_id = rng.choice(ad_ids)
+            buyer, seller = rng.choice(user_ids), owners[ad_id]
+            key = ChatThread.pair_key(buyer, seller, ad_id)
+            if buyer == seller or key in keys:
+                continue
+            keys.add(key)
+            pairs.append((ad_id, buyer, seller, key))
+
+        latest = ChatMessage.objects.filter(thread=OuterRef("pk")).order_by("-id").values("id")[:1]
+        total = 0
+        for batch in self.batches(len(pairs)):
+            threads = ChatThread.objects.bulk_create(
+                [ChatThread(ad_id=pairs[i][0], participant_key=pairs[i][3]) for i in batch]
+            )
+            Participant.objects.bulk_create(
+                [
+                    Participant(chatthread_id=thread.pk, user_id=user_id)
+                    for thread, i in zip(threads, batch)
+                    for user_id in pairs[i][1:3]
+                ]
+            )
+            rows = [
+                ChatMessage(
+                    thread_id=thread.pk,
+                    sender_id=pairs[i][1 + n % 2],
+                    content=self.text(rng.randint(3, 25)),
+                )
+                for thread, i in zip(threads, batch)
+                for n in range(per_thread)
+            ]
+            ChatMessage.objects.bulk_create(rows, batch_size=self.batch_size)
+            ChatThread.objects.filter(pk__in=[thread.pk for thread in threads]).update(
+                last_message=Subquery(latest)
+            )
+            total += len(rows)
+        return total
+
+    def seed_counters(self, user_ids: list) -> int:
+        """Fill ``User.active_ads_count`` from one grouped count."""
+        User = get_user_model()
+        counts = dict(
+            Ad.objects.publicly_active()
+            .filter(slug__startswith=SLUG_PREFIX)
+            .order_by()
+            .values_list("owner")
+            .annotate(total=Count("pk"))
+        )
+        users = [User(pk=pk, active_ads_count=total) for pk, total in counts.items()]
+        User.objects.bulk_update(users, ["active_ads_count"], batch_size=1000)
+        return len(users)
+
+    def clear(self) -> None:
+        User = get_user_model()
+        seeded = User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+        with transaction.atomic():
+            threads, _ = ChatThread.objects.filter(
+                Q(participants__in=seeded) | Q(ad__slug__startswith=SLUG_PREFIX)
+            ).distinct().delete()
+            ads, _ = Ad.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+            users, _ = seeded.delete()
+        get_search_backend().rebuild()
+        recompute_ad_stats()
+        bump_version()
+        self.stdout.write(f"Deleted {threads} thread rows, {ads} ad rows and {users} user rows.")
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:44
+
+from django.db import migrations, models
+
+# Copy of ``ads.geo.encode_geohash`` as of this migration.
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        bounds, value = (lng_range, float(lng)) if even else (lat_range, float(lat))
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            bounds[0] = mid
+        else:
+            bits *= 2
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def backfill_geohash(apps, schema_editor):
+    Ad = apps.get_model("ads", "Ad")
+    ads = Ad.objects.filter(latitude__isnull=False, longitude__isnull=False).only(
+        "id", "latitude", "longitude"
+    )
+    for ad in ads.iterator(chunk_size=1000):
+        Ad.objects.filter(pk=ad.pk).update(
+            geohash=encode_geohash(ad.latitude, ad.longitude)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0002_rename_ads_ad_status_idx_ads_ad_status_eb9ea6_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ad",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Geohash of latitude/longitude used for spatial lookups",
+                max_length=12,
+            ),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0003_ad_geohash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="ad",
+            name="ads_ad_monthly_976098_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="ad",
+            name="ads_ad_created_9f5b83_idx",
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(fields=["created_at", "id"], name="ads_ad_created_dd4be8_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(fields=["monthly_rent", "id"], name="ads_ad_monthly_143139_idx"),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Copies of ``ads.search`` as of this migration, so later changes there
+# cannot break migrating a fresh database.
+PG_INDEX = "ads_ad_search_idx"
+FTS_TABLE = "ads_ad_fts"
+APOSTROPHES = "ʻʼ‘’`'"
+_FOLD = str.maketrans({"ё": "е", **{c: None for c in APOSTROPHES}})
+_CHARS = "ё" + APOSTROPHES.replace("'", "''")
+# ``PostgresSearchBackend.vector_sql()``: the indexed expression.
+VECTOR_SQL = " || ".join(
+    f"setweight(to_tsvector('simple'::regconfig, "
+    f"translate(lower(coalesce({column}, '')), '{_CHARS}', 'е')), '{weight}')"
+    for column, weight in (("title", "A"), ("address", "B"), ("description", "C"))
+)
+
+
+def normalize_search_text(text: str) -> str:
+    return (text or "").lower().translate(_FOLD)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON ads_ad "
+            f"USING GIN (({VECTOR_SQL}))"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "title, address, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        Ad = apps.get_model("ads", "Ad")
+        rows = Ad.objects.values_list("id", "title", "address", "description")
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, address, description) "
+                "VALUES (%s, %s, %s, %s)",
+                [
+                    [pk] + [normalize_search_text(value) for value in values]
+                    for pk, *values in rows.iterator()
+                ],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0004_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0005_ad_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="adimage",
+            name="height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="adimage",
+            name="medium",
+            field=models.ImageField(blank=True, upload_to="ads/variants/%Y/%m/%d/"),
+        ),
+        migrations.AddField(
+            model_name="adimage",
+            name="thumbnail",
+            field=models.ImageField(blank=True, upload_to="ads/variants/%Y/%m/%d/"),
+        ),
+        migrations.AddField(
+            model_name="adimage",
+            name="variants_status",
+            field=models.CharField(choices=[("PENDING", "Pending"), ("READY", "Ready"), ("FAILED", "Failed")], db_index=True, default="PENDING", max_length=10),
+        ),
+        migrations.AddField(
+            model_name="adimage",
+            name="width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
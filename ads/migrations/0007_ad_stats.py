@@ -0,0 +1,89 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:35
+
+from django.db import migrations, models
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+# Copy of ``ads.stats.compute_stats`` and the constants it reads as of this migration.
+PROPERTY_TYPES = ["APARTMENT", "HOUSE", "STUDIO", "COMMERCIAL"]
+STATS_COLUMNS = {"APPROVED": "available", "PENDING": "pending", "ARCHIVED": "rented"}
+RENT_FIELDS = {
+    "rent_min": 0.0,
+    "rent_p25": 0.25,
+    "rent_median": 0.5,
+    "rent_p75": 0.75,
+    "rent_max": 1.0,
+}
+
+
+def rent_percentiles(queryset, count):
+    if not count:
+        return dict.fromkeys(RENT_FIELDS)
+    ranks = {field: round(q * (count - 1)) + 1 for field, q in RENT_FIELDS.items()}
+    rents = dict(
+        queryset.filter(status="APPROVED", is_active=True)
+        .annotate(rank=Window(RowNumber(), order_by=[F("monthly_rent").asc(), F("id").asc()]))
+        .filter(rank__in=set(ranks.values()))
+        .values_list("rank", "monthly_rent")
+    )
+    return {field: rents.get(rank) for field, rank in ranks.items()}
+
+
+def compute_stats(queryset):
+    def empty():
+        return dict.fromkeys(STATS_COLUMNS.values(), 0)
+
+    rows = {property_type: empty() for property_type in ["", *PROPERTY_TYPES]}
+    counts = (
+        queryset.filter(is_active=True, status__in=list(STATS_COLUMNS))
+        .order_by()
+        .values_list("property_type", "status")
+        .annotate(total=Count("pk"))
+    )
+    for property_type, status, total in counts:
+        column = STATS_COLUMNS[status]
+        rows[""][column] += total
+        rows.setdefault(property_type, empty())[column] += total
+    for property_type, row in rows.items():
+        scope = queryset if property_type == "" else queryset.filter(property_type=property_type)
+        row.update(rent_percentiles(scope, row["available"]))
+    return rows
+
+
+def backfill_stats(apps, schema_editor):
+    Ad = apps.get_model("ads", "Ad")
+    AdStats = apps.get_model("ads", "AdStats")
+    AdStats.objects.bulk_create(
+        AdStats(property_type=property_type, **values)
+        for property_type, values in compute_stats(Ad.objects.all()).items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0006_adimage_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AdStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("property_type", models.CharField(blank=True, choices=[("APARTMENT", "Apartment"), ("HOUSE", "House"), ("STUDIO", "Studio"), ("COMMERCIAL", "Commercial")], max_length=20, unique=True)),
+                ("available", models.PositiveIntegerField(default=0)),
+                ("pending", models.PositiveIntegerField(default=0)),
+                ("rented", models.PositiveIntegerField(default=0)),
+                ("rent_min", models.PositiveIntegerField(blank=True, null=True)),
+                ("rent_p25", models.PositiveIntegerField(blank=True, null=True)),
+                ("rent_median", models.PositiveIntegerField(blank=True, null=True)),
+                ("rent_p75", models.PositiveIntegerField(blank=True, null=True)),
+                ("rent_max", models.PositiveIntegerField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "ad stats",
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def queue_listed_ads(apps, schema_editor):
+    Ad = apps.get_model("ads", "Ad")
+    SimilarAdRefresh = apps.get_model("ads", "SimilarAdRefresh")
+    ad_ids = Ad.objects.filter(status="APPROVED", is_active=True).values_list("pk", flat=True)
+    SimilarAdRefresh.objects.bulk_create(
+        (SimilarAdRefresh(ad_id=ad_id) for ad_id in ad_ids.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0007_ad_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarAdRefresh",
+            fields=[
+                ("ad", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="+", serialize=False, to="ads.ad")),
+                ("requested_at", models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SimilarAd",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+                ("ad", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="neighbors", to="ads.ad")),
+                ("neighbor", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="similar_to", to="ads.ad")),
+            ],
+            options={
+                "ordering": ["ad", "rank"],
+                "constraints": [models.UniqueConstraint(fields=("ad", "rank"), name="similar_ad_rank_unique")],
+            },
+        ),
+        migrations.RunPython(queue_listed_ads, migrations.RunPython.noop),
+    ]
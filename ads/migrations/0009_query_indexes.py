@@ -0,0 +1,68 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0008_similar_ads"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="ad",
+            name="ads_ad_status_eb9ea6_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="ad",
+            name="ads_ad_propert_f0d42d_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="ad",
+            name="ads_ad_created_dd4be8_idx",
+        ),
+        migrations.AlterField(
+            model_name="ad",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name="ad",
+            name="owner",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="ads", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name="ad",
+            name="property_type",
+            field=models.CharField(choices=[("APARTMENT", "Apartment"), ("HOUSE", "House"), ("STUDIO", "Studio"), ("COMMERCIAL", "Commercial")], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name="ad",
+            name="status",
+            field=models.CharField(choices=[("DRAFT", "Draft"), ("PENDING", "Pending"), ("APPROVED", "Approved"), ("REJECTED", "Rejected"), ("ARCHIVED", "Archived")], default="PENDING", max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["created_at", "id"], name="ad_active_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["status", "created_at"], name="ad_status_active_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(fields=["owner", "status", "is_active"], name="ad_owner_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["property_type", "created_at"], name="ad_type_active_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ad",
+            index=models.Index(condition=models.Q(("is_active", True), ("latitude__isnull", False), ("longitude__isnull", False)), fields=["latitude", "longitude", "monthly_rent"], name="ad_map_idx"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_image_count(apps, schema_editor):
+    Ad = apps.get_model("ads", "Ad")
+    AdImage = apps.get_model("ads", "AdImage")
+    images = (
+        AdImage.objects.filter(ad=OuterRef("pk"))
+        .order_by()
+        .values("ad")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Ad.objects.update(image_count=Coalesce(Subquery(images), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ads", "0009_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ad",
+            name="image_count",
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text="Number of images, kept by add_images and the image signals"),
+        ),
+        migrations.RunPython(backfill_image_count, migrations.RunPython.noop),
+    ]
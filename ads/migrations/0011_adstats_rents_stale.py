@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0010_ad_image_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adstats',
+            name='rents_stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
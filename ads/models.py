@@ -2,10 +2,14 @@ from __future__ import annotations
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .cache import bump_version
+
 
 class Amenity(models.Model):
     """Property amenity such as elevator, parking, etc."""
@@ -36,18 +40,83 @@ class AdStatus(models.TextChoices):
     ARCHIVED = "ARCHIVED", "Archived"
 
 
+MAX_IMAGES = 10
+
+# ``AdStats`` column counting active ads in each status.
+STATS_COLUMNS = {
+    AdStatus.APPROVED: "available",
+    AdStatus.PENDING: "pending",
+    AdStatus.ARCHIVED: "rented",
+}
+
+
+class AdQuerySet(models.QuerySet):
+    """Query helpers shared by the ad endpoints."""
+
+    def with_related(self) -> "AdQuerySet":
+        """Load the owner, amenities and images needed by ``AdDetailSerializer``.
+
+        Owner info, including the denormalized ``active_ads_count``, comes from
+        the joined user row so serializing a page costs a fixed number of queries.
+        """
+        return self.select_related("owner").prefetch_related("amenities", "images")
+
+    def publicly_active(self) -> "AdQuerySet":
+        """Ads counted towards the owner's ``active_ads_count``."""
+        return self.filter(status=AdStatus.APPROVED, is_active=True)
+
+    def with_cover(self) -> "AdQuerySet":
+        """Annotate ``cover_image``: the first image's thumbnail, or the original until it exists."""
+        cover = (
+            AdImage.objects.filter(ad=OuterRef("pk"))
+            .order_by("order")
+            .values(name=Coalesce(NullIf("thumbnail", Value("")), "image", output_field=models.CharField()))[:1]
+        )
+        return self.annotate(cover_image=Subquery(cover))
+
+    def recount_images(self) -> int:
+        """Rewrite ``image_count`` from the images table, e.g. after ``bulk_create``."""
+        images = (
+            AdImage.objects.filter(ad=OuterRef("pk"))
+            .order_by()
+            .values("ad")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return self.update(image_count=Coalesce(Subquery(images), 0))
+
+
 class Ad(models.Model):
     """Classified advertisement for property rentals."""
 
+    # Attributes that decide whether an ad counts towards ``User.active_ads_count``.
+    COUNTER_FIELDS = frozenset({"owner_id", "status", "is_active"})
+    # Attributes that decide the ad's ``AdStats`` bucket, see ``stats_key``.
+    STATS_FIELDS = frozenset({"status", "is_active", "property_type", "monthly_rent"})
+    # Attributes scored by the similar-ads engine, see ``similarity_key``.
+    SIMILARITY_FIELDS = frozenset(
+        {
+            "status",
+            "is_active",
+            "property_type",
+            "monthly_rent",
+            "area_m2",
+            "bedrooms",
+            "latitude",
+            "longitude",
+        }
+    )
+
     owner = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ads"
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="ads",
+        db_index=False,  # Leads ``ad_owner_status_idx``.
     )
     title = models.CharField(max_length=200)
     description = models.TextField()
     monthly_rent = models.PositiveIntegerField(help_text="UZS per month")
-    property_type = models.CharField(
-        max_length=20, choices=PropertyType.choices, db_index=True
-    )
+    property_type = models.CharField(max_length=20, choices=PropertyType.choices)
     bedrooms = models.PositiveSmallIntegerField(default=0)
     bathrooms = models.PositiveSmallIntegerField(default=0)
     area_m2 = models.DecimalField(max_digits=8, decimal_places=2)
@@ -58,6 +127,13 @@ class Ad(models.Model):
     longitude = models.DecimalField(
         max_digits=9, decimal_places=6, null=True, blank=True
     )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Geohash of latitude/longitude used for spatial lookups",
+    )
     amenities = models.ManyToManyField(Amenity, blank=True)
     contact_name = models.CharField(max_length=120, blank=True)
     contact_phone = PhoneNumberField(blank=True)
@@ -65,20 +141,48 @@ class Ad(models.Model):
         max_length=20,
         choices=AdStatus.choices,
         default=AdStatus.PENDING,
-        db_index=True,
     )
     moderation_note = models.TextField(blank=True)
     slug = models.SlugField(max_length=220, unique=True)
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    image_count = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of images, kept by add_images and the image signals",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AdQuerySet.as_manager()
+
     class Meta:
+        # Shaped after the endpoint queries; ``AdTests.test_endpoint_queries_avoid_table_scans``
+        # checks their plans. ``is_active=True`` compiles to a bare boolean
+        # term, which only a partial index on it can serve.
         indexes = [
-            models.Index(fields=["status"]),
-            models.Index(fields=["property_type"]),
-            models.Index(fields=["monthly_rent"]),
-            models.Index(fields=["created_at"]),
+            # Listing order and keyset pagination keys, see ``ads.pagination.KeysetPagination``.
+            models.Index(
+                fields=["created_at", "id"], condition=Q(is_active=True), name="ad_active_created_idx"
+            ),
+            models.Index(fields=["monthly_rent", "id"]),
+            # Moderation queue, listed approved ads and ``AdStats`` buckets.
+            models.Index(
+                fields=["status", "created_at"], condition=Q(is_active=True), name="ad_status_active_idx"
+            ),
+            # "My ads", per-owner counters and the signed-in owner branch.
+            models.Index(fields=["owner", "status", "is_active"], name="ad_owner_status_idx"),
+            # List filtered by type and the similar-ads fallback.
+            models.Index(
+                fields=["property_type", "created_at"],
+                condition=Q(is_active=True),
+                name="ad_type_active_idx",
+            ),
+            # Map pins and clusters; covers the ``locations`` columns.
+            models.Index(
+                fields=["latitude", "longitude", "monthly_rent"],
+                condition=Q(is_active=True, latitude__isnull=False, longitude__isnull=False),
+                name="ad_map_idx",
+            ),
         ]
         constraints = [
             models.CheckConstraint(
@@ -95,12 +199,191 @@ class Ad(models.Model):
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.COUNTER_FIELDS.isdisjoint(instance.get_deferred_fields()):
+            instance._counted_owner = instance.counted_owner_id()
+        if cls.STATS_FIELDS.isdisjoint(instance.get_deferred_fields()):
+            instance._stats_key = instance.stats_key()
+        if cls.SIMILARITY_FIELDS.isdisjoint(instance.get_deferred_fields()):
+            instance._similarity_key = instance.similarity_key()
+        return instance
+
+    def counted_owner_id(self):
+        """Return the owner ID this ad counts towards, or ``None``."""
+        if self.status == AdStatus.APPROVED and self.is_active:
+            return self.owner_id
+        return None
+
+    def stats_key(self):
+        """Return the ``(column, property_type, monthly_rent)`` counted in ``AdStats``.
+
+        ``None`` when the ad is not counted, e.g. soft deleted or a draft.
+        """
+        column = STATS_COLUMNS.get(self.status) if self.is_active else None
+        if column is None:
+            return None
+        return (column, self.property_type, self.monthly_rent)
+
+    def similarity_key(self):
+        """Return the features scored by ``ads.similarity``, or ``None`` if not listed."""
+        if self.status != AdStatus.APPROVED or not self.is_active:
+            return None
+        return (
+            self.property_type,
+            self.monthly_rent,
+            self.area_m2,
+            self.bedrooms,
+            self.latitude,
+            self.longitude,
+        )
+
+    def add_images(self, images: list["AdImage"]) -> list["AdImage"]:
+        """Save new ``images`` for this ad, enforcing ``MAX_IMAGES``.
+
+        The ad row is locked while ``image_count`` is read, so concurrent
+        uploads cannot pass the limit. Images without an ``order`` go after the
+        existing ones. ``bulk_create`` skips the image signals, so the counter,
+        ``updated_at`` and the response cache are updated here.
+        """
+        with transaction.atomic():
+            count = Ad.objects.select_for_update().values_list("image_count", flat=True).get(pk=self.pk)
+            if count + len(images) > MAX_IMAGES:
+                raise ValidationError(f"Maximum of {MAX_IMAGES} images allowed per ad.")
+            for position, image in enumerate(images, start=count):
+                image.ad = self
+                if image.order is None:
+                    image.order = position
+            images = AdImage.objects.bulk_create(images)
+            self.image_count = count + len(images)
+            self.updated_at = timezone.now()
+            Ad.objects.filter(pk=self.pk).update(image_count=self.image_count, updated_at=self.updated_at)
+            transaction.on_commit(bump_version)
+        return images
+
+
+def recount_active_ads(owner_ids=None) -> int:
+    """Recompute ``active_ads_count`` from the ads table.
+
+    Only users whose stored value differs are written. ``owner_ids`` limits the
+    reconcile to the given users. Returns the number of users updated.
+    """
+    User = Ad._meta.get_field("owner").related_model
+    actual = (
+        Ad.objects.publicly_active()
+        .filter(owner=OuterRef("pk"))
+        .order_by()
+        .values("owner")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    actual = Coalesce(Subquery(actual), 0)
+    users = User.objects.all()
+    if owner_ids is not None:
+        users = users.filter(pk__in=owner_ids)
+    stale = users.annotate(actual=actual).exclude(active_ads_count=F("actual"))
+    return User.objects.filter(pk__in=stale.values("pk")).update(active_ads_count=actual)
+
+
+class AdStats(models.Model):
+    """Precomputed ad counts and rent percentiles served by ``/api/ads/stats/``.
+
+    One row per property type plus an ``ALL_TYPES`` row for every ad. Counts
+    cover active ads only; rent figures cover the available ones. The ad
+    signals keep counts current on status transitions, soft deletes and price
+    changes and flag ``rents_stale`` for the rent figures to be re-read, and
+    ``reconcile_ad_stats`` rebuilds rows, see ``ads/stats.py``.
+    """
+
+    ALL_TYPES = ""
+
+    property_type = models.CharField(
+        max_length=20, choices=PropertyType.choices, blank=True, unique=True
+    )
+    available = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    rented = models.PositiveIntegerField(default=0)
+    rent_min = models.PositiveIntegerField(null=True, blank=True)
+    rent_p25 = models.PositiveIntegerField(null=True, blank=True)
+    rent_median = models.PositiveIntegerField(null=True, blank=True)
+    rent_p75 = models.PositiveIntegerField(null=True, blank=True)
+    rent_max = models.PositiveIntegerField(null=True, blank=True)
+    rents_stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "ad stats"
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return self.property_type or "All types"
+
+    @property
+    def total(self) -> int:
+        return self.available + self.pending + self.rented
+
+
+class SimilarAd(models.Model):
+    """Precomputed neighbor of an ad, written by ``refresh_similar_ads``."""
+
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name="neighbors")
+    neighbor = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name="similar_to")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["ad", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["ad", "rank"], name="similar_ad_rank_unique"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"{self.ad_id} -> {self.neighbor_id} (#{self.rank})"
+
+
+class SimilarAdRefresh(models.Model):
+    """Ad whose neighbor list must be recomputed by the similar-ads worker."""
+
+    ad = models.OneToOneField(
+        Ad, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    requested_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    @classmethod
+    def request(cls, ad_ids) -> None:
+        """Queue the given ads, moving already queued ones to the back."""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(ad_id=ad_id, requested_at=now) for ad_id in ad_ids],
+            update_conflicts=True,
+            unique_fields=["ad"],
+            update_fields=["requested_at"],
+        )
+
+
+class VariantStatus(models.TextChoices):
+    """Processing state of an image's resized variants."""
+
+    PENDING = "PENDING", "Pending"
+    READY = "READY", "Ready"
+    FAILED = "FAILED", "Failed"
+
 
 class AdImage(models.Model):
     """Image associated with an advertisement."""
 
     ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="ads/%Y/%m/%d/")
+    thumbnail = models.ImageField(upload_to="ads/variants/%Y/%m/%d/", blank=True)
+    medium = models.ImageField(upload_to="ads/variants/%Y/%m/%d/", blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    variants_status = models.CharField(
+        max_length=10,
+        choices=VariantStatus.choices,
+        default=VariantStatus.PENDING,
+        db_index=True,
+    )
     order = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -111,6 +394,6 @@ class AdImage(models.Model):
         return f"Image {self.pk} for {self.ad_id}"
 
     def clean(self) -> None:
-        """Ensure an ad does not have more than 10 images."""
-        if self.ad.images.exclude(pk=self.pk).count() >= 10:
-            raise ValidationError("An ad cannot have more than 10 images.")
+        """Ensure an ad does not have more than ``MAX_IMAGES`` images."""
+        if self._state.adding and self.ad.image_count >= MAX_IMAGES:
+            raise ValidationError(f"Maximum of {MAX_IMAGES} images allowed per ad.")
@@ -0,0 +1,50 @@
+"""Batched moderation of pending ads.
+
+:func:`moderate_ads` approves or rejects many pending ads with one
+``UPDATE`` inside a transaction. ``update()`` skips the ad signals, so their
+side effects are applied once for the whole batch: the owners'
+``active_ads_count``, the ``AdStats`` buckets, the similar-ads queue and the
+response cache version.
+"""
+from __future__ import annotations
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import Ad, AdStatus, SimilarAdRefresh, recount_active_ads
+from .stats import apply_transitions
+
+MAX_BATCH = 500
+ACTIONS = {"approve": AdStatus.APPROVED, "reject": AdStatus.REJECTED}
+
+
+def moderate_ads(ad_ids, action: str, note: str = "") -> dict:
+    """Move the pending ads among ``ad_ids`` to the status of ``action``.
+
+    Returns ``{"action", "updated": [ids], "skipped": [ids]}``; IDs that do
+    not exist, are soft deleted or are no longer pending are skipped.
+    """
+    status = ACTIONS[action]
+    wanted = set(ad_ids)
+    with transaction.atomic():
+        ads = list(
+            Ad.objects.select_for_update()
+            .filter(pk__in=wanted, status=AdStatus.PENDING, is_active=True)
+            .only("pk", "owner_id", *Ad.STATS_FIELDS)
+            .order_by("pk")
+        )
+        ids = [ad.pk for ad in ads]
+        if ads:
+            Ad.objects.filter(pk__in=ids).update(
+                status=status, moderation_note=note, updated_at=timezone.now()
+            )
+            previous = [ad.stats_key() for ad in ads]
+            for ad in ads:
+                ad.status = status
+            apply_transitions(zip(previous, [ad.stats_key() for ad in ads]))
+            if status == AdStatus.APPROVED:
+                recount_active_ads({ad.owner_id for ad in ads})
+                SimilarAdRefresh.request(ids)
+            transaction.on_commit(bump_version)
+    return {"action": action, "updated": ids, "skipped": sorted(wanted - set(ids))}
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import base64
+import json
+from types import SimpleNamespace
+from typing import Any
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only keyset pagination on ``(<sort field>, id)``.
+
+    The cursor stores the sort value and ID of the last row on the page, so
+    every page is a single index range scan no matter how deep the client has
+    scrolled. The total count is only computed when ``?count=true`` is sent.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    page_size = api_settings.PAGE_SIZE
+    keyset_fields = ("created_at", "monthly_rent")
+    default_ordering = "-created_at"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        rows = self.page_queryset(queryset, request)
+        if self.wants_count(request):
+            self.count = queryset.count()
+        return self.set_page(list(rows))
+
+    async def apaginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        rows = self.page_queryset(queryset, request)
+        if self.wants_count(request):
+            self.count = await queryset.acount()
+        return self.set_page([row async for row in rows])
+
+    def wants_count(self, request) -> bool:
+        return request.query_params.get(self.count_query_param) in {"1", "true", "True"}
+
+    def page_queryset(self, queryset: QuerySet, request) -> QuerySet:
+        """The rows after the cursor, one more than a page to detect the next one."""
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        field_name = self.ordering.lstrip("-")
+        descending = self.ordering.startswith("-")
+        direction = "-" if descending else ""
+        self.field = queryset.model._meta.get_field(field_name)
+        self.count = None
+
+        queryset = queryset.order_by(self.ordering, f"{direction}id")
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            op = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{field_name}__{op}": value})
+                | Q(**{field_name: value, f"id__{op}": pk})
+            )
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, rows: list) -> list:
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_ordering(self, queryset: QuerySet) -> str:
+        ordering = [o for o in queryset.query.order_by if o.lstrip("-") != "id"]
+        if not ordering:
+            return self.default_ordering
+        if len(ordering) > 1 or ordering[0].lstrip("-") not in self.keyset_fields:
+            raise ValidationError(
+                {
+                    "ordering": [
+                        "Cursor pagination supports ordering by "
+                        + ", ".join(self.keyset_fields)
+                        + " only."
+                    ]
+                }
+            )
+        return ordering[0]
+
+    def decode_cursor(self, request) -> tuple[Any, int] | None:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            if payload["o"] != self.ordering:
+                raise ValueError("ordering changed")
+            return self.field.to_python(payload["v"]), int(payload["i"])
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj) -> str:
+        if isinstance(obj, dict):
+            # A ``values()`` row, see ``ads.fieldsets``.
+            obj = SimpleNamespace(pk=obj["id"], **obj)
+        payload = {
+            "o": self.ordering,
+            "v": self.field.value_to_string(obj),
+            "i": obj.pk,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode("ascii"))
+        return encoded.decode("ascii")
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data) -> Response:
+        body: dict[str, Any] = {}
+        if self.count is not None:
+            body["count"] = self.count
+        body.update({"next": self.get_next_link(), "previous": None, "results": data})
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class AdPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in keyset mode.
+
+    Sending ``?cursor=`` (empty for the first page) switches to
+    :class:`KeysetPagination`; the ``next`` link carries the cursor onwards.
+    """
+
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset: QuerySet, request, view=None):
+        """:meth:`paginate_queryset` reading through the async ORM."""
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Counted up front so ``Paginator.page()`` does no I/O.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.page.object_list = [row async for row in self.page.object_list]
+        return list(self.page)
+
+    def get_paginated_response(self, data) -> Response:
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view) -> list[dict]:
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.keyset_class.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Switch to keyset pagination; empty for the first page.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.keyset_class.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include the total count in keyset mode.",
+                "schema": {"type": "boolean"},
+            },
+        ]
+
+
+class ModerationQueuePagination(KeysetPagination):
+    """Oldest-first keyset pages of the moderation queue."""
+
+    page_size = 50
+    keyset_fields = ("created_at",)
+    default_ordering = "created_at"
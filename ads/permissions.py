@@ -22,3 +22,12 @@ class IsOwnerOrReadOnly(BasePermission):
         if obj.status == AdStatus.APPROVED and request.method in {"PUT", "PATCH"}:
             return True
         return False
+
+
+class IsAgency(BasePermission):
+    """Allow verified agency accounts only."""
+
+    message = "Only verified agency accounts can bulk import ads."
+
+    def has_permission(self, request, view) -> bool:
+        return bool(getattr(request.user, "is_agency", False))
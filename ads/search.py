@@ -0,0 +1,214 @@
+"""Full-text search over ads.
+
+The backend is picked from the database vendor:
+
+* PostgreSQL matches a weighted ``tsvector`` expression that is backed by a GIN
+  index (see migration ``0005_ad_search_index``) and ranks with ``ts_rank``.
+* SQLite matches against the ``ads_ad_fts`` FTS5 shadow table, kept in sync by
+  the ``post_save``/``post_delete`` signals, and ranks with ``bm25``.
+* Anything else falls back to DRF's ``icontains`` search.
+
+``ADS_SEARCH_BACKEND`` may name a backend class to override the choice.
+"""
+from __future__ import annotations
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .pagination import KeysetPagination
+
+# Uzbek Latin spells o‘/g‘ and the tutuq belgisi with several apostrophe
+# look-alikes, and Russian text mixes ё/е freely. Dropping the apostrophes and
+# folding ё keeps "o'zbekiston", "o‘zbekiston" and "ozbekiston" equivalent.
+APOSTROPHES = "ʻʼ‘’`'"
+_FOLD = str.maketrans({"ё": "е", **{c: None for c in APOSTROPHES}})
+_TERM_RE = re.compile(r"\w+")
+# Longer queries are truncated to keep the match expression bounded.
+MAX_TERMS = 8
+
+
+def normalize_search_text(text: str) -> str:
+    """Lowercase and fold Uzbek/Russian spelling variants."""
+    return (text or "").lower().translate(_FOLD)
+
+
+def search_terms(query: str) -> list[str]:
+    """Split a user query into normalized word tokens."""
+    return _TERM_RE.findall(normalize_search_text(query))[:MAX_TERMS]
+
+
+class BaseSearchBackend:
+    """Interface for ad search backends.
+
+    ``search`` must filter the queryset to matching ads and annotate a
+    ``search_rank`` where a higher value means a better match.
+    """
+
+    def search(self, queryset: QuerySet, terms: list[str]) -> QuerySet:
+        raise NotImplementedError
+
+    def index(self, ad) -> None:
+        """Update the search index for a saved ad."""
+
+    def index_many(self, ads) -> None:
+        """Index ads saved without signals, e.g. by ``bulk_create``."""
+        for ad in ads:
+            self.index(ad)
+
+    def remove(self, ad_id: int) -> None:
+        """Drop a deleted ad from the search index."""
+
+    def rebuild(self) -> int:
+        """Re-index every ad and return the number of indexed rows."""
+        return 0
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """``tsvector`` search using the GIN expression index."""
+
+    @staticmethod
+    def vector_sql(table: str = "") -> str:
+        """Weighted document vector; must match the indexed expression."""
+        prefix = f'"{table}".' if table else ""
+        chars = "ё" + APOSTROPHES.replace("'", "''")
+        return " || ".join(
+            f"setweight(to_tsvector('simple'::regconfig, "
+            f"translate(lower(coalesce({prefix}{column}, '')), '{chars}', 'е')), '{weight}')"
+            for column, weight in (("title", "A"), ("address", "B"), ("description", "C"))
+        )
+
+    def search(self, queryset: QuerySet, terms: list[str]) -> QuerySet:
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        vector = self.vector_sql(queryset.model._meta.db_table)
+        return queryset.filter(
+            RawSQL(
+                f"({vector}) @@ to_tsquery('simple'::regconfig, %s)",
+                [tsquery],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({vector}, to_tsquery('simple'::regconfig, %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 search over the ``ads_ad_fts`` shadow table."""
+
+    table = "ads_ad_fts"
+    # Column weights for bm25: title, address, description.
+    weights = (10.0, 5.0, 1.0)
+
+    def search(self, queryset: QuerySet, terms: list[str]) -> QuerySet:
+        match = " ".join(f'"{term}"*' for term in terms)
+        ad_table = queryset.model._meta.db_table
+        weights = ", ".join(str(w) for w in self.weights)
+        # A join lets SQLite drive the query from the FTS match instead of
+        # evaluating a correlated subquery per ad.
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = "{ad_table}"."id"', f"{self.table} MATCH %s"],
+            params=[match],
+            select={"search_rank": f"-bm25({self.table}, {weights})"},
+        )
+
+    def index(self, ad) -> None:
+        self.index_many([ad])
+
+    def index_many(self, ads) -> None:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (rowid, title, address, description) "
+                "VALUES (%s, %s, %s, %s)",
+                [
+                    [
+                        ad.pk,
+                        normalize_search_text(ad.title),
+                        normalize_search_text(ad.address),
+                        normalize_search_text(ad.description),
+                    ]
+                    for ad in ads
+                ],
+            )
+
+    def remove(self, ad_id: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [ad_id])
+
+    def rebuild(self) -> int:
+        from .models import Ad
+
+        rows = Ad.objects.values_list("id", "title", "address", "description")
+        count = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            batch = []
+            for pk, title, address, description in rows.iterator(chunk_size=2000):
+                batch.append(
+                    [
+                        pk,
+                        normalize_search_text(title),
+                        normalize_search_text(address),
+                        normalize_search_text(description),
+                    ]
+                )
+                if len(batch) >= 2000:
+                    self._insert(cursor, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self._insert(cursor, batch)
+                count += len(batch)
+        return count
+
+    def _insert(self, cursor, batch: list[list]) -> None:
+        cursor.executemany(
+            f"INSERT INTO {self.table} (rowid, title, address, description) VALUES (%s, %s, %s, %s)",
+            batch,
+        )
+
+
+class IContainsSearchBackend(BaseSearchBackend):
+    """Marker for databases without a full-text backend."""
+
+
+def get_search_backend() -> BaseSearchBackend:
+    """Return the search backend for the default database."""
+    path = getattr(settings, "ADS_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend()
+    if connection.vendor == "sqlite":
+        return SQLiteSearchBackend()
+    return IContainsSearchBackend()
+
+
+class AdSearchFilter(SearchFilter):
+    """``?search=`` backed by the full-text search backend.
+
+    Results are ordered by relevance unless the client asked for an explicit
+    ``ordering`` or keyset pagination. Must run after ``OrderingFilter``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        backend = get_search_backend()
+        if isinstance(backend, IContainsSearchBackend):
+            return super().filter_queryset(request, queryset, view)
+        terms = search_terms(request.query_params.get(self.search_param, ""))
+        if not terms:
+            return queryset
+        queryset = backend.search(queryset, terms)
+        explicit = {OrderingFilter.ordering_param, KeysetPagination.cursor_query_param}
+        if explicit & set(request.query_params):
+            return queryset
+        return queryset.order_by("-search_rank", *queryset.query.order_by)
@@ -1,50 +1,58 @@
 from __future__ import annotations
 
 from typing import Any
-import base64
-import io
-import uuid
-import re
-from binascii import Error as BinasciiError
 
 from django.contrib.auth import get_user_model
-from django.db import transaction
-from django.core.files.base import ContentFile
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models, transaction
 from rest_framework import serializers
-from PIL import Image, UnidentifiedImageError
 import phonenumbers
 from phonenumbers import NumberParseException, PhoneNumberFormat
 
-from .models import Ad, AdImage, Amenity, AdStatus
+from . import fastpath
+from .models import MAX_IMAGES, Ad, AdImage, AdStats, Amenity, AdStatus
+from .moderation import ACTIONS, MAX_BATCH
+from .uploads import (
+    InvalidImage,
+    decode_base64_image,
+    estimate_upload_bytes,
+    max_image_bytes,
+    max_request_image_bytes,
+)
 
 User = get_user_model()
 
 
+def add_images(ad: Ad, images: list[AdImage]) -> list[AdImage]:
+    """``Ad.add_images`` with the limit reported as a serializer error."""
+    try:
+        return ad.add_images(images)
+    except DjangoValidationError as exc:
+        raise serializers.ValidationError(exc.messages) from exc
+
+
 class Base64ImageField(serializers.ImageField):
     """A DRF ImageField for handling base64-encoded images."""
 
     def to_internal_value(self, data: Any) -> Any:
         if isinstance(data, str):
-            if data.startswith("data:image"):
-                header, data = data.split(";base64,", 1)
-            data = re.sub(r"\s", "", data)
-            missing_padding = len(data) % 4
-            if missing_padding:
-                data += "=" * (4 - missing_padding)
             try:
-                decoded_file = base64.b64decode(data)
-            except (BinasciiError, ValueError) as exc:  # pragma: no cover - defensive
-                raise serializers.ValidationError("Invalid image data") from exc
+                data = decode_base64_image(data)
+            except InvalidImage as exc:
+                raise serializers.ValidationError(str(exc)) from exc
+        elif estimate_upload_bytes(data) > max_image_bytes():
+            raise serializers.ValidationError("Image is too large.")
+
+        return super().to_internal_value(data)
 
-            try:
-                with Image.open(io.BytesIO(decoded_file)) as img:
-                    file_extension = img.format.lower()
-            except (UnidentifiedImageError, OSError) as exc:
-                raise serializers.ValidationError("Invalid image data") from exc
 
-            file_name = f"{uuid.uuid4().hex[:12]}.{file_extension}"
-            data = ContentFile(decoded_file, name=file_name)
+class ImageListField(serializers.ListField):
+    """List of images that rejects oversized requests before decoding."""
 
+    def to_internal_value(self, data: Any) -> Any:
+        if isinstance(data, (list, tuple)):
+            if sum(estimate_upload_bytes(item) for item in data) > max_request_image_bytes():
+                raise serializers.ValidationError("Images are too large in total.")
         return super().to_internal_value(data)
 
 
@@ -63,19 +71,31 @@ class AdImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AdImage
-        fields = ["id", "image", "order", "created_at"]
-        read_only_fields = ["id", "created_at"]
-
-    def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
-        ad: Ad = self.context.get("ad")
-        if ad and ad.images.count() >= 10 and not self.instance:
-            raise serializers.ValidationError("Maximum of 10 images allowed per ad.")
-        return attrs
+        fields = [
+            "id",
+            "image",
+            "thumbnail",
+            "medium",
+            "width",
+            "height",
+            "variants_status",
+            "order",
+            "created_at",
+        ]
+        read_only_fields = [
+            "id",
+            "thumbnail",
+            "medium",
+            "width",
+            "height",
+            "variants_status",
+            "created_at",
+        ]
 
     def create(self, validated_data: dict[str, Any]) -> AdImage:
         ad: Ad = self.context["ad"]
-        validated_data.setdefault("order", ad.images.count())
-        return AdImage.objects.create(ad=ad, **validated_data)
+        image = AdImage(order=validated_data.pop("order", None), **validated_data)
+        return add_images(ad, [image])[0]
 
 
 class AmenityPrimaryKeyField(serializers.PrimaryKeyRelatedField):
@@ -108,8 +128,8 @@ class AdCreateUpdateSerializer(serializers.ModelSerializer):
     amenities = AmenityPrimaryKeyField(
         queryset=Amenity.objects.all(), many=True, required=False
     )
-    images = serializers.ListField(
-        child=Base64ImageField(), write_only=True, required=False
+    images = ImageListField(
+        child=Base64ImageField(), write_only=True, required=False, max_length=MAX_IMAGES
     )
     contact_phone = serializers.CharField(required=False, allow_blank=True)
 
@@ -173,9 +193,9 @@ class AdCreateUpdateSerializer(serializers.ModelSerializer):
         attrs = super().validate(attrs)
         images = attrs.get("images", [])
         instance: Ad | None = getattr(self, "instance", None)
-        existing = instance.images.count() if instance else 0
-        if existing + len(images) > 10:
-            raise serializers.ValidationError("Maximum of 10 images allowed per ad.")
+        # Existing images are counted under a row lock when saving, see ``Ad.add_images``.
+        if len(images) > MAX_IMAGES:
+            raise serializers.ValidationError(f"Maximum of {MAX_IMAGES} images allowed per ad.")
 
         lat = attrs.get("latitude")
         lng = attrs.get("longitude")
@@ -219,7 +239,8 @@ class AdCreateUpdateSerializer(serializers.ModelSerializer):
         ad = Ad.objects.create(owner=user, status=AdStatus.PENDING, **validated_data)
         if amenities:
             ad.amenities.set(amenities)
-        self._create_images(ad, images)
+        if images:
+            add_images(ad, [AdImage(image=image, order=None) for image in images])
         return ad
 
     @transaction.atomic
@@ -239,13 +260,44 @@ class AdCreateUpdateSerializer(serializers.ModelSerializer):
         if amenities is not None:
             instance.amenities.set(amenities)
         if images:
-            self._create_images(instance, images)
+            add_images(instance, [AdImage(image=image, order=None) for image in images])
         return instance
 
-    def _create_images(self, ad: Ad, images: list) -> None:
-        objects = [AdImage(ad=ad, image=img, order=i) for i, img in enumerate(images, start=ad.images.count())]
-        if objects:
-            AdImage.objects.bulk_create(objects)
+
+class AdImportSerializer(AdCreateUpdateSerializer):
+    """One row of a bulk import, see ``ads.bulk``.
+
+    Amenities are given as IDs or slugs and resolved against the
+    ``amenity_ids`` map in the context. Without a request in the context the
+    per-row duplicate title query is skipped; ``ads.bulk`` checks titles for
+    the whole batch at once.
+    """
+
+    amenities = serializers.ListField(child=serializers.CharField(), required=False)
+
+    class Meta(AdCreateUpdateSerializer.Meta):
+        fields = [f for f in AdCreateUpdateSerializer.Meta.fields if f not in {"id", "images"}]
+
+    def validate_amenities(self, value: list[str]) -> list[int]:
+        amenity_ids = self.context["amenity_ids"]
+        unknown = [item for item in value if item not in amenity_ids]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown amenities: {', '.join(unknown)}.")
+        return [amenity_ids[item] for item in value]
+
+
+class AdListSerializer(serializers.ListSerializer):
+    """Render many ads with ``ads.fastpath`` instead of field by field."""
+
+    def to_representation(self, data):
+        if not fastpath.supported() or not fastpath.AdRenderer.handles(self.child.fields):
+            return super().to_representation(data)
+        ads = data.all() if isinstance(data, models.manager.BaseManager) else data
+        renderer = fastpath.AdRenderer(self.child)
+        if isinstance(ads, list) and ads and isinstance(ads[0], dict):
+            # A feed page of ``AdRenderer.values()`` rows, see ``ads.fieldsets``.
+            return renderer.render(ads)
+        return renderer.render_instances(ads)
 
 
 class AdDetailSerializer(serializers.ModelSerializer):
@@ -287,20 +339,124 @@ class AdDetailSerializer(serializers.ModelSerializer):
             "updated_at",
             "moderation_note",
         ]
+        list_serializer_class = AdListSerializer
 
     def get_owner(self, obj: Ad) -> dict[str, Any]:
         owner = obj.owner
-        active_ads = owner.ads.filter(
-            status=AdStatus.APPROVED, is_active=True
-        ).count()
         return {
             "id": str(owner.pk),
             "username": getattr(owner, "email", ""),
             "full_name": getattr(owner, "full_name", ""),
-            "active_ads": active_ads,
+            "active_ads": owner.active_ads_count,
         }
 
 
+class ModerationQueueSerializer(serializers.ModelSerializer):
+    """Compact pending ad for the moderation queue; no amenities or images."""
+
+    owner = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Ad
+        fields = [
+            "id",
+            "title",
+            "owner",
+            "property_type",
+            "monthly_rent",
+            "address",
+            "image_count",
+            "created_at",
+        ]
+        read_only_fields = fields
+
+    def get_owner(self, obj: Ad) -> dict[str, Any]:
+        owner = obj.owner
+        return {"id": str(owner.pk), "username": owner.email, "full_name": owner.full_name}
+
+
+class ModerationBulkSerializer(serializers.Serializer):
+    """Input of the bulk approve/reject endpoint."""
+
+    action = serializers.ChoiceField(choices=[*ACTIONS])
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_BATCH
+    )
+    moderation_note = serializers.CharField(required=False, allow_blank=True, default="")
+
+    def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
+        if attrs["action"] == "reject" and not attrs["moderation_note"]:
+            raise serializers.ValidationError({"moderation_note": ["This field is required."]})
+        return attrs
+
+
+class ModerationSummarySerializer(serializers.Serializer):
+    """Result of a bulk moderation request."""
+
+    action = serializers.CharField()
+    updated = serializers.ListField(child=serializers.IntegerField())
+    skipped = serializers.ListField(child=serializers.IntegerField())
+
+
+class AdCardSerializer(AdDetailSerializer):
+    """Compact ad for list feeds.
+
+    Renders ``default_fields`` unless the ``fields`` context entry names
+    others from ``Meta.fields``, see ``ads.fieldsets``.
+    """
+
+    cover = serializers.SerializerMethodField()
+
+    default_fields = (
+        "id",
+        "slug",
+        "status",
+        "title",
+        "monthly_rent",
+        "property_type",
+        "bedrooms",
+        "area_m2",
+        "address",
+        "cover",
+        "created_at",
+    )
+
+    class Meta(AdDetailSerializer.Meta):
+        fields = AdDetailSerializer.Meta.fields + ["cover"]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted = self.context.get("fields") or self.default_fields
+        return {name: field for name, field in fields.items() if name in wanted}
+
+    def get_cover(self, obj: Ad) -> str | None:
+        """URL of the first image's thumbnail, falling back to the original."""
+        if hasattr(obj, "cover_image"):
+            name = obj.cover_image
+        else:
+            image = min(obj.images.all(), key=lambda image: image.order, default=None)
+            name = image and (image.thumbnail.name or image.image.name)
+        if not name:
+            return None
+        url = AdImage._meta.get_field("image").storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+class AdNearbySerializer(AdCardSerializer):
+    """Ad card plus the distance from the searched point."""
+
+    distance_km = serializers.SerializerMethodField()
+
+    default_fields = AdCardSerializer.default_fields + ("distance_km",)
+
+    class Meta(AdCardSerializer.Meta):
+        fields = AdCardSerializer.Meta.fields + ["distance_km"]
+
+    def get_distance_km(self, obj: Ad) -> float:
+        return round(obj.distance_km, 3)
+
+
 class AdMapSerializer(serializers.ModelSerializer):
     """Serializer for lightweight ad location data."""
 
@@ -316,3 +472,34 @@ class AdMapSerializer(serializers.ModelSerializer):
         model = Ad
         fields = ["id", "latitude", "longitude", "price"]
         read_only_fields = fields
+
+
+class AdClusterSerializer(serializers.Serializer):
+    """Aggregated map cell returned by the clustered locations endpoint."""
+
+    count = serializers.IntegerField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    min_price = serializers.IntegerField()
+    max_price = serializers.IntegerField()
+
+
+class AdStatsSerializer(serializers.ModelSerializer):
+    """Precomputed counts and rent percentiles of one ``AdStats`` row."""
+
+    total = serializers.IntegerField(read_only=True)
+    rent = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AdStats
+        fields = ["available", "pending", "rented", "total", "rent", "updated_at"]
+        read_only_fields = fields
+
+    def get_rent(self, obj: AdStats) -> dict[str, int | None]:
+        return {
+            "min": obj.rent_min,
+            "p25": obj.rent_p25,
+            "median": obj.rent_median,
+            "p75": obj.rent_p75,
+            "max": obj.rent_max,
+        }
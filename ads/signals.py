@@ -2,12 +2,32 @@ from __future__ import annotations
 
 from uuid import uuid4
 
-from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_save
+from django.contrib.auth import get_user_model
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.text import slugify
 
-from .models import Ad, AdImage
+from .cache import bump_version
+from .geo import encode_geohash
+from .models import Ad, AdImage, Amenity, SimilarAdRefresh, recount_active_ads
+from .search import get_search_backend
+from .stats import apply_transition
+
+User = get_user_model()
+
+_UNKNOWN = object()
+_COUNTER_UPDATE_FIELDS = frozenset({"owner", "owner_id", "status", "is_active"})
+_SEARCH_FIELDS = frozenset({"title", "address", "description"})
+
+
+def _adjust_active_ads(owner_id, delta: int) -> None:
+    users = User.objects.filter(pk=owner_id)
+    if delta < 0:
+        users = users.filter(active_ads_count__gt=0)
+    users.update(active_ads_count=F("active_ads_count") + delta)
 
 
 @receiver(pre_save, sender=Ad)
@@ -18,8 +38,142 @@ def set_ad_slug(sender, instance: Ad, **kwargs) -> None:
         instance.slug = f"{base}-{uuid4().hex[:6]}"
 
 
-@receiver(pre_save, sender=AdImage)
-def limit_images(sender, instance: AdImage, **kwargs) -> None:
-    """Ensure no more than 10 images are attached to an ad."""
-    if instance.ad_id and instance.ad.images.exclude(pk=instance.pk).count() >= 10:
-        raise ValidationError("An ad cannot have more than 10 images.")
+@receiver(pre_save, sender=Ad)
+def set_ad_geohash(sender, instance: Ad, **kwargs) -> None:
+    """Keep the spatial lookup key in sync with the coordinates."""
+    if instance.latitude is None or instance.longitude is None:
+        instance.geohash = ""
+    else:
+        instance.geohash = encode_geohash(instance.latitude, instance.longitude)
+
+
+@receiver(post_save, sender=Ad)
+def sync_owner_active_ads(sender, instance: Ad, created: bool, update_fields=None, **kwargs) -> None:
+    """Keep ``User.active_ads_count`` in step with approvals, archiving and soft deletes."""
+    if update_fields is not None and _COUNTER_UPDATE_FIELDS.isdisjoint(update_fields):
+        return
+    previous = None if created else getattr(instance, "_counted_owner", _UNKNOWN)
+    current = instance.counted_owner_id()
+    if previous is _UNKNOWN:
+        # Loaded without the counter fields; fall back to a targeted recount.
+        recount_active_ads([instance.owner_id])
+        if Ad.owner.is_cached(instance):
+            instance.owner.refresh_from_db(fields=["active_ads_count"])
+    elif previous != current:
+        if previous is not None:
+            _adjust_active_ads(previous, -1)
+        if current is not None:
+            _adjust_active_ads(current, 1)
+        if Ad.owner.is_cached(instance):
+            # Mirror the change on the loaded owner so the response is current.
+            owner = instance.owner
+            owner.active_ads_count = max(
+                owner.active_ads_count
+                + (owner.pk == current)
+                - (owner.pk == previous),
+                0,
+            )
+    instance._counted_owner = current
+
+
+@receiver(post_delete, sender=Ad)
+def release_owner_active_ad(sender, instance: Ad, **kwargs) -> None:
+    """Decrement the owner's counter when a counted ad is hard deleted."""
+    previous = getattr(instance, "_counted_owner", instance.counted_owner_id())
+    if previous is not None:
+        _adjust_active_ads(previous, -1)
+
+
+@receiver(pre_save, sender=Ad)
+def load_ad_stats_key(sender, instance: Ad, update_fields=None, **kwargs) -> None:
+    """Read the stored bucket of an ad loaded without the ``STATS_FIELDS``."""
+    if instance.pk is None or hasattr(instance, "_stats_key"):
+        return
+    if update_fields is not None and Ad.STATS_FIELDS.isdisjoint(update_fields):
+        return
+    stored = Ad.objects.only(*Ad.STATS_FIELDS).filter(pk=instance.pk).first()
+    instance._stats_key = stored._stats_key if stored is not None else None
+
+
+@receiver(post_save, sender=Ad)
+def update_ad_stats(sender, instance: Ad, created: bool, update_fields=None, **kwargs) -> None:
+    """Move the ad between ``AdStats`` buckets on transitions, soft deletes and price changes."""
+    if update_fields is not None and Ad.STATS_FIELDS.isdisjoint(update_fields):
+        return
+    previous = None if created else instance._stats_key
+    current = instance.stats_key()
+    apply_transition(previous, current)
+    instance._stats_key = current
+
+
+@receiver(post_delete, sender=Ad)
+def release_ad_stats(sender, instance: Ad, **kwargs) -> None:
+    """Drop a hard deleted ad from its ``AdStats`` bucket."""
+    apply_transition(getattr(instance, "_stats_key", instance.stats_key()), None)
+
+
+@receiver(post_save, sender=Ad)
+def queue_similar_ads_refresh(sender, instance: Ad, created: bool, update_fields=None, **kwargs) -> None:
+    """Queue the ad for the similar-ads worker when it is approved, delisted or its features change."""
+    if update_fields is not None and Ad.SIMILARITY_FIELDS.isdisjoint(update_fields):
+        return
+    previous = None if created else getattr(instance, "_similarity_key", _UNKNOWN)
+    current = instance.similarity_key()
+    if previous != current:
+        SimilarAdRefresh.request([instance.pk])
+    instance._similarity_key = current
+
+
+@receiver(m2m_changed, sender=Ad.amenities.through)
+def queue_similar_ads_for_amenities(sender, instance, action: str, reverse: bool, pk_set=None, **kwargs) -> None:
+    """Amenity overlap is scored too, so re-queue listed ads whose amenities changed."""
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        # Changed from the amenity side; ``pk_set`` holds ad IDs (None on clear).
+        ads = Ad.objects.publicly_active().filter(pk__in=pk_set or [])
+        SimilarAdRefresh.request(ads.values_list("pk", flat=True))
+    elif instance.similarity_key() is not None:
+        SimilarAdRefresh.request([instance.pk])
+
+
+@receiver(post_save, sender=Ad)
+def index_ad_for_search(sender, instance: Ad, update_fields=None, **kwargs) -> None:
+    """Refresh the full-text index when searchable text changes."""
+    if update_fields is not None and _SEARCH_FIELDS.isdisjoint(update_fields):
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Ad)
+def unindex_ad_for_search(sender, instance: Ad, **kwargs) -> None:
+    """Remove a deleted ad from the full-text index."""
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=AdImage)
+@receiver(post_delete, sender=AdImage)
+def touch_ad_for_image(sender, instance: AdImage, signal, created: bool = False, **kwargs) -> None:
+    """Move the ad's ``updated_at`` forward so ``Last-Modified`` covers its images.
+
+    The same update keeps ``image_count`` in step with images saved or
+    deleted one at a time; ``Ad.add_images`` counts its own batches.
+    """
+    changes = {"updated_at": timezone.now()}
+    if created:
+        changes["image_count"] = F("image_count") + 1
+    elif signal is post_delete:
+        changes["image_count"] = Greatest(F("image_count") - 1, Value(0))
+    Ad.objects.filter(pk=instance.ad_id).update(**changes)
+
+
+@receiver(post_save, sender=Ad)
+@receiver(post_delete, sender=Ad)
+@receiver(post_save, sender=AdImage)
+@receiver(post_delete, sender=AdImage)
+@receiver(post_save, sender=Amenity)
+@receiver(post_delete, sender=Amenity)
+@receiver(m2m_changed, sender=Ad.amenities.through)
+def invalidate_response_cache(sender, **kwargs) -> None:
+    """Drop cached ad and amenity responses after any change."""
+    bump_version()
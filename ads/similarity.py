@@ -0,0 +1,226 @@
+"""Similar-ads engine.
+
+Listed ads of one property type are loaded into compact NumPy feature arrays
+(log rent, log area, bedrooms, coordinates and an amenity matrix) and scored
+against each other in blocks. Each component is a similarity in ``[0, 1]``
+and the score is their weighted sum, so ``score(a, b) == score(b, a)``.
+
+The top ``NEIGHBORS`` of every ad are stored in ``SimilarAd`` by the
+``refresh_similar_ads`` worker, and ``/api/ads/{id}/similar/`` reads them with
+one query. The ad signals queue an ad in ``SimilarAdRefresh`` when it is
+approved, delisted or its scored fields change. Because scores are
+symmetric, the worker only rewrites the lists the change can affect: the
+changed ads, ads that listed them, and ads whose weakest neighbor now scores
+below a changed ad. The worker keeps the matrices it loaded between batches
+and reloads one only once ads were queued after it was read.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Ad, SimilarAd, SimilarAdRefresh
+
+# Neighbors stored per ad.
+NEIGHBORS = 10
+WEIGHTS = {"rent": 0.35, "area": 0.2, "bedrooms": 0.1, "distance": 0.25, "amenities": 0.1}
+# Log-ratio at which rent and area similarity fall to 1/e (about ±35%).
+RATIO_SCALE = 0.3
+# Distance at which location similarity falls to 1/e.
+DISTANCE_SCALE_KM = 3.0
+EARTH_RADIUS_KM = 6371.0
+# Rows scored at once; a block holds BLOCK x ads float32 values per component.
+BLOCK = 256
+
+
+@dataclass
+class FeatureMatrix:
+    """Feature arrays of the listed ads of one property type, indexed by row."""
+
+    property_type: str
+    ids: np.ndarray
+    rent: np.ndarray
+    area: np.ndarray
+    bedrooms: np.ndarray
+    lat: np.ndarray
+    lng: np.ndarray
+    amenities: np.ndarray
+    amenity_counts: np.ndarray
+    # Changes queued up to this time are reflected in the arrays.
+    loaded_at: datetime
+
+    @classmethod
+    def load(cls, property_type: str) -> "FeatureMatrix":
+        loaded_at = timezone.now()
+        ads = Ad.objects.publicly_active().filter(property_type=property_type)
+        rows = list(
+            ads.order_by("pk").values_list(
+                "pk", "monthly_rent", "area_m2", "bedrooms", "latitude", "longitude"
+            )
+        )
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        numeric = np.array(
+            [[float(value) if value is not None else np.nan for value in row[1:]] for row in rows],
+            dtype=np.float64,
+        ).reshape(len(rows), 5)
+        links = list(
+            Ad.amenities.through.objects.filter(ad__in=ads).values_list("ad_id", "amenity_id")
+        )
+        columns = {amenity_id: i for i, amenity_id in enumerate(sorted({a for _, a in links}))}
+        amenities = np.zeros((len(rows), len(columns)), dtype=np.float32)
+        if links:
+            positions = np.searchsorted(ids, [ad_id for ad_id, _ in links])
+            amenities[positions, [columns[a] for _, a in links]] = 1
+        return cls(
+            property_type=property_type,
+            ids=ids,
+            rent=np.log(numeric[:, 0]).astype(np.float32),
+            area=np.log(numeric[:, 1]).astype(np.float32),
+            bedrooms=numeric[:, 2].astype(np.float32),
+            lat=np.radians(numeric[:, 3]).astype(np.float32),
+            lng=np.radians(numeric[:, 4]).astype(np.float32),
+            amenities=amenities,
+            amenity_counts=amenities.sum(axis=1),
+            loaded_at=loaded_at,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def lookup(self, ad_ids) -> tuple[np.ndarray, np.ndarray]:
+        """Row positions of the given ads, and a mask of those present in the matrix."""
+        wanted = np.fromiter(ad_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, wanted)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == wanted[found]
+        return positions, found
+
+    def rows(self, ad_ids) -> np.ndarray:
+        """Row positions of the given ads that are present in the matrix."""
+        positions, found = self.lookup(ad_ids)
+        return positions[found]
+
+    def scores(self, rows: np.ndarray) -> np.ndarray:
+        """Score ``rows`` against every ad; an ad scores ``-inf`` against itself."""
+        def ratio(values: np.ndarray) -> np.ndarray:
+            return np.exp(-np.abs(values[rows, None] - values[None, :]) / RATIO_SCALE)
+
+        dlat = self.lat[rows, None] - self.lat[None, :]
+        dlng = (self.lng[rows, None] - self.lng[None, :]) * np.cos(
+            (self.lat[rows, None] + self.lat[None, :]) / 2
+        )
+        distance = EARTH_RADIUS_KM * np.sqrt(dlat**2 + dlng**2)
+        shared = self.amenities[rows] @ self.amenities.T
+        union = self.amenity_counts[rows, None] + self.amenity_counts[None, :] - shared
+        total = (
+            WEIGHTS["rent"] * ratio(self.rent)
+            + WEIGHTS["area"] * ratio(self.area)
+            + WEIGHTS["bedrooms"] / (1 + np.abs(self.bedrooms[rows, None] - self.bedrooms[None, :]))
+            # Ads without coordinates get no location credit.
+            + WEIGHTS["distance"] * np.nan_to_num(np.exp(-distance / DISTANCE_SCALE_KM))
+            + WEIGHTS["amenities"] * np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        )
+        total[np.arange(len(rows)), rows] = -np.inf
+        return total
+
+
+def top_neighbors(scores: np.ndarray, limit: int = NEIGHBORS) -> tuple[np.ndarray, np.ndarray]:
+    """Column positions and scores of the best ``limit`` entries of each row, best first."""
+    limit = min(limit, scores.shape[1] - 1)
+    if limit <= 0:
+        empty = np.empty((len(scores), 0))
+        return empty.astype(np.int64), empty
+    best = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def write_neighbors(features: FeatureMatrix, rows: np.ndarray) -> int:
+    """Recompute and store the neighbor lists of ``rows``; returns lists written."""
+    for start in range(0, len(rows), BLOCK):
+        block = rows[start : start + BLOCK]
+        best, best_scores = top_neighbors(features.scores(block))
+        ad_ids = features.ids[block]
+        with transaction.atomic():
+            SimilarAd.objects.filter(ad_id__in=ad_ids.tolist()).delete()
+            SimilarAd.objects.bulk_create(
+                [
+                    SimilarAd(
+                        ad_id=int(ad_id),
+                        neighbor_id=int(features.ids[column]),
+                        rank=rank,
+                        score=round(float(score), 6),
+                    )
+                    for ad_id, columns, scores in zip(ad_ids, best, best_scores)
+                    for rank, (column, score) in enumerate(zip(columns, scores))
+                ]
+            )
+    return len(rows)
+
+
+def weakest_scores(features: FeatureMatrix) -> np.ndarray:
+    """Score of each ad's last stored neighbor; ``-inf`` where the list has room."""
+    weakest = np.full(len(features), -np.inf, dtype=np.float32)
+    stored = list(
+        SimilarAd.objects.filter(
+            ad__property_type=features.property_type, rank=NEIGHBORS - 1
+        ).values_list("ad_id", "score")
+    )
+    if stored:
+        ad_ids, scores = zip(*stored)
+        positions, found = features.lookup(ad_ids)
+        weakest[positions[found]] = np.array(scores, dtype=np.float32)[found]
+    return weakest
+
+
+def rebuild_similar_ads() -> int:
+    """Recompute every neighbor list and empty the refresh queue."""
+    started = timezone.now()
+    written = 0
+    for property_type in Ad.objects.order_by().values_list("property_type", flat=True).distinct():
+        features = FeatureMatrix.load(property_type)
+        written += write_neighbors(features, np.arange(len(features)))
+    SimilarAd.objects.exclude(ad__in=Ad.objects.publicly_active()).delete()
+    SimilarAdRefresh.objects.filter(requested_at__lte=started).delete()
+    return written
+
+
+def refresh_similar_ads(limit: int = 100, matrices: dict[str, FeatureMatrix] | None = None) -> int:
+    """Process up to ``limit`` queued ads; returns the number of ads taken off the queue.
+
+    ``matrices`` caches the feature matrices by property type across calls.
+    """
+    started = timezone.now()
+    queued = list(
+        SimilarAdRefresh.objects.order_by("requested_at").values_list("ad_id", "requested_at")[:limit]
+    )
+    if not queued:
+        return 0
+    matrices = {} if matrices is None else matrices
+    changed = [ad_id for ad_id, _ in queued]
+    newest = queued[-1][1]
+    affected = set(changed) | set(
+        SimilarAd.objects.filter(neighbor_id__in=changed).values_list("ad_id", flat=True)
+    )
+    types = dict(Ad.objects.filter(pk__in=affected).values_list("pk", "property_type"))
+    for property_type in set(types.values()):
+        features = matrices.get(property_type)
+        if features is None or features.loaded_at < newest:
+            features = matrices[property_type] = FeatureMatrix.load(property_type)
+        targets = {ad_id for ad_id in affected if types.get(ad_id) == property_type}
+        sources = features.rows(ad_id for ad_id in changed if types.get(ad_id) == property_type)
+        if len(sources):
+            beaten = (features.scores(sources) > weakest_scores(features)).any(axis=0)
+            targets.update(features.ids[beaten].tolist())
+        write_neighbors(features, features.rows(targets))
+    # Delisted ads keep no list of their own.
+    SimilarAd.objects.filter(ad_id__in=changed).exclude(
+        ad__in=Ad.objects.publicly_active()
+    ).delete()
+    SimilarAdRefresh.objects.filter(ad_id__in=changed, requested_at__lte=started).delete()
+    return len(changed)
@@ -0,0 +1,149 @@
+"""Precomputed ad statistics.
+
+``/api/ads/stats/`` reads one ``AdStats`` row instead of grouping the ads
+table. The ad signals call :func:`apply_transition` with the ad's old and new
+``Ad.stats_key()``: counters move with ``F()`` updates, and a bucket whose
+available ads change is only flagged ``rents_stale``. The windowed query that
+re-reads its rent percentiles runs in :func:`refresh_rents` when the stats
+endpoint next serves the bucket, so a burst of writes costs one refresh.
+Bulk writers use :func:`add_ads` and :func:`apply_transitions`; other queryset
+``update()`` calls skip the signals, so run ``reconcile_ad_stats`` after such
+writes and periodically to repair drift.
+"""
+from __future__ import annotations
+
+from collections import Counter
+
+from django.db.models import Count, F, Value, Window
+from django.db.models.functions import Greatest, RowNumber
+from django.utils import timezone
+
+from .models import STATS_COLUMNS, Ad, AdStats, AdStatus, PropertyType
+
+# Nearest-rank quantile stored in each rent column.
+RENT_FIELDS = {
+    "rent_min": 0.0,
+    "rent_p25": 0.25,
+    "rent_median": 0.5,
+    "rent_p75": 0.75,
+    "rent_max": 1.0,
+}
+
+
+def rent_percentiles(queryset, count: int) -> dict:
+    """Rent percentiles of the ``count`` available ads in ``queryset``."""
+    if not count:
+        return dict.fromkeys(RENT_FIELDS)
+    ranks = {field: round(q * (count - 1)) + 1 for field, q in RENT_FIELDS.items()}
+    rents = dict(
+        queryset.filter(status=AdStatus.APPROVED, is_active=True)
+        .annotate(rank=Window(RowNumber(), order_by=[F("monthly_rent").asc(), F("id").asc()]))
+        .filter(rank__in=set(ranks.values()))
+        .values_list("rank", "monthly_rent")
+    )
+    return {field: rents.get(rank) for field, rank in ranks.items()}
+
+
+def compute_stats(queryset) -> dict[str, dict]:
+    """Return ``AdStats`` field values keyed by property type for ``queryset``."""
+    def empty() -> dict:
+        return dict.fromkeys(STATS_COLUMNS.values(), 0)
+
+    rows = {property_type: empty() for property_type in [AdStats.ALL_TYPES, *PropertyType.values]}
+    counts = (
+        queryset.filter(is_active=True, status__in=list(STATS_COLUMNS))
+        .order_by()
+        .values_list("property_type", "status")
+        .annotate(total=Count("pk"))
+    )
+    for property_type, status, total in counts:
+        column = STATS_COLUMNS[status]
+        rows[AdStats.ALL_TYPES][column] += total
+        rows.setdefault(property_type, empty())[column] += total
+    for property_type, row in rows.items():
+        scope = queryset if property_type == AdStats.ALL_TYPES else queryset.filter(property_type=property_type)
+        row.update(rent_percentiles(scope, row["available"]))
+    return rows
+
+
+def recompute_ad_stats() -> int:
+    """Rebuild ``AdStats`` from the ads table; returns the number of rows written."""
+    existing = AdStats.objects.in_bulk(field_name="property_type")
+    now = timezone.now()
+    created, changed = [], []
+    for property_type, values in compute_stats(Ad.objects.all()).items():
+        values["rents_stale"] = False
+        row = existing.get(property_type)
+        if row is None:
+            created.append(AdStats(property_type=property_type, **values))
+        elif any(getattr(row, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(row, field, value)
+            row.updated_at = now
+            changed.append(row)
+    AdStats.objects.bulk_create(created)
+    AdStats.objects.bulk_update(changed, [*STATS_COLUMNS.values(), *RENT_FIELDS, "rents_stale", "updated_at"])
+    return len(created) + len(changed)
+
+
+def refresh_rents(row: AdStats) -> AdStats:
+    """Re-read the rent percentiles of a ``rents_stale`` row and clear the flag."""
+    # Cleared first, so a write landing during the refresh flags the row again.
+    AdStats.objects.filter(pk=row.pk).update(rents_stale=False)
+    scope = Ad.objects.all()
+    if row.property_type != AdStats.ALL_TYPES:
+        scope = scope.filter(property_type=row.property_type)
+    rents = rent_percentiles(scope, row.available)
+    AdStats.objects.filter(pk=row.pk).update(**rents)
+    for field, value in rents.items():
+        setattr(row, field, value)
+    row.rents_stale = False
+    return row
+
+
+def _adjust(column: str, property_type: str, delta: int) -> bool:
+    """Shift a counter of the type's row and the all-types row.
+
+    Returns ``False`` when a row is missing.
+    """
+    rows = AdStats.objects.filter(property_type__in=[AdStats.ALL_TYPES, property_type])
+    updated = rows.update(
+        **{column: Greatest(F(column) + delta, Value(0)), "updated_at": timezone.now()}
+    )
+    return updated == 2
+
+
+def apply_transitions(pairs) -> None:
+    """Move ads between stats buckets with one update per changed bucket.
+
+    ``pairs`` holds ``(previous, current)`` ``Ad.stats_key()`` values; ``None``
+    stands for an ad that is not counted, e.g. a new or deleted one.
+    """
+    deltas: Counter = Counter()
+    stale = set()
+    available = STATS_COLUMNS[AdStatus.APPROVED]
+    for previous, current in pairs:
+        if previous == current:
+            continue
+        if previous:
+            deltas[previous[:2]] -= 1
+        if current:
+            deltas[current[:2]] += 1
+        stale.update(key[1] for key in (previous, current) if key and key[0] == available)
+    for (column, property_type), delta in deltas.items():
+        if delta and not _adjust(column, property_type, delta):
+            # First ad of a type without a row yet.
+            recompute_ad_stats()
+            return
+    if stale:
+        AdStats.objects.filter(property_type__in=[AdStats.ALL_TYPES, *stale]).update(rents_stale=True)
+
+
+def add_ads(ads) -> None:
+    """Count ads saved without signals, e.g. by ``bulk_create``."""
+    apply_transitions((None, ad.stats_key()) for ad in ads)
+
+
+def apply_transition(previous, current) -> None:
+    """Move one ad between stats buckets; arguments are ``Ad.stats_key()`` values."""
+    apply_transitions([(previous, current)])
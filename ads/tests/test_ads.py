@@ -1,16 +1,55 @@
 from __future__ import annotations
 
 import base64
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
 from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from PIL import Image
 
-from ads.models import Ad, AdStatus, Amenity
+from ads.bulk import aiter_lines
+from ads.cache import metrics as response_cache_metrics
+from ads.fastpath import AdRenderer
+from ads.fieldsets import feed_queryset
+from ads.geo import encode_geohash, within_radius
+from ads.images import process_pending_images, variant_format
+from ads.models import (
+    Ad,
+    AdImage,
+    AdStats,
+    AdStatus,
+    Amenity,
+    SimilarAd,
+    SimilarAdRefresh,
+    VariantStatus,
+)
+from ads.serializers import AdCardSerializer, AdDetailSerializer, AdNearbySerializer
+from ads.similarity import FeatureMatrix, refresh_similar_ads
+from ads.stats import refresh_rents
+from ads.uploads import InvalidImage, decode_base64_image
+from uyqidir_backend.asgi import ASYNC_URLCONF
+from uyqidir_backend.metrics import QueryBudgetExceeded, registry
 
 User = get_user_model()
 
@@ -23,7 +62,16 @@ def generate_image(name: str = "test.gif") -> SimpleUploadedFile:
     return SimpleUploadedFile(name, MIN_GIF, content_type="image/gif")
 
 
+MEDIA_ROOT = tempfile.mkdtemp(prefix="ads-tests-")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
 class AdTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self) -> None:
         cache.clear()
         self.user = User.objects.create_user(
@@ -204,6 +252,45 @@ class AdTests(APITestCase):
         )
         self.assertEqual(resp2.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_image_count_is_tracked_without_counting_images(self):
+        def image_queries(ctx) -> tuple[int, int]:
+            sqls = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+            counts = sum("COUNT(" in sql and '"ads_adimage"' in sql for sql in sqls)
+            locked_reads = sum(sql.startswith('SELECT "ads_ad"."image_count"') for sql in sqls)
+            return counts, locked_reads
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.create_ad(title="Counted", images=[generate_image(f"{i}.gif") for i in range(3)])
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(image_queries(ctx), (0, 1))
+        ad = Ad.objects.get(pk=resp.data["id"])
+        self.assertEqual(ad.image_count, 3)
+
+        url = reverse("ad-detail", args=[ad.pk])
+        images = [generate_image(f"more{i}.gif") for i in range(7)]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.patch(url, {"images": images}, format="multipart")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(image_queries(ctx), (0, 1))
+        ad.refresh_from_db()
+        self.assertEqual(ad.image_count, 10)
+        self.assertEqual(sorted(ad.images.values_list("order", flat=True)), [*range(10)])
+
+        resp = self.client.patch(url, {"images": [generate_image("over.gif")]}, format="multipart")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        image = ad.images.order_by("-order").first()
+        resp = self.client.delete(reverse("ad-delete-image", args=[ad.pk, image.pk]))
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(
+                reverse("ad-images", args=[ad.pk]), {"image": generate_image("last.gif")}, format="multipart"
+            )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data["order"], 9)
+        self.assertEqual(image_queries(ctx), (0, 1))
+        ad.refresh_from_db()
+        self.assertEqual((ad.image_count, ad.images.count()), (10, 10))
+
     def test_permissions_and_updates(self):
         resp = self.create_ad(title="House 3")
         ad_id = resp.data["id"]
@@ -322,7 +409,7 @@ class AdTests(APITestCase):
         self.assertEqual(resp_json["latitude"], 41.123456)
         self.assertIsInstance(resp_json["longitude"], float)
 
-        list_resp = self.client.get(self.list_url)
+        list_resp = self.client.get(self.list_url, {"expand": "latitude,longitude"})
         list_json = list_resp.json()
         self.assertIsInstance(list_json["results"][0]["latitude"], float)
 
@@ -350,6 +437,13 @@ class AdTests(APITestCase):
         self.assertEqual(resp.data["rented"], 1)
         self.assertEqual(resp.data["total"], 3)
 
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse("ad-stats"), {"property_type": "APARTMENT"})
+        self.assertEqual(resp.data["total"], 0)
+        self.assertIsNone(resp.data["rent"]["median"])
+        resp = self.client.get(reverse("ad-stats"), {"property_type": "CASTLE"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_owner_info_and_similar_endpoint(self):
         # Main ad
         resp = self.create_ad(title="Main")
@@ -421,3 +515,830 @@ class AdTests(APITestCase):
         resp = self.client.get(reverse("my-ad-list"))
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(len(resp.data.get("results", [])), 0)
+
+    def make_ad(self, owner=None, **kwargs) -> Ad:
+        data = {
+            "owner": owner or self.user,
+            "title": f"Ad {Ad.objects.count()}",
+            "description": "Nice place",
+            "monthly_rent": 1000,
+            "property_type": "HOUSE",
+            "area_m2": 50,
+            "address": "Main street",
+            "latitude": Decimal("41.3"),
+            "longitude": Decimal("69.2"),
+            "status": AdStatus.APPROVED,
+        }
+        data.update(kwargs)
+        return Ad.objects.create(**data)
+
+    def test_active_ads_counter_tracks_moderation_and_soft_delete(self):
+        resp = self.create_ad(title="Counted")
+        ad_id = resp.data["id"]
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 0)
+
+        self.authenticate(self.admin)
+        approve = self.client.post(reverse("ad-approve", args=[ad_id]), {})
+        self.assertEqual(approve.data["owner"]["active_ads"], 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 1)
+
+        self.client.post(reverse("ad-reject", args=[ad_id]), {"moderation_note": "No"})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 0)
+
+        ad = self.make_ad()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 1)
+        self.client.delete(reverse("ad-detail", args=[ad.id]))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 0)
+
+        archived = self.make_ad()
+        archived.status = AdStatus.ARCHIVED
+        archived.save(update_fields=["status", "updated_at"])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 0)
+
+    def test_reconcile_active_ads_command(self):
+        self.make_ad()
+        self.make_ad()
+        Ad.objects.filter(owner=self.user).update(is_active=True)
+        User.objects.filter(pk=self.user.pk).update(active_ads_count=7)
+        User.objects.filter(pk=self.other.pk).update(active_ads_count=3)
+        call_command("reconcile_active_ads", stdout=StringIO())
+        self.user.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 2)
+        self.assertEqual(self.other.active_ads_count, 0)
+
+    def test_ad_stats_follow_transitions_and_reconcile(self):
+        def stats(property_type: str = AdStats.ALL_TYPES) -> AdStats:
+            row = AdStats.objects.get(property_type=property_type)
+            return refresh_rents(row) if row.rents_stale else row
+
+        for rent in (1000, 2000, 3000, 4000):
+            self.make_ad(monthly_rent=rent)
+        apartment = self.make_ad(monthly_rent=9000, property_type="APARTMENT", status=AdStatus.PENDING)
+        row = stats()
+        self.assertEqual((row.available, row.pending, row.rented), (4, 1, 0))
+        self.assertEqual((row.rent_min, row.rent_median, row.rent_max), (1000, 3000, 4000))
+        self.assertEqual(stats("HOUSE").rent_p25, 2000)
+
+        apartment.status = AdStatus.APPROVED
+        apartment.save(update_fields=["status", "updated_at"])
+        self.assertEqual((stats().available, stats().pending), (5, 0))
+        self.assertEqual(stats().rent_max, 9000)
+        self.assertEqual(stats("APARTMENT").rent_median, 9000)
+
+        house = Ad.objects.filter(property_type="HOUSE").order_by("monthly_rent").first()
+        house.monthly_rent = 5000
+        with CaptureQueriesContext(connection) as ctx:
+            house.save()
+        # Percentiles are re-read on the next stats read, not on every save.
+        self.assertFalse(any("ROW_NUMBER" in query["sql"] for query in ctx.captured_queries))
+        self.assertTrue(AdStats.objects.get(property_type="HOUSE").rents_stale)
+        self.assertFalse(AdStats.objects.get(property_type="APARTMENT").rents_stale)
+        resp = self.client.get(reverse("ad-stats"), {"property_type": "HOUSE"})
+        self.assertEqual((resp.data["rent"]["min"], resp.data["rent"]["max"]), (2000, 5000))
+        self.assertFalse(AdStats.objects.get(property_type="HOUSE").rents_stale)
+
+        # Loaded without the bucket fields: one lookup of the stored bucket, no rebuild.
+        lean = Ad.objects.only("id", "title").get(pk=house.pk)
+        lean.status = AdStatus.ARCHIVED
+        with CaptureQueriesContext(connection) as ctx:
+            lean.save()
+        stats_queries = [query["sql"] for query in ctx.captured_queries if '"ads_adstats"' in query["sql"]]
+        self.assertTrue(all(sql.startswith('UPDATE "ads_adstats"') for sql in stats_queries))
+        self.assertEqual((stats("HOUSE").available, stats("HOUSE").rented), (3, 1))
+        lean.status = AdStatus.APPROVED
+        lean.save()
+        self.assertEqual((stats("HOUSE").available, stats("HOUSE").rented), (4, 0))
+        self.assertEqual(stats("HOUSE").rent_min, 2000)
+        self.authenticate(self.admin)
+        self.client.delete(reverse("ad-detail", args=[house.pk]))
+        self.assertEqual(stats("HOUSE").available, 3)
+        self.assertEqual(stats().available, 4)
+        apartment.delete()
+        self.assertEqual((stats().available, stats().rent_max), (3, 4000))
+
+        AdStats.objects.update(available=50, rent_median=None)
+        call_command("reconcile_ad_stats", stdout=StringIO())
+        self.assertEqual((stats().available, stats().rent_median), (3, 3000))
+        self.assertEqual(stats("APARTMENT").available, 0)
+
+    def test_similar_ads_are_precomputed_and_refreshed(self):
+        main = self.make_ad(monthly_rent=5000, area_m2=60, bedrooms=2)
+        close = self.make_ad(monthly_rent=5200, area_m2=62, bedrooms=2)
+        far = self.make_ad(monthly_rent=5000, area_m2=60, bedrooms=2, latitude=Decimal("41.6"))
+        pricey = self.make_ad(monthly_rent=40000, area_m2=200, bedrooms=5)
+        self.make_ad(monthly_rent=5000, area_m2=60, bedrooms=2, property_type="APARTMENT")
+        pending = self.make_ad(monthly_rent=5000, area_m2=60, bedrooms=2, status=AdStatus.PENDING)
+        self.assertEqual(SimilarAdRefresh.objects.count(), 5)
+
+        # Batches reuse the matrix of each type until newer changes are queued.
+        matrices = {}
+        with mock.patch.object(FeatureMatrix, "load", wraps=FeatureMatrix.load) as load:
+            while refresh_similar_ads(2, matrices):
+                pass
+        self.assertEqual(sorted(call.args[0] for call in load.call_args_list), ["APARTMENT", "HOUSE"])
+        self.assertFalse(SimilarAdRefresh.objects.exists())
+        url = reverse("ad-similar", args=[main.pk])
+        resp = self.client.get(url)
+        self.assertEqual([item["id"] for item in resp.data], [close.pk, far.pk, pricey.pk])
+
+        pending.status = AdStatus.APPROVED
+        pending.save(update_fields=["status", "updated_at"])
+        close.monthly_rent = 60000
+        close.save()
+        self.assertEqual(SimilarAdRefresh.objects.count(), 2)
+        call_command("refresh_similar_ads", stdout=StringIO())
+        resp = self.client.get(url)
+        self.assertEqual([item["id"] for item in resp.data], [pending.pk, far.pk, close.pk])
+
+        far.is_active = False
+        far.save(update_fields=["is_active", "updated_at"])
+        call_command("refresh_similar_ads", stdout=StringIO())
+        self.assertFalse(SimilarAd.objects.filter(ad=far).exists())
+        self.assertFalse(SimilarAd.objects.filter(neighbor=far).exists())
+
+    def test_agency_bulk_import_and_export(self):
+        import_url = reverse("my-ad-bulk-import")
+        Amenity.objects.create(name="Parking", slug="parking")
+        self.make_ad(title="Existing", status=AdStatus.PENDING)
+        self.authenticate(self.user)
+        upload = SimpleUploadedFile("ads.csv", b"title\nNope\n", content_type="text/csv")
+        resp = self.client.post(import_url, {"file": upload}, format="multipart")
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_agency = True
+        self.user.save(update_fields=["is_agency"])
+        row = {
+            "description": "Nice place",
+            "monthly_rent": 3000,
+            "property_type": "APARTMENT",
+            "area_m2": "45.5",
+            "address": "Chilonzor",
+            "latitude": 41.28,
+            "longitude": 69.2,
+        }
+        lines = [
+            json.dumps({**row, "title": f"Bulk {i}", "amenities": ["parking", self.amenity.id]})
+            for i in range(30)
+        ]
+        lines += [
+            json.dumps({**row, "title": "Existing"}),
+            json.dumps({**row, "title": "Bulk 0"}),
+            json.dumps({**row, "title": "Cheap", "monthly_rent": 0}),
+            json.dumps({**row, "title": "Pool", "amenities": ["pool"]}),
+            "{broken",
+        ]
+        upload = SimpleUploadedFile("ads.jsonl", "\n".join(lines).encode())
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.post(import_url, {"file": upload}, format="multipart")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertLess(len(queries), 12)
+        self.assertEqual(len(resp.data["created"]), 30)
+        self.assertEqual([error["row"] for error in resp.data["errors"]], [31, 32, 33, 34, 35])
+        self.assertIn("title", resp.data["errors"][0]["errors"])
+        self.assertIn("monthly_rent", resp.data["errors"][2]["errors"])
+        self.assertIn("amenities", resp.data["errors"][3]["errors"])
+        ad = Ad.objects.get(title="Bulk 7")
+        self.assertEqual((ad.status, ad.contact_name), (AdStatus.PENDING, "User"))
+        self.assertTrue(ad.slug.startswith("bulk-7-"))
+        self.assertEqual(ad.geohash, encode_geohash(ad.latitude, ad.longitude))
+        self.assertEqual(ad.amenities.count(), 2)
+        self.assertEqual(AdStats.objects.get(property_type="APARTMENT").pending, 30)
+
+        resp = self.client.get(reverse("my-ad-export", args=["csv"]))
+        self.assertEqual(resp["Content-Type"], "text/csv; charset=utf-8")
+        content = b"".join(resp.streaming_content)
+        exported = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(len(exported), 31)
+        self.assertEqual(exported[-1]["amenities"], "elevator|parking")
+        resp = self.client.get(reverse("my-ad-export", args=["jsonl"]))
+        self.assertEqual(json.loads(next(iter(resp.streaming_content)))["title"], "Existing")
+
+        # An export re-imports as is.
+        Ad.objects.filter(owner=self.user).delete()
+        upload = SimpleUploadedFile("ads.csv", content, content_type="text/csv")
+        resp = self.client.post(import_url, {"file": upload}, format="multipart")
+        self.assertEqual((len(resp.data["created"]), resp.data["errors"]), (31, []))
+
+    def test_bulk_import_rejects_unreadable_files(self):
+        self.user.is_agency = True
+        self.user.save(update_fields=["is_agency"])
+        self.authenticate(self.user)
+        uploads = [
+            ("ads.csv", "title,address\nOk,Chilonzor\nCafé,Yunusobod\n".encode("latin-1"), "Line 3"),
+            ("ads.jsonl", b'{"title": "Ok"}\n{"title": "\xff"}\n', "Line 2"),
+            ("ads.csv", b"title,description\nOk,fine\nBig," + b"x" * 140_000 + b"\n", "Line 3"),
+        ]
+        for name, content, line in uploads:
+            upload = SimpleUploadedFile(name, content, content_type="text/csv" if name.endswith(".csv") else "")
+            resp = self.client.post(reverse("my-ad-bulk-import"), {"file": upload}, format="multipart")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, name)
+            self.assertTrue(resp.data["detail"].startswith(line), resp.data)
+        self.assertFalse(Ad.objects.exists())
+
+    def test_staff_inventory_export(self):
+        house = self.make_ad(monthly_rent=1500)
+        house.amenities.add(self.amenity)
+        AdImage.objects.create(ad=house, image=generate_image(), order=0)
+        self.make_ad(owner=self.other, property_type="APARTMENT", status=AdStatus.PENDING)
+        url = reverse("ad-export", args=["csv"])
+        self.authenticate(self.user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.authenticate(self.admin)
+        resp = self.client.get(url, {"property_type": "HOUSE"})
+        rows = list(csv.DictReader(io.StringIO(b"".join(resp.streaming_content).decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            (rows[0]["owner_email"], rows[0]["amenities"], rows[0]["image_count"]),
+            ("user@example.com", "elevator", "1"),
+        )
+        resp = self.client.get(reverse("ad-export", args=["jsonl"]), {"status": "PENDING"})
+        lines = b"".join(resp.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)["owner_name"] for line in lines], ["Other"])
+        resp = self.client.get(url, {"status": "NOPE"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Django buffers sync iterators under ASGI, so exports stream an async one there.
+        resp = self.client.get(url)
+        self.assertFalse(resp.is_async)
+        sync_body = b"".join(resp.streaming_content)
+        client = AsyncClient()
+
+        async def fetch(path: str, user: User):
+            response = await client.get(path, headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"})
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        resp, body = async_to_sync(fetch)(url, self.admin)
+        self.assertTrue(resp.is_async)
+        self.assertEqual(body, sync_body)
+        resp, body = async_to_sync(fetch)(reverse("my-ad-export", args=["jsonl"]), self.user)
+        self.assertTrue(resp.is_async)
+        self.assertEqual(len(body.splitlines()), 1)
+
+        async def batches(lines):
+            return [chunk async for chunk in aiter_lines(iter(lines), batch_size=2)]
+
+        self.assertEqual(async_to_sync(batches)(["a\n", "b\n", "c\n"]), ["a\nb\n", "c\n"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ads.jsonl.gz")
+            call_command("export_ads", path, "--format", "jsonl", "--filter", "is_active=true", stderr=StringIO())
+            with gzip.open(path, "rt") as exported:
+                self.assertEqual(len(exported.readlines()), 2)
+
+    def test_bulk_moderation_and_queue(self):
+        pending = [
+            self.make_ad(title=f"Pending {i}", monthly_rent=1000 * (i + 1), status=AdStatus.PENDING)
+            for i in range(4)
+        ]
+        withdrawn = self.make_ad(title="Withdrawn", status=AdStatus.PENDING, is_active=False)
+        AdImage.objects.create(ad=pending[0], image=generate_image())
+        approved = self.make_ad(title="Listed")
+        queue_url = reverse("ad-moderation-list")
+        bulk_url = reverse("ad-moderation-bulk")
+
+        self.authenticate(self.user)
+        self.assertEqual(self.client.get(queue_url).status_code, status.HTTP_403_FORBIDDEN)
+        resp = self.client.post(bulk_url, {"action": "approve", "ids": [pending[0].pk]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.authenticate(self.admin)
+        resp = self.client.get(queue_url)
+        self.assertEqual([item["id"] for item in resp.data["results"]], [ad.pk for ad in pending])
+        self.assertEqual(resp.data["results"][0]["image_count"], 1)
+        self.assertEqual(resp.data["results"][0]["owner"]["username"], self.user.email)
+        self.assertNotIn("images", resp.data["results"][0])
+
+        resp = self.client.post(bulk_url, {"action": "reject", "ids": [pending[3].pk]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("moderation_note", resp.data)
+        SimilarAdRefresh.objects.all().delete()
+
+        ids = [pending[0].pk, pending[1].pk, pending[2].pk, approved.pk, withdrawn.pk, 999999]
+        with CaptureQueriesContext(connection) as approve_queries:
+            resp = self.client.post(bulk_url, {"action": "approve", "ids": ids}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["updated"], [ad.pk for ad in pending[:3]])
+        self.assertEqual(resp.data["skipped"], [withdrawn.pk, approved.pk, 999999])
+        withdrawn.refresh_from_db()
+        self.assertEqual((withdrawn.status, withdrawn.is_active), (AdStatus.PENDING, False))
+        self.assertLess(len(approve_queries), 20)
+        updates = [q for q in approve_queries if q["sql"].startswith('UPDATE "ads_ad"')]
+        self.assertEqual(len(updates), 1)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_ads_count, 4)
+        row = refresh_rents(AdStats.objects.get(property_type=AdStats.ALL_TYPES))
+        self.assertEqual((row.available, row.pending, row.rent_max), (4, 1, 3000))
+        self.assertEqual(
+            set(SimilarAdRefresh.objects.values_list("ad_id", flat=True)), {ad.pk for ad in pending[:3]}
+        )
+
+        resp = self.client.post(
+            bulk_url,
+            {"action": "reject", "ids": [pending[2].pk, pending[3].pk], "moderation_note": "Blurry"},
+            format="json",
+        )
+        self.assertEqual((resp.data["updated"], resp.data["skipped"]), ([pending[3].pk], [pending[2].pk]))
+        pending[3].refresh_from_db()
+        self.assertEqual((pending[3].status, pending[3].moderation_note), (AdStatus.REJECTED, "Blurry"))
+        self.assertEqual(AdStats.objects.get(property_type=AdStats.ALL_TYPES).pending, 0)
+        self.assertEqual(self.client.get(queue_url).data["results"], [])
+
+    def test_async_read_endpoints_match_sync(self):
+        listed = [
+            self.make_ad(title=f"Listed {i}", monthly_rent=1000 * (i + 1), area_m2=40 + i)
+            for i in range(3)
+        ]
+        pending = self.make_ad(title="Mine pending", status=AdStatus.PENDING)
+        detail_url = reverse("ad-detail", args=[pending.pk])
+        locations_url = reverse("ad-locations")
+        requests = [
+            (self.list_url, {}),
+            (self.list_url, {"ordering": "monthly_rent", "search": "listed"}),
+            (self.list_url, {"cursor": "", "count": "true", "property_type": "HOUSE"}),
+            (self.list_url, {"page": 9}),
+            # Amenity choices are validated against the database.
+            (self.list_url, {"amenities": self.amenity.pk, "search": "listed"}),
+            (self.list_url, {"amenities": 999999}),
+            (detail_url, {}),
+            (detail_url, {"amenities": self.amenity.pk}),
+            (reverse("ad-detail", args=[999999]), {}),
+            (reverse("ad-stats"), {}),
+            (reverse("ad-stats"), {"property_type": "CASTLE"}),
+            (locations_url, {}),
+            (locations_url, {"zoom": 5}),
+            (locations_url, {"zoom": 16, "bbox": "69,41,70,42"}),
+            (locations_url, {"zoom": 99}),
+            (locations_url, {"zoom": 16}),
+        ]
+        self.authenticate(self.user)
+        with override_settings(ADS_RESPONSE_CACHE={"ENABLED": False}):
+            expected = [self.client.get(url, params) for url, params in requests]
+            with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                for (url, params), sync in zip(requests, expected):
+                    resp = self.client.get(url, params)
+                    self.assertEqual((resp.status_code, resp.json()), (sync.status_code, sync.json()), url)
+                self.client.logout()
+                self.assertEqual(
+                    self.client.post(self.list_url, {}).status_code, status.HTTP_401_UNAUTHORIZED
+                )
+
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            first = self.client.get(self.list_url)
+            self.assertEqual(first["X-Cache"], "MISS")
+            with self.assertNumQueries(0):
+                resp = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(self.client.get(self.list_url)["X-Cache"], "HIT")
+
+            registry.reset()
+            with override_settings(REQUEST_METRICS={"ENABLED": True}):
+                resp = async_to_sync(self.async_client.get)(reverse("ad-detail", args=[listed[0].pk]))
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertIn("queries", resp["Server-Timing"])
+            self.assertGreater(registry.snapshot()["AdViewSet.retrieve"]["count"], 0)
+
+    def test_list_query_count_is_constant(self):
+        def count_queries() -> int:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(self.list_url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            return len(ctx.captured_queries)
+
+        self.make_ad(owner=self.user)
+        self.make_ad(owner=self.other)
+        baseline = count_queries()
+        for i in range(8):
+            self.make_ad(owner=self.user if i % 2 else self.other)
+        self.assertEqual(count_queries(), baseline)
+
+    def test_feeds_render_cards_with_sparse_fieldsets(self):
+        ad_id = self.create_ad(title="Card", images=[generate_image("a.gif"), generate_image("b.gif")]).data["id"]
+        Ad.objects.filter(pk=ad_id).update(status=AdStatus.APPROVED)
+        first = AdImage.objects.get(ad_id=ad_id, order=0)
+        self.client.force_authenticate(user=None)
+
+        card = self.client.get(self.list_url).data["results"][0]
+        self.assertEqual(
+            set(card),
+            {"id", "slug", "status", "title", "monthly_rent", "property_type", "bedrooms", "area_m2", "address", "cover", "created_at"},
+        )
+        self.assertTrue(card["cover"].endswith(first.image.url))
+        AdImage.objects.filter(pk=first.pk).update(thumbnail="ads/variants/a.webp")
+        cache.clear()
+        self.assertTrue(self.client.get(self.list_url).data["results"][0]["cover"].endswith("ads/variants/a.webp"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.list_url, {"fields": "id,title"})
+        self.assertEqual(resp.data["results"], [{"id": ad_id, "title": "Card"}])
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn('"ads_ad"."description"', sql)
+        self.assertNotIn("ads_adimage", sql)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.list_url, {"expand": "amenities,owner"})
+        card = resp.data["results"][0]
+        self.assertEqual(card["amenities"][0]["slug"], "elevator")
+        self.assertEqual(card["owner"]["full_name"], "User")
+        self.assertNotIn("images", card)
+        self.assertEqual(sum("ads_ad_amenities" in q["sql"] for q in ctx.captured_queries), 1)
+
+        resp = self.client.get(self.list_url, {"fields": "title,secret"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        nearby = self.client.get(reverse("ad-nearby"), {"lat": 41.0, "lng": 69.0, "fields": "id,distance_km"})
+        self.assertEqual(nearby.data["results"], [{"id": ad_id, "distance_km": 0.0}])
+        self.authenticate(self.user)
+        mine = self.client.get(reverse("my-ad-list"), {"expand": "description"}).data["results"][0]
+        self.assertEqual((mine["status"], mine["description"]), (AdStatus.APPROVED, "Nice place"))
+
+    def test_fast_ad_rendering_matches_serializers(self):
+        ad_id = self.create_ad(title="Golden", images=[generate_image("a.gif"), generate_image("b.gif")]).data["id"]
+        AdImage.objects.filter(ad_id=ad_id, order=0).update(thumbnail="ads/variants/a.webp")
+        AdImage.objects.filter(ad_id=ad_id, order=1).update(thumbnail="ads/variants/b ü.webp", medium="ads//b.webp")
+        self.create_ad(title="Bare", images=[], amenities=[], contact_phone="+998901234567")
+        Ad.objects.create(
+            owner=self.other,
+            title="No map",
+            description="",
+            monthly_rent=7,
+            property_type="APARTMENT",
+            bedrooms=0,
+            bathrooms=0,
+            area_m2=Decimal("12.5"),
+            address="Side street",
+        )
+        request = APIRequestFactory().get("/api/ads/")
+        everything = [*AdNearbySerializer.Meta.fields]
+        cases = [
+            (AdCardSerializer, None, Ad.objects.all()),
+            (AdCardSerializer, everything[:-1], Ad.objects.all()),
+            (AdDetailSerializer, None, Ad.objects.all()),
+            (AdNearbySerializer, everything, within_radius(Ad.objects.all(), 41.0, 69.0, 50)),
+        ]
+        for serializer_class, fields, queryset in cases:
+            context = {"request": request, "fields": fields}
+            ads = list(feed_queryset(queryset.order_by("id"), fields or everything[:-1]))
+            serializer = serializer_class(ads, many=True, context=context)
+            golden = JSONRenderer().render(ListSerializer.to_representation(serializer, ads))
+            self.assertEqual(JSONRenderer().render(serializer.data), golden)
+            # The paginated feeds render ``values()`` rows, see ``ads.fieldsets``.
+            renderer = AdRenderer(serializer.child)
+            rows = renderer.attach_relations(list(renderer.values(feed_queryset(queryset.order_by("id"), everything))))
+            self.assertEqual(JSONRenderer().render(serializer_class(rows, many=True, context=context).data), golden)
+
+        with mock.patch.object(AdRenderer, "render_instances", side_effect=AssertionError("built instances")):
+            resp = self.client.get(self.list_url, {"fields": ",".join(everything[:-1]), "ordering": "id"})
+        serializer = AdCardSerializer(many=True, context={"request": resp.wsgi_request, "fields": everything[:-1]})
+        listed = feed_queryset(Ad.objects.filter(owner=self.user).order_by("id"), everything[:-1])
+        golden = ListSerializer.to_representation(serializer, listed)
+        self.assertEqual(len(golden), 2)
+        self.assertEqual(JSONRenderer().render(resp.data["results"]), JSONRenderer().render(golden))
+
+    @skipUnless(connection.vendor == "sqlite", "reads SQLite query plans")
+    def test_endpoint_queries_avoid_table_scans(self):
+        call_command(
+            "seed_benchmark_data",
+            *("--users", "50", "--ads", "400", "--images-per-ad", "1", "--messages", "0"),
+            stdout=StringIO(),
+        )
+        ad = Ad.objects.publicly_active().order_by("-id").first()
+        SimilarAd.objects.filter(ad=ad).delete()  # exercise the fallback query
+        bbox = "69.2,41.25,69.3,41.35"
+        endpoints = [
+            (None, self.list_url),
+            (None, f"{self.list_url}?cursor="),
+            (None, f"{self.list_url}?property_type=APARTMENT"),
+            (None, f"{self.list_url}?ordering=monthly_rent&min_price=1000"),
+            (None, reverse("ad-detail", args=[ad.pk])),
+            (None, reverse("ad-similar", args=[ad.pk])),
+            (None, f"{reverse('ad-nearby')}?lat=41.3&lng=69.25&radius_km=2"),
+            (None, f"{reverse('ad-locations')}?zoom=11"),
+            (None, f"{reverse('ad-locations')}?zoom=16&bbox={bbox}"),
+            (ad.owner, self.list_url),
+            (ad.owner, f"{reverse('ad-locations')}?bbox={bbox}"),
+            (ad.owner, reverse("my-ad-list")),
+            (self.admin, reverse("ad-moderation-list")),
+        ]
+        scans = []
+        with override_settings(ADS_RESPONSE_CACHE={"ENABLED": False}):
+            for user, url in endpoints:
+                self.client.force_authenticate(user=user)
+                with CaptureQueriesContext(connection) as ctx:
+                    resp = self.client.get(url)
+                self.assertEqual(resp.status_code, status.HTTP_200_OK, url)
+                for query in ctx.captured_queries:
+                    if not query["sql"].startswith("SELECT"):
+                        continue
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                        plan = [row[-1] for row in cursor.fetchall()]
+                    scans += [(url, query["sql"]) for step in plan if step == "SCAN ads_ad"]
+        self.assertEqual(scans, [])
+
+    def test_locations_clusters_by_zoom(self):
+        self.make_ad(latitude=Decimal("41.300000"), longitude=Decimal("69.200000"), monthly_rent=1000)
+        self.make_ad(latitude=Decimal("41.301000"), longitude=Decimal("69.201000"), monthly_rent=3000)
+        self.make_ad(latitude=Decimal("40.100000"), longitude=Decimal("71.700000"), monthly_rent=2000)
+        url = reverse("ad-locations")
+
+        resp = self.client.get(url, {"zoom": 8})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        clusters = sorted(resp.json()["clusters"], key=lambda c: c["count"])
+        self.assertEqual([c["count"] for c in clusters], [1, 2])
+        self.assertEqual(clusters[1]["min_price"], 1000)
+        self.assertEqual(clusters[1]["max_price"], 3000)
+        self.assertAlmostEqual(clusters[1]["latitude"], 41.3005)
+        self.assertEqual(resp.json()["points"], [])
+
+        resp = self.client.get(url, {"zoom": 17, "bbox": "69.1,41.2,69.3,41.4"})
+        data = resp.json()
+        self.assertEqual(data["clusters"], [])
+        self.assertEqual(len(data["points"]), 2)
+
+        resp = self.client.get(url, {"zoom": 8, "bbox": "69,41,70"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(url, {"zoom": 17})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("bbox", resp.json()["detail"])
+        self.assertEqual(self.client.get(url, {"zoom": "x"}).json(), {"detail": "Invalid zoom."})
+
+    def test_geohash_maintained_on_save(self):
+        ad = self.make_ad(latitude=Decimal("41.311100"), longitude=Decimal("69.279700"))
+        self.assertEqual(ad.geohash, encode_geohash(41.3111, 69.2797))
+        self.assertTrue(ad.geohash.startswith("tx"))
+        ad.latitude = ad.longitude = None
+        ad.save()
+        self.assertEqual(Ad.objects.get(pk=ad.pk).geohash, "")
+
+    def test_nearby_uses_true_radius_and_orders_by_distance(self):
+        origin = (41.311100, 69.279700)
+        far = self.make_ad(latitude=Decimal("41.330000"), longitude=Decimal("69.279700"))
+        near = self.make_ad(latitude=Decimal("41.312000"), longitude=Decimal("69.279700"))
+        # Inside the old radius/111 box but ~4.4 km away diagonally.
+        corner = self.make_ad(latitude=Decimal("41.341100"), longitude=Decimal("69.314700"))
+        resp = self.client.get(
+            reverse("ad-nearby"),
+            {"lat": origin[0], "lng": origin[1], "radius_km": 4},
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        results = resp.json()["results"]
+        self.assertEqual([item["id"] for item in results], [near.id, far.id])
+        self.assertNotIn(corner.id, [item["id"] for item in results])
+        self.assertAlmostEqual(results[0]["distance_km"], 0.1, places=1)
+        self.assertAlmostEqual(results[1]["distance_km"], 2.1, places=1)
+
+        resp = self.client.get(reverse("ad-nearby"), {"lat": "x", "lng": 69})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_keyset_pagination_walks_every_ad_once(self):
+        created = [self.make_ad(monthly_rent=1000 + (i % 3) * 100) for i in range(45)]
+        seen = []
+        url = self.list_url + "?cursor="
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", resp.data)
+            seen.extend(item["id"] for item in resp.data["results"])
+            url = resp.data["next"]
+        self.assertEqual(seen, [ad.id for ad in reversed(created)])
+
+        resp = self.client.get(self.list_url, {"cursor": "", "ordering": "monthly_rent", "count": "true"})
+        self.assertEqual(resp.data["count"], 45)
+        first_page = resp.data["results"]
+        second = self.client.get(resp.data["next"]).data["results"]
+        prices = [item["monthly_rent"] for item in first_page + second]
+        self.assertEqual(prices, sorted(prices))
+        self.assertEqual(len({item["id"] for item in first_page + second}), 40)
+
+        resp = self.client.get(self.list_url, {"cursor": "not-a-cursor"})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_full_text_search_ranks_and_folds_spelling(self):
+        in_title = self.make_ad(title="Kvartira O‘zbekiston ko‘chasida", description="Yaxshi")
+        in_description = self.make_ad(title="Uy", description="Kvartiralar yonida")
+        self.make_ad(title="Ofis", description="Markazda", address="Chilonzor")
+        russian = self.make_ad(title="Квартира", description="Зелёный двор")
+
+        resp = self.client.get(self.list_url, {"search": "kvartira"})
+        ids = [item["id"] for item in resp.data["results"]]
+        self.assertEqual(ids, [in_title.id, in_description.id])
+
+        resp = self.client.get(self.list_url, {"search": "o'zbekiston"})
+        self.assertEqual([item["id"] for item in resp.data["results"]], [in_title.id])
+
+        resp = self.client.get(self.list_url, {"search": "зеленый"})
+        self.assertEqual([item["id"] for item in resp.data["results"]], [russian.id])
+
+        in_description.description = "Hovli"
+        in_description.save()
+        resp = self.client.get(self.list_url, {"search": "kvartira"})
+        self.assertEqual([item["id"] for item in resp.data["results"]], [in_title.id])
+
+    def test_image_variants_processed_off_request_path(self):
+        source = Image.new("RGB", (1600, 1200), "red")
+        exif = Image.Exif()
+        exif[0x010F] = "TestCamera"
+        buffer = BytesIO()
+        source.save(buffer, format="JPEG", exif=exif)
+        upload = SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+        resp = self.create_ad(title="Photos", images=[upload])
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        ad_image = AdImage.objects.get(ad_id=resp.data["id"])
+        self.assertEqual(ad_image.variants_status, VariantStatus.PENDING)
+        self.assertFalse(ad_image.thumbnail)
+
+        self.assertEqual(process_pending_images(), 1)
+        ad_image.refresh_from_db()
+        self.assertEqual(ad_image.variants_status, VariantStatus.READY)
+        self.assertEqual((ad_image.width, ad_image.height), (1600, 1200))
+        with Image.open(ad_image.thumbnail) as thumb:
+            self.assertEqual(thumb.size, (320, 240))
+            self.assertEqual(thumb.format, variant_format()[0])
+            self.assertFalse(thumb.getexif())
+        with Image.open(ad_image.medium) as medium:
+            self.assertEqual(medium.size, (1024, 768))
+
+        detail = self.client.get(reverse("ad-detail", args=[resp.data["id"]]))
+        image_data = detail.data["images"][0]
+        self.assertTrue(image_data["thumbnail"].endswith(f".{variant_format()[1]}"))
+        self.assertEqual(image_data["width"], 1600)
+
+    def test_image_processing_failures_are_marked_failed(self):
+        uploads = []
+        for name in ("bomb.png", "broken.png", "fine.png"):
+            buffer = BytesIO()
+            Image.new("RGB", (200, 200), "blue").save(buffer, format="PNG")
+            uploads.append(SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png"))
+        resp = self.create_ad(title="Photos", images=uploads)
+        bomb, broken, fine = AdImage.objects.filter(ad_id=resp.data["id"]).order_by("id")
+
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000), self.assertLogs("ads.images", "ERROR") as logs:
+            self.assertEqual(process_pending_images(limit=1), 1)
+        self.assertIn("DecompressionBombError", logs.output[0])
+        with (
+            mock.patch("ads.images.process_image", side_effect=RuntimeError("boom")),
+            self.assertLogs("ads.images", "ERROR") as logs,
+        ):
+            self.assertEqual(process_pending_images(limit=1), 1)
+        self.assertIn("Unexpected error processing image", logs.output[0])
+        self.assertEqual(process_pending_images(), 1)
+
+        statuses = dict(AdImage.objects.values_list("pk", "variants_status"))
+        self.assertEqual(statuses[bomb.pk], VariantStatus.FAILED)
+        self.assertEqual(statuses[broken.pk], VariantStatus.FAILED)
+        self.assertEqual(statuses[fine.pk], VariantStatus.READY)
+
+    def test_base64_images_decoded_incrementally_with_limits(self):
+        noise = Image.effect_noise((400, 400), 80).convert("RGB")
+        buffer = BytesIO()
+        noise.save(buffer, format="PNG")
+        raw = buffer.getvalue()
+        encoded = base64.encodebytes(raw).decode()  # wrapped lines, multi-chunk
+        self.assertGreater(len(encoded), 2 * 64 * 1024)
+
+        with override_settings(ADS_IMAGE_MEMORY_BYTES=1024):
+            upload = decode_base64_image(f"data:image/png;base64,{encoded}")
+        self.assertTrue(hasattr(upload, "temporary_file_path"))
+        self.assertTrue(upload.name.endswith(".png"))
+        self.assertEqual(upload.size, len(raw))
+        self.assertEqual(upload.read(), raw)
+        upload.close()
+
+        with self.assertRaises(InvalidImage):
+            decode_base64_image(base64.b64encode(b"not an image at all").decode())
+        with self.assertRaises(InvalidImage):
+            decode_base64_image("R0lGODdh$$$$")
+        with self.assertRaises(InvalidImage):
+            decode_base64_image("R0lGODdhéAAA")
+
+        payload = {
+            "title": "Big",
+            "description": "Nice place",
+            "monthly_rent": 1000,
+            "property_type": "HOUSE",
+            "area_m2": 50,
+            "address": "Main street",
+            "images": [encoded, encoded],
+        }
+        self.authenticate(self.user)
+        resp = self.client.post(self.list_url, {**payload, "images": ["R0lGODdhéAAA"]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data["images"], {0: ["Invalid image data"]})
+        with override_settings(ADS_MAX_IMAGE_BYTES=len(raw) // 2):
+            resp = self.client.post(self.list_url, payload, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("images", resp.data)
+        with override_settings(ADS_MAX_REQUEST_IMAGE_BYTES=len(raw) * 3 // 2):
+            resp = self.client.post(self.list_url, payload, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Ad.objects.filter(title="Big").count(), 0)
+        resp = self.client.post(self.list_url, payload, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AdImage.objects.filter(ad_id=resp.data["id"]).count(), 2)
+
+    def test_response_cache_hits_and_invalidates(self):
+        ad = self.make_ad(title="Cached")
+        first = self.client.get(self.list_url)
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.client.get(self.list_url)
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.client.get(self.list_url + "?page=1")["X-Cache"], "MISS")
+
+        self.authenticate(self.admin)
+        self.assertEqual(self.client.get(self.list_url)["X-Cache"], "MISS")
+        self.client.force_authenticate(user=None)
+
+        ad.monthly_rent = 2500
+        ad.save()
+        resp = self.client.get(self.list_url)
+        self.assertEqual(resp["X-Cache"], "MISS")
+        self.assertEqual(resp.data["results"][0]["monthly_rent"], 2500)
+
+        self.client.get(reverse("amenity-list"))
+        Amenity.objects.create(name="Pool", slug="pool")
+        resp = self.client.get(reverse("amenity-list"))
+        self.assertEqual(resp["X-Cache"], "MISS")
+        self.assertEqual(len(resp.data["results"]), 2)
+        self.assertEqual(response_cache_metrics()["ad-list"], {"hit": 1, "miss": 4})
+
+        with override_settings(ADS_RESPONSE_CACHE={"BYPASS": ["ad-stats"]}):
+            self.client.get(reverse("ad-stats"))
+            resp = self.client.get(reverse("ad-stats"))
+        self.assertNotIn("X-Cache", resp)
+
+    def test_conditional_get_returns_not_modified(self):
+        ad = self.make_ad(title="Validated")
+        detail_url = reverse("ad-detail", args=[ad.pk])
+        urls = (
+            self.list_url,
+            self.list_url + "?search=validated",
+            detail_url,
+            reverse("ad-locations"),
+            reverse("amenity-list"),
+        )
+        for url in urls:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            etag = resp["ETag"]
+            with self.assertNumQueries(0):
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(resp.content, b"")
+            self.assertEqual(resp["ETag"], etag)
+
+        resp = self.client.get(detail_url)
+        etag, last_modified = resp["ETag"], resp["Last-Modified"]
+        self.assertNotEqual(self.client.get(self.list_url + "?page=1")["ETag"], etag)
+        resp = self.client.get(detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        AdImage.objects.create(ad=ad, image=generate_image())
+        resp = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data["images"]), 1)
+        self.assertNotEqual(resp["ETag"], etag)
+
+        self.assertEqual(
+            self.client.get(reverse("ad-detail", args=[ad.pk + 100]), HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_request_metrics_and_query_budgets(self):
+        registry.reset()
+        self.make_ad()
+        config = {"ENABLED": True, "QUERY_BUDGETS": {"AdViewSet.list": 10}, "STRICT": True}
+        with override_settings(REQUEST_METRICS=config, ADS_RESPONSE_CACHE={"ENABLED": False}):
+            resp = self.client.get(self.list_url)
+            metrics = resp.request_metrics
+            self.assertEqual(metrics.endpoint, "AdViewSet.list")
+            self.assertGreater(metrics.queries, 0)
+            self.assertIn(f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"', resp["Server-Timing"])
+            # Serializer ``.data`` is measured apart from rendering.
+            self.assertGreater(metrics.serialize_ms, 0)
+            self.assertIn(f"serialize;dur={metrics.serialize_ms:.1f}", resp["Server-Timing"])
+            self.client.get(self.list_url)
+
+            config["QUERY_BUDGETS"]["AdViewSet.list"] = 1
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(self.list_url)
+
+            url = reverse("request-metrics")
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+            self.authenticate(self.admin)
+            report = self.client.get(url).data["endpoints"]
+        self.assertEqual(report["AdViewSet.list"]["count"], 3)
+        self.assertEqual(set(report["AdViewSet.list"]["total_ms"]), {"p50", "p95", "p99", "max"})
+        self.assertIn("serialize_ms", report["AdViewSet.list"])
+        self.assertNotIn("Server-Timing", APIClient().get(self.list_url))
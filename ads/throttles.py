@@ -7,3 +7,9 @@ class AdPostRateThrottle(UserRateThrottle):
     """Limit ad creation to 10 per day per authenticated user."""
 
     scope = "ad_post"
+
+
+class AgencyImportRateThrottle(UserRateThrottle):
+    """Limit bulk imports by verified agencies, see ``ads.bulk``."""
+
+    scope = "agency_import"
@@ -0,0 +1,127 @@
+"""Incremental decoding of base64 image uploads.
+
+JSON clients send images as (optionally ``data:``-prefixed) base64 strings.
+Rather than stripping, padding and decoding the whole string at once, the
+payload is decoded in fixed-size slices straight into an uploaded-file object
+(in memory below ``ADS_IMAGE_MEMORY_BYTES``, a temporary file otherwise), the format is
+sniffed from the first bytes and size limits are enforced before any
+decoding happens.
+"""
+from __future__ import annotations
+
+import base64
+import uuid
+from io import BytesIO
+from typing import Any
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile,
+    TemporaryUploadedFile,
+    UploadedFile,
+)
+
+# Base64 characters decoded per step; a multiple of 4.
+CHUNK_CHARS = 64 * 1024
+DATA_URI_PREFIX = "data:"
+BASE64_MARKER = ";base64,"
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+)
+
+
+class InvalidImage(ValueError):
+    """Raised when upload data is not an acceptable image."""
+
+
+def max_image_bytes() -> int:
+    return settings.ADS_MAX_IMAGE_BYTES
+
+
+def max_request_image_bytes() -> int:
+    return settings.ADS_MAX_REQUEST_IMAGE_BYTES
+
+
+def sniff_image_format(header: bytes) -> tuple[str, str] | None:
+    """Return ``(extension, content_type)`` from an image's magic bytes."""
+    for signature, ext, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return ext, content_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    return None
+
+
+def base64_payload_offset(data: str) -> int:
+    """Index where the base64 payload starts, skipping a ``data:`` header."""
+    if data.startswith(DATA_URI_PREFIX):
+        marker = data.find(BASE64_MARKER, 0, 256)
+        if marker != -1:
+            return marker + len(BASE64_MARKER)
+    return 0
+
+
+def estimate_upload_bytes(data: Any) -> int:
+    """Upper bound of the decoded size of an upload without decoding it."""
+    if isinstance(data, str):
+        return (len(data) - base64_payload_offset(data)) * 3 // 4
+    return getattr(data, "size", 0) or 0
+
+
+def decode_base64_image(data: str) -> UploadedFile:
+    """Decode a base64 image string into an uploaded file.
+
+    Raises :class:`InvalidImage` for oversized, malformed or non-image data.
+    """
+    start = base64_payload_offset(data)
+    estimated = estimate_upload_bytes(data)
+    if estimated > max_image_bytes():
+        raise InvalidImage("Image is too large.")
+
+    if estimated > settings.ADS_IMAGE_MEMORY_BYTES:
+        target: UploadedFile = TemporaryUploadedFile("upload", None, 0, None)
+    else:
+        target = InMemoryUploadedFile(BytesIO(), None, "upload", None, 0, None)
+
+    size = 0
+    pending = ""
+    detected = None
+    try:
+        for pos in range(start, len(data) + 1, CHUNK_CHARS):
+            final = pos + CHUNK_CHARS >= len(data)
+            chunk = pending + "".join(data[pos : pos + CHUNK_CHARS].split())
+            usable = len(chunk) if final else len(chunk) - len(chunk) % 4
+            chunk, pending = chunk[:usable], chunk[usable:]
+            if final:
+                chunk += "=" * (-len(chunk) % 4)
+            decoded = base64.b64decode(chunk, validate=True)
+            if detected is None and decoded:
+                detected = sniff_image_format(decoded[:16])
+                if detected is None:
+                    raise InvalidImage("Invalid image data")
+            target.write(decoded)
+            size += len(decoded)
+            if final:
+                break
+    except InvalidImage:
+        target.close()
+        raise
+    except ValueError as exc:
+        # ``binascii.Error``, or plain ``ValueError`` for non-ASCII text.
+        target.close()
+        raise InvalidImage("Invalid image data") from exc
+    if detected is None:
+        target.close()
+        raise InvalidImage("Invalid image data")
+
+    ext, content_type = detected
+    target.flush()
+    target.seek(0)
+    target.name = f"{uuid.uuid4().hex[:12]}.{ext}"
+    target.size = size
+    target.content_type = content_type
+    return target
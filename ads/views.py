@@ -1,48 +1,126 @@
 from __future__ import annotations
 
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
-from django.db.models import Q, Count
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiExample, OpenApiParameter, extend_schema
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 
-from .filters import AdFilter
-from .models import Ad, AdStatus, Amenity
-from .permissions import IsOwnerOrReadOnly
+from uyqidir_backend.async_views import AsyncReadMixin
+
+from .bulk import CONTENT_TYPES, BulkImportError, aiter_lines, export_ads, export_inventory, import_ads
+from .cache import cache_response
+from .conditional import conditional_get
+from .fieldsets import PARAMETERS as SPARSE_FIELDS_PARAMETERS
+from .fieldsets import SparseFieldsMixin, feed_queryset
+from .filters import AdFilter, StaffAdFilter
+from .geo import (
+    CLUSTER_MAX_ZOOM,
+    MAX_ZOOM,
+    MIN_ZOOM,
+    cluster_ads,
+    cluster_queryset,
+    cluster_row,
+    filter_bbox,
+    parse_bbox,
+    within_radius,
+)
+from .models import Ad, AdStats, AdStatus, Amenity, PropertyType
+from .moderation import moderate_ads
+from .pagination import AdPagination, ModerationQueuePagination
+from .permissions import IsAgency, IsOwnerOrReadOnly
+from .search import AdSearchFilter
 from .serializers import (
+    AdCardSerializer,
+    AdClusterSerializer,
     AdCreateUpdateSerializer,
     AdDetailSerializer,
     AdImageSerializer,
     AdMapSerializer,
+    AdNearbySerializer,
+    AdStatsSerializer,
     AmenitySerializer,
+    ModerationBulkSerializer,
+    ModerationQueueSerializer,
+    ModerationSummarySerializer,
 )
-from .throttles import AdPostRateThrottle
+from .stats import refresh_rents
+from .throttles import AdPostRateThrottle, AgencyImportRateThrottle
+
+MAX_NEARBY_RADIUS_KM = 100
+SIMILAR_ADS = 3
+
+
+def _filtered_queryset(view, request, *args, **kwargs):
+    return view.filter_queryset(view.get_queryset())
+
+
+def _object_queryset(view, request, *args, **kwargs):
+    lookup = view.lookup_url_kwarg or view.lookup_field
+    return view.filter_queryset(view.get_queryset()).filter(
+        **{view.lookup_field: kwargs[lookup]}
+    )
+
+
+def _export_response(request, lines, name: str, file_format: str) -> StreamingHttpResponse:
+    """Stream export ``lines`` as ``<name>.<file_format>``, see ``ads.bulk``.
+
+    Under ASGI the lines go through ``aiter_lines``, since Django would
+    read a sync iterator into memory before sending it.
+    """
+    if isinstance(request._request, ASGIRequest):
+        lines = aiter_lines(lines)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[file_format])
+    response["Content-Disposition"] = f'attachment; filename="{name}.{file_format}"'
+    return response
+
+
+def _locations_queryset(view, request, *args, **kwargs):
+    return view.locations_queryset(request)
 
 
-class AdViewSet(viewsets.ModelViewSet):
-    """Public advertisement endpoints."""
+class AdViewSet(SparseFieldsMixin, AsyncReadMixin, viewsets.ModelViewSet):
+    """Public advertisement endpoints.
 
-    queryset = Ad.objects.select_related("owner").prefetch_related("amenities", "images")
+    ``alist``, ``aretrieve``, ``astats`` and ``alocations`` serve the same
+    GETs under ASGI, see ``uyqidir_backend/async_views.py``. Feeds render
+    cards with sparse fieldsets, see ``ads.fieldsets``.
+    """
+
+    queryset = Ad.objects.with_related()
     serializer_class = AdDetailSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    pagination_class = AdPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, AdSearchFilter]
     filterset_class = AdFilter
     search_fields = ["title", "description", "address"]
     ordering = ["-created_at"]
+    sparse_actions = frozenset({"list", "nearby", "similar"})
 
     def get_permissions(self):
+        if self.action == "export":
+            return [IsAdminUser()]
         if self.request.method in SAFE_METHODS:
             return [AllowAny(), IsOwnerOrReadOnly()]
         return [IsAuthenticated(), IsOwnerOrReadOnly()]
 
     def get_queryset(self):
-        qs = Ad.objects.select_related("owner").prefetch_related("amenities", "images")
+        if self.action in {"list", "nearby"}:
+            qs = feed_queryset(Ad.objects.all(), self.sparse_fields())
+        elif self.action == "similar":
+            qs = Ad.objects.all()
+        else:
+            qs = Ad.objects.with_related()
         if self.action == "list":
             qs = qs.filter(is_active=True)
             if self.request.user.is_staff:
@@ -65,6 +143,10 @@ class AdViewSet(viewsets.ModelViewSet):
             return AdImageSerializer
         if self.action == "locations":
             return AdMapSerializer
+        if self.action == "nearby":
+            return AdNearbySerializer
+        if self.action in self.sparse_actions:
+            return AdCardSerializer
         return AdDetailSerializer
 
     def get_throttles(self):
@@ -101,6 +183,28 @@ class AdViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    @extend_schema(parameters=SPARSE_FIELDS_PARAMETERS)
+    @conditional_get(_filtered_queryset)
+    @cache_response("ad-list")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(_filtered_queryset)
+    @cache_response("ad-list")
+    async def alist(self, request, *args, **kwargs):
+        page = await self.apaginate_queryset(await self.afilter_queryset(self.get_queryset()))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @conditional_get(_object_queryset)
+    @cache_response("ad-detail")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional_get(_object_queryset)
+    @cache_response("ad-detail")
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
+
     def perform_destroy(self, instance: Ad) -> None:
         instance.is_active = False
         instance.save(update_fields=["is_active", "updated_at"])
@@ -150,52 +254,97 @@ class AdViewSet(viewsets.ModelViewSet):
         ad.save(update_fields=["status", "moderation_note", "updated_at"])
         return Response(AdDetailSerializer(ad, context={"request": request}).data)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "file_format", OpenApiTypes.STR, OpenApiParameter.PATH, enum=[*CONTENT_TYPES]
+            )
+        ],
+        filters=True,
+        responses={200: OpenApiTypes.STR},
+        description="Stream every ad with owner, amenities and image count (staff only).",
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export/(?P<file_format>csv|jsonl)",
+        filterset_class=StaffAdFilter,
+    )
+    def export(self, request, file_format=None):
+        filterset = StaffAdFilter(request.query_params, queryset=Ad.objects.all(), request=request)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=400)
+        lines = export_inventory(filterset.qs, file_format)
+        return _export_response(request, lines, "ads-inventory", file_format)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "property_type",
+                OpenApiTypes.STR,
+                enum=PropertyType.values,
+                description="Only count ads of this type.",
+            ),
+        ],
+        responses=AdStatsSerializer,
+    )
     @action(detail=False, methods=["get"], url_path="stats")
+    @cache_response("ad-stats")
     def stats(self, request):
-        qs = Ad.objects.filter(is_active=True)
-        counts = (
-            qs.values("status")
-            .filter(
-                status__in=[
-                    AdStatus.APPROVED,
-                    AdStatus.PENDING,
-                    AdStatus.ARCHIVED,
-                ]
-            )
-            .annotate(total=Count("id"))
-        )
-        data = {"available": 0, "pending": 0, "rented": 0}
-        for item in counts:
-            if item["status"] == AdStatus.APPROVED:
-                data["available"] = item["total"]
-            elif item["status"] == AdStatus.PENDING:
-                data["pending"] = item["total"]
-            elif item["status"] == AdStatus.ARCHIVED:
-                data["rented"] = item["total"]
-        data["total"] = sum(data.values())
-        return Response(data)
+        property_type = request.query_params.get("property_type", AdStats.ALL_TYPES)
+        if property_type and property_type not in PropertyType.values:
+            return Response({"property_type": ["Invalid property type."]}, status=400)
+        # Maintained by the ad signals, see ads/stats.py.
+        row = AdStats.objects.filter(property_type=property_type).first()
+        if row is not None and row.rents_stale:
+            refresh_rents(row)
+        return Response(AdStatsSerializer(row or AdStats(property_type=property_type)).data)
+
+    @cache_response("ad-stats")
+    async def astats(self, request):
+        property_type = request.query_params.get("property_type", AdStats.ALL_TYPES)
+        if property_type and property_type not in PropertyType.values:
+            return Response({"property_type": ["Invalid property type."]}, status=400)
+        row = await AdStats.objects.filter(property_type=property_type).afirst()
+        if row is not None and row.rents_stale:
+            await sync_to_async(refresh_rents)(row)
+        return Response(AdStatsSerializer(row or AdStats(property_type=property_type)).data)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("lat", OpenApiTypes.DOUBLE, required=True),
+            OpenApiParameter("lng", OpenApiTypes.DOUBLE, required=True),
+            OpenApiParameter(
+                "radius_km",
+                OpenApiTypes.DOUBLE,
+                description=f"Search radius, at most {MAX_NEARBY_RADIUS_KM} km. Defaults to 5.",
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
+        ],
+        responses=AdNearbySerializer(many=True),
+    )
     @action(detail=False, methods=["get"], url_path="nearby")
     def nearby(self, request):
         try:
-            lat = Decimal(request.query_params.get("lat"))
-            lng = Decimal(request.query_params.get("lng"))
-            radius = Decimal(request.query_params.get("radius_km", "5"))
-        except (TypeError, ValueError):
+            lat = float(Decimal(request.query_params.get("lat")))
+            lng = float(Decimal(request.query_params.get("lng")))
+            radius = float(Decimal(request.query_params.get("radius_km", "5")))
+        except (TypeError, ValueError, InvalidOperation):
             return Response({"detail": "Invalid coordinates."}, status=400)
-        delta = radius / Decimal("111")
-        qs = self.get_queryset().filter(
-            latitude__range=(lat - delta, lat + delta),
-            longitude__range=(lng - delta, lng + delta),
-        )
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({"detail": "Invalid coordinates."}, status=400)
+        if not 0 < radius <= MAX_NEARBY_RADIUS_KM:
+            return Response({"detail": "Invalid radius."}, status=400)
+        qs = within_radius(self.get_queryset(), lat, lng, radius)
         page = self.paginate_queryset(qs)
-        serializer = AdDetailSerializer(page or qs, many=True, context={"request": request})
+        serializer = self.get_serializer(page if page is not None else qs, many=True)
         if page is not None:
             return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
-    @action(detail=False, methods=["get"], url_path="locations", serializer_class=AdMapSerializer)
-    def locations(self, request):
+    def locations_queryset(self, request):
+        """Ads shown on the map for ``request``; raises ``ValueError`` on a bad bbox."""
+        bbox = parse_bbox(request.query_params.get("bbox"))
         qs = Ad.objects.filter(
             is_active=True,
             latitude__isnull=False,
@@ -203,26 +352,97 @@ class AdViewSet(viewsets.ModelViewSet):
         ).only("id", "latitude", "longitude", "monthly_rent")
         if request.user.is_authenticated and not request.user.is_staff:
             qs = qs.filter(Q(status=AdStatus.APPROVED) | Q(owner=request.user))
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        return filter_bbox(qs, bbox)
 
+    def locations_request(self, request):
+        """Return the map queryset and zoom; raises ``ValueError`` on bad input.
+
+        Points are only served for a bounding box, so a zoomed-in map never
+        lists every ad.
+        """
+        qs = self.locations_queryset(request)
+        zoom = request.query_params.get("zoom")
+        try:
+            zoom = int(zoom) if zoom not in (None, "") else None
+        except ValueError:
+            raise ValueError("Invalid zoom.") from None
+        if zoom is not None and not MIN_ZOOM <= zoom <= MAX_ZOOM:
+            raise ValueError("Zoom out of range.")
+        if zoom is not None and zoom >= CLUSTER_MAX_ZOOM and not request.query_params.get("bbox"):
+            raise ValueError(f"A bbox is required at zoom {CLUSTER_MAX_ZOOM} and above.")
+        return qs, zoom
+
+    def locations_response(self, zoom: int | None, rows: list) -> Response:
+        """Render map ``rows``: ads, or cluster dicts below ``CLUSTER_MAX_ZOOM``."""
+        if zoom is None:
+            return Response(self.get_serializer(rows, many=True).data)
+        if zoom < CLUSTER_MAX_ZOOM:
+            clusters = AdClusterSerializer(rows, many=True).data
+            return Response({"zoom": zoom, "clusters": clusters, "points": []})
+        points = self.get_serializer(rows, many=True).data
+        return Response({"zoom": zoom, "clusters": [], "points": points})
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "bbox",
+                OpenApiTypes.STR,
+                description=(
+                    "Bounding box as west,south,east,north. "
+                    f"Required with a zoom of {CLUSTER_MAX_ZOOM} or more."
+                ),
+            ),
+            OpenApiParameter(
+                "zoom",
+                OpenApiTypes.INT,
+                description=(
+                    "Map zoom level. When given, the response is an object with "
+                    f"grid clusters below zoom {CLUSTER_MAX_ZOOM} and points above it."
+                ),
+            ),
+        ]
+    )
+    @action(detail=False, methods=["get"], url_path="locations", serializer_class=AdMapSerializer)
+    @conditional_get(_locations_queryset)
+    def locations(self, request):
+        try:
+            qs, zoom = self.locations_request(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+            return self.locations_response(zoom, cluster_ads(qs, zoom))
+        return self.locations_response(zoom, list(qs))
+
+    @conditional_get(_locations_queryset)
+    async def alocations(self, request):
+        try:
+            qs, zoom = self.locations_request(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+            rows = [cluster_row(row) async for row in cluster_queryset(qs, zoom)]
+            return self.locations_response(zoom, rows)
+        return self.locations_response(zoom, [ad async for ad in qs])
+
+    @extend_schema(parameters=SPARSE_FIELDS_PARAMETERS, responses=AdCardSerializer(many=True))
     @action(detail=True, methods=["get"], url_path="similar")
     def similar(self, request, pk=None):
         ad = self.get_object()
-        qs = (
-            Ad.objects.filter(
-                property_type=ad.property_type,
-                status=AdStatus.APPROVED,
-                is_active=True,
+        listed = feed_queryset(Ad.objects.publicly_active(), self.sparse_fields())
+        # Neighbor lists are precomputed by ``refresh_similar_ads``, see ads/similarity.py.
+        ads = list(listed.filter(similar_to__ad=ad).order_by("similar_to__rank")[:SIMILAR_ADS])
+        if not ads:
+            # Not scored yet, e.g. approved moments ago.
+            ads = (
+                listed.filter(property_type=ad.property_type)
+                .exclude(id=ad.id)
+                .order_by("-created_at")[:SIMILAR_ADS]
             )
-            .exclude(id=ad.id)
-            .order_by("-created_at")[:3]
-        )
-        serializer = AdDetailSerializer(qs, many=True, context={"request": request})
-        return Response(serializer.data)
+        return Response(self.get_serializer(ads, many=True).data)
 
 
 class MyAdViewSet(
+    SparseFieldsMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -232,13 +452,19 @@ class MyAdViewSet(
     """Endpoints for the current user's ads."""
 
     serializer_class = AdDetailSerializer
+    pagination_class = AdPagination
     throttle_classes: list = []
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, AdSearchFilter]
     filterset_class = AdFilter
     search_fields = ["title", "description", "address"]
     ordering = ["-created_at"]
+    sparse_actions = frozenset({"list"})
 
     def get_permissions(self):
+        if self.action == "bulk_import":
+            return [IsAuthenticated(), IsAgency()]
+        if self.action == "export":
+            return [IsAuthenticated()]
         if self.request.method in SAFE_METHODS:
             return [AllowAny(), IsOwnerOrReadOnly()]
         return [IsAuthenticated(), IsOwnerOrReadOnly()]
@@ -246,39 +472,110 @@ class MyAdViewSet(
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False) or not self.request.user.is_authenticated:
             return Ad.objects.none()
-        return Ad.objects.filter(owner=self.request.user).select_related("owner").prefetch_related(
-            "amenities", "images"
-        )
+        if self.action == "list":
+            return feed_queryset(Ad.objects.filter(owner=self.request.user), self.sparse_fields())
+        return Ad.objects.filter(owner=self.request.user).with_related()
 
     def get_serializer_class(self):
         if self.action in {"update", "partial_update"}:
             return AdCreateUpdateSerializer
+        if self.action == "list":
+            return AdCardSerializer
         return AdDetailSerializer
 
+    @extend_schema(parameters=SPARSE_FIELDS_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_destroy(self, instance: Ad) -> None:
         instance.is_active = False
         instance.save(update_fields=["is_active", "updated_at"])
 
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary"}},
+                "required": ["file"],
+            }
+        },
+        responses={201: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT},
+        description=(
+            "Create pending ads from a .jsonl or .csv file (verified agencies only). "
+            "Returns the created IDs and per-row errors."
+        ),
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        parser_classes=[MultiPartParser],
+        throttle_classes=[AgencyImportRateThrottle],
+    )
+    def bulk_import(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"file": ["This field is required."]}, status=400)
+        try:
+            result = import_ads(request.user, upload)
+        except BulkImportError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(result, status=201 if result["created"] else 400)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "file_format", OpenApiTypes.STR, OpenApiParameter.PATH, enum=[*CONTENT_TYPES]
+            )
+        ],
+        responses={200: OpenApiTypes.STR},
+        description="Stream the current user's ads as CSV or JSONL in the import format.",
+    )
+    @action(detail=False, methods=["get"], url_path=r"export/(?P<file_format>csv|jsonl)")
+    def export(self, request, file_format=None):
+        ads = self.filter_queryset(Ad.objects.filter(owner=request.user))
+        return _export_response(request, export_ads(ads, file_format), "ads", file_format)
+
 
 class ModerationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
-    """List pending ads for moderation."""
+    """Pending ads queue, oldest first, with batched approve and reject."""
 
-    queryset = Ad.objects.filter(status=AdStatus.PENDING).select_related("owner").prefetch_related(
-        "amenities", "images"
-    )
-    serializer_class = AdDetailSerializer
-    permission_classes = [IsAuthenticated]
+    serializer_class = ModerationQueueSerializer
+    pagination_class = ModerationQueuePagination
+    permission_classes = [IsAdminUser]
     throttle_classes: list = []
 
-    def list(self, request, *args, **kwargs):
-        if not request.user.is_staff:
-            return Response(status=status.HTTP_403_FORBIDDEN)
-        return super().list(request, *args, **kwargs)
+    def get_queryset(self):
+        return (
+            Ad.objects.filter(status=AdStatus.PENDING, is_active=True)
+            .select_related("owner")
+            .order_by("created_at")
+        )
+
+    @extend_schema(request=ModerationBulkSerializer, responses=ModerationSummarySerializer)
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Approve or reject up to ``MAX_BATCH`` pending ads in one transaction."""
+        serializer = ModerationBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        summary = moderate_ads(data["ids"], data["action"], data["moderation_note"])
+        return Response(ModerationSummarySerializer(summary).data)
 
 
 class AmenityViewSet(viewsets.ReadOnlyModelViewSet):
     """Read-only endpoints for amenities."""
 
-    queryset = Amenity.objects.all()
+    queryset = Amenity.objects.order_by("id")
     serializer_class = AmenitySerializer
     throttle_classes: list = []
+
+    @conditional_get(_filtered_queryset, timestamp_field=None)
+    @cache_response("amenity-list")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(_object_queryset, timestamp_field=None)
+    @cache_response("amenity-detail")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -8,3 +8,6 @@ class ChatConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "chat"
+
+    def ready(self) -> None:  # pragma: no cover - import signals
+        import chat.signals  # noqa: F401
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import ChatMessage, ChatThread
+from chat.realtime import WEBSOCKET_PATH, get_broker, websocket_application
+
+
+class LoadClient:
+    """In-memory WebSocket peer driving ``websocket_application`` directly."""
+
+    def __init__(self, token: str) -> None:
+        self.scope = {
+            "type": "websocket",
+            "path": WEBSOCKET_PATH,
+            "query_string": f"token={token}".encode(),
+            "headers": [],
+        }
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.inbox.put_nowait({"type": "websocket.connect"})
+        self.accepted = asyncio.Event()
+        self.latencies: list[float] = []
+
+    async def receive(self) -> dict:
+        return await self.inbox.get()
+
+    async def send(self, event: dict) -> None:
+        if event["type"] == "websocket.accept":
+            self.accepted.set()
+        elif event["type"] == "websocket.send":
+            payload = json.loads(event["text"])
+            sent_at = float(payload["message"]["content"])
+            self.latencies.append((time.perf_counter() - sent_at) * 1000)
+        elif event["type"] == "websocket.close":
+            raise RuntimeError(f"Connection refused with code {event.get('code')}")
+
+
+class Command(BaseCommand):
+    """Open many WebSocket connections in-process and measure chat fan-out.
+
+    Connections are driven straight through the ASGI app, so no server is
+    needed. A hub user sends one message per thread and round through the
+    normal model/signal path; latency is measured from just before the
+    message is saved until it reaches the recipient's socket. Seeded users
+    and threads are deleted afterwards.
+    """
+
+    help = "Load test WebSocket chat delivery."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument("--rounds", type=int, default=3)
+
+    def handle(self, *args, **options) -> None:
+        hub, users, threads = self.seed(options["connections"])
+        try:
+            async_to_sync(self.run)(hub, users, threads, options["rounds"])
+        finally:
+            ChatThread.objects.filter(pk__in=[t.pk for t in threads]).delete()
+            get_user_model().objects.filter(pk__in=[hub.pk, *(u.pk for u in users)]).delete()
+
+    def seed(self, count: int):
+        User = get_user_model()
+        hub = User(email="chat-load-hub@example.invalid", full_name="Hub")
+        users = [
+            User(email=f"chat-load-{i}@example.invalid", full_name=f"Load {i}")
+            for i in range(count)
+        ]
+        for user in [hub, *users]:
+            user.set_unusable_password()
+        User.objects.bulk_create([hub, *users], batch_size=1000)
+        threads = ChatThread.objects.bulk_create([ChatThread() for _ in users], batch_size=1000)
+        Participant = ChatThread.participants.through
+        Participant.objects.bulk_create(
+            [
+                Participant(chatthread_id=thread.pk, user_id=user_id)
+                for thread, user in zip(threads, users)
+                for user_id in (hub.pk, user.pk)
+            ],
+            batch_size=1000,
+        )
+        return hub, users, threads
+
+    async def run(self, hub, users, threads, rounds: int) -> None:
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        clients = [LoadClient(token) for token in tokens]
+        tasks = [
+            asyncio.ensure_future(websocket_application(c.scope, c.receive, c.send))
+            for c in clients
+        ]
+        await asyncio.gather(*(client.accepted.wait() for client in clients))
+        connect_s = time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{len(clients)} connections in {connect_s:.2f}s, "
+            f"{get_broker().subscriber_count()} subscribed, "
+            f"{(current - baseline) / len(clients) / 1024:.1f} KiB traced per connection"
+        )
+
+        def send_round() -> None:
+            for thread in threads:
+                ChatMessage.objects.create(
+                    thread=thread, sender=hub, content=repr(time.perf_counter())
+                )
+
+        expected = 0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await sync_to_async(send_round)()
+            expected += len(threads)
+            while sum(len(c.latencies) for c in clients) < expected:
+                if time.perf_counter() - start > 30:
+                    break
+                await asyncio.sleep(0.01)
+            self.stdout.write(f"round: {len(threads)} messages in {time.perf_counter() - start:.2f}s")
+
+        for client in clients:
+            client.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(*tasks)
+
+        latencies = sorted(ms for c in clients for ms in c.latencies)
+        if not latencies:
+            self.stdout.write("no messages delivered")
+            return
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"delivered {len(latencies)}/{expected}; latency ms "
+            f"p50 {quantiles[49]:.2f} p95 {quantiles[94]:.2f} "
+            f"p99 {quantiles[98]:.2f} max {latencies[-1]:.2f}"
+        )
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_last_messages(apps, schema_editor):
+    ChatThread = apps.get_model("chat", "ChatThread")
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+    ChatReadMarker = apps.get_model("chat", "ChatReadMarker")
+    latest = (
+        ChatMessage.objects.filter(thread=models.OuterRef("pk"))
+        .order_by("-id")
+        .values("id")[:1]
+    )
+    ChatThread.objects.update(last_message=models.Subquery(latest))
+    # Existing conversations start out read rather than flooding every inbox.
+    Participant = ChatThread.participants.through
+    markers = [
+        ChatReadMarker(
+            thread_id=row["chatthread_id"],
+            user_id=row["user_id"],
+            last_read_message_id=row["chatthread__last_message"],
+        )
+        for row in Participant.objects.filter(
+            chatthread__last_message__isnull=False
+        ).values("chatthread_id", "user_id", "chatthread__last_message")
+    ]
+    ChatReadMarker.objects.bulk_create(markers, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="last_message",
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="chat.chatmessage"),
+        ),
+        migrations.CreateModel(
+            name="ChatReadMarker",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("last_read_message", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="chat.chatmessage")),
+                ("thread", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="read_markers", to="chat.chatthread")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("thread", "user"), name="chat_read_marker_unique")],
+            },
+        ),
+        migrations.RunPython(backfill_last_messages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0002_thread_last_message_read_markers"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(fields=["thread", "created_at", "id"], name="chat_chatme_thread__4fc26b_idx"),
+        ),
+    ]
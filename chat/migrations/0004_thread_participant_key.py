@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:15
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_participant_keys(apps, schema_editor):
+    ChatThread = apps.get_model("chat", "ChatThread")
+    Participant = ChatThread.participants.through
+    members = defaultdict(list)
+    for thread_id, user_id in Participant.objects.values_list("chatthread_id", "user_id"):
+        members[thread_id].append(str(user_id))
+    seen = set()
+    # The oldest of any duplicate threads keeps the key; the rest stay unkeyed.
+    for thread_id, ad_id in ChatThread.objects.order_by("id").values_list("id", "ad_id"):
+        users = sorted(members.get(thread_id, ()))
+        if len(users) != 2:
+            continue
+        key = f"{users[0]}:{users[1]}:{ad_id or ''}"
+        if key in seen:
+            continue
+        seen.add(key)
+        ChatThread.objects.filter(pk=thread_id).update(participant_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0003_message_history_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="participant_key",
+            field=models.CharField(blank=True, editable=False, help_text="Ordered participant IDs and ad ID, see pair_key()", max_length=100, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_participant_keys, migrations.RunPython.noop),
+    ]
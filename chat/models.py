@@ -1,7 +1,57 @@
 from __future__ import annotations
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class ChatThreadQuerySet(models.QuerySet):
+    """Query helpers for the chat endpoints."""
+
+    def for_inbox(self, user) -> "ChatThreadQuerySet":
+        """Threads of ``user`` with their last message and unread count.
+
+        The latest message is the denormalized ``last_message`` pointer and the
+        unread count is a subquery over messages newer than the user's
+        :class:`ChatReadMarker`, so a page costs a fixed number of queries.
+        """
+        last_read = ChatReadMarker.objects.filter(
+            thread=OuterRef("thread"), user=user
+        ).values("last_read_message_id")[:1]
+        unread = (
+            ChatMessage.objects.filter(
+                thread=OuterRef("pk"), id__gt=Coalesce(Subquery(last_read), 0)
+            )
+            .exclude(sender=user)
+            .order_by()
+            .values("thread")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return (
+            self.filter(participants=user)
+            .select_related("last_message")
+            .prefetch_related("participants")
+            .annotate(
+                unread_count=Coalesce(Subquery(unread), 0),
+                last_activity_at=Coalesce("last_message__created_at", "created_at"),
+            )
+            .order_by("-last_activity_at", "-id")
+        )
+
+    def get_or_create_for_pair(self, user, other, ad=None) -> tuple["ChatThread", bool]:
+        """Return the thread between two users about ``ad``, creating it once.
+
+        The lookup is a single probe of the unique ``participant_key`` index;
+        a concurrent create loses on the constraint and returns the winner.
+        """
+        key = ChatThread.pair_key(user.pk, other.pk, getattr(ad, "pk", ad))
+        with transaction.atomic(using=self.db):
+            thread, created = self.get_or_create(participant_key=key, defaults={"ad": ad})
+            if created:
+                thread.participants.add(user, other)
+        return thread, created
 
 
 class ChatThread(models.Model):
@@ -17,11 +67,35 @@ class ChatThread(models.Model):
         null=True,
         blank=True,
     )
+    last_message = models.ForeignKey(
+        "ChatMessage",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    participant_key = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Ordered participant IDs and ad ID, see pair_key()",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ChatThreadQuerySet.as_manager()
+
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return f"Thread {self.pk}"
 
+    @staticmethod
+    def pair_key(user_id, other_id, ad_id=None) -> str:
+        """Canonical key for a two-person thread, independent of who starts it."""
+        low, high = sorted([str(user_id), str(other_id)])
+        return f"{low}:{high}:{ad_id or ''}"
+
     def has_participant(self, user) -> bool:
         """Return True if the user is part of this thread."""
         return self.participants.filter(pk=user.pk).exists()
@@ -39,6 +113,35 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # History cursors, see ``chat.pagination.MessageCursorPagination``.
+            models.Index(fields=["thread", "created_at", "id"]),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return f"Message {self.pk} in thread {self.thread_id}"
+
+
+class ChatReadMarker(models.Model):
+    """Last message a participant has read in a thread."""
+
+    thread = models.ForeignKey(
+        ChatThread, on_delete=models.CASCADE, related_name="read_markers"
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    last_read_message = models.ForeignKey(
+        ChatMessage,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["thread", "user"], name="chat_read_marker_unique")
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"{self.user_id} read {self.last_read_message_id} in thread {self.thread_id}"
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import Any
+
+from django.db.models import QuerySet, Subquery
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MessageCursorPagination(BasePagination):
+    """Chat history keyed on ``(created_at, id)`` with message ID cursors.
+
+    ``?after=<id>`` returns messages newer than ``id`` (oldest first), so a
+    client polls with the last ID it has seen; ``?before=<id>`` returns the
+    page of older messages preceding ``id``; without either the latest page
+    is returned. Results are always in chronological order. The anchor's
+    timestamp is resolved in a subquery, so every request is one range scan
+    of the ``(thread, created_at, id)`` index. The scan starts at the anchor
+    itself, which tells an anchor outside the thread (rejected with a 400)
+    from an empty page.
+    """
+
+    after_query_param = "after"
+    before_query_param = "before"
+    limit_query_param = "limit"
+    default_limit = 50
+    max_limit = 200
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        rows = self.page_queryset(queryset, request)
+        return self.set_page([row async for row in rows])
+
+    def page_queryset(self, queryset: QuerySet, request) -> QuerySet:
+        """The requested messages plus one to tell whether more exist."""
+        self.request = request
+        self.after = self.get_id(request, self.after_query_param)
+        before = self.get_id(request, self.before_query_param)
+        if self.after is not None and before is not None:
+            raise ValidationError({"detail": "Use either after or before, not both."})
+        self.limit = self.get_limit(request)
+        self.anchor_param = None
+
+        if self.after is not None:
+            self.anchor_param = self.after_query_param
+            anchor = Subquery(queryset.filter(pk=self.after).values("created_at")[:1])
+            queryset = (
+                queryset.filter(created_at__gte=anchor)
+                .exclude(created_at=anchor, id__lt=self.after)
+                .order_by("created_at", "id")
+            )
+        else:
+            if before is not None:
+                self.anchor_param = self.before_query_param
+                anchor = Subquery(queryset.filter(pk=before).values("created_at")[:1])
+                queryset = queryset.filter(created_at__lte=anchor).exclude(
+                    created_at=anchor, id__gt=before
+                )
+            queryset = queryset.order_by("-created_at", "-id")
+        # The anchor, when given, comes first.
+        return queryset[: self.limit + 1 + (self.anchor_param is not None)]
+
+    def set_page(self, rows: list) -> list:
+        if self.anchor_param is not None:
+            if not rows:
+                raise ValidationError({self.anchor_param: ["Message not found in this thread."]})
+            rows = rows[1:]
+        self.has_more = len(rows) > self.limit
+        self.page = rows[: self.limit]
+        if self.after is None:
+            self.page.reverse()
+        return self.page
+
+    def get_id(self, request, param: str) -> int | None:
+        value = request.query_params.get(param)
+        if value in (None, ""):
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({param: ["A valid message ID is required."]})
+
+    def get_limit(self, request) -> int:
+        value = request.query_params.get(self.limit_query_param)
+        if value in (None, ""):
+            return self.default_limit
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_limit:
+            raise ValidationError(
+                {self.limit_query_param: [f"Must be between 1 and {self.max_limit}."]}
+            )
+        return limit
+
+    def get_next_link(self) -> str:
+        """URL to poll for newer messages."""
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.before_query_param)
+        if self.page:
+            return replace_query_param(url, self.after_query_param, self.page[-1].pk)
+        return url
+
+    def get_previous_link(self) -> str | None:
+        if not self.page or (self.after is None and not self.has_more):
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.after_query_param)
+        return replace_query_param(url, self.before_query_param, self.page[0].pk)
+
+    def get_paginated_response(self, data) -> Response:
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema: dict) -> dict[str, Any]:
+        return {
+            "type": "object",
+            "required": ["next", "results"],
+            "properties": {
+                "next": {"type": "string", "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,177 @@
+"""Real-time chat delivery over WebSockets.
+
+``websocket_application`` is a plain ASGI app mounted next to Django in
+``uyqidir_backend.asgi``. Clients connect to ``/ws/chat/?token=<access>``
+(or send an ``Authorization: Bearer`` header) with a SimpleJWT access token
+and receive every new message of their threads as JSON::
+
+    {"type": "chat.message", "thread": 1, "message": {...}}
+
+Messages are published per recipient through a broker once the creating
+transaction commits. The default :class:`InMemoryBroker` only reaches
+connections served by the same process; ``CHAT_BROKER`` may name a class
+with the same ``subscribe``/``unsubscribe``/``publish`` interface backed by
+Redis or another message broker.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_PATH = "/ws/chat/"
+# Pending messages per connection before new ones are dropped.
+QUEUE_SIZE = 100
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+def user_group(user_id) -> str:
+    return f"chat.user.{user_id}"
+
+
+class InMemoryBroker:
+    """Process-local pub/sub between Django code and WebSocket connections.
+
+    ``publish`` is safe to call from any thread; messages are handed to each
+    subscriber's event loop.
+    """
+
+    def __init__(self) -> None:
+        self._groups: dict[str, set] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, group: str, queue: asyncio.Queue) -> None:
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._groups[group].add(entry)
+
+    def unsubscribe(self, group: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._groups.get(group, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._groups.pop(group, None)
+
+    def publish(self, group: str, message: str) -> None:
+        with self._lock:
+            subscribers = list(self._groups.get(group, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._groups.values())
+
+
+def _offer(queue: asyncio.Queue, message: str) -> None:
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        logger.warning("Dropping chat message for a slow WebSocket client")
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    """Return the process-wide broker configured by ``CHAT_BROKER``."""
+    path = getattr(settings, "CHAT_BROKER", "chat.realtime.InMemoryBroker")
+    return import_string(path)()
+
+
+def publish_message(message) -> None:
+    """Push a saved ``ChatMessage`` to every participant of its thread."""
+    from .serializers import ChatMessageSerializer
+
+    payload = json.dumps(
+        {
+            "type": "chat.message",
+            "thread": message.thread_id,
+            "message": ChatMessageSerializer(message).data,
+        },
+        default=str,
+    )
+    broker = get_broker()
+    for user_id in message.thread.participants.values_list("pk", flat=True):
+        broker.publish(user_group(user_id), payload)
+
+
+def get_token(scope) -> str | None:
+    """Read the access token from the query string or ``Authorization`` header."""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    if query.get("token"):
+        return query["token"][0]
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            kind, _, token = value.decode().partition(" ")
+            if kind == "Bearer" and token:
+                return token
+    return None
+
+
+def authenticate(token: str | None):
+    """Return the active user for an access token, or ``None``."""
+    if not token:
+        return None
+    close_old_connections()
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    finally:
+        close_old_connections()
+
+
+async def websocket_application(scope, receive, send) -> None:
+    """Serve one chat WebSocket connection until the client disconnects."""
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+    if scope["path"] != WEBSOCKET_PATH:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    user = await sync_to_async(authenticate)(get_token(scope))
+    if user is None:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+
+    broker = get_broker()
+    group = user_group(user.pk)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    broker.subscribe(group, queue)
+    receiving = asyncio.ensure_future(receive())
+    getting = asyncio.ensure_future(queue.get())
+    try:
+        await send({"type": "websocket.accept"})
+        while True:
+            done, _ = await asyncio.wait(
+                {receiving, getting}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if getting in done:
+                await send({"type": "websocket.send", "text": getting.result()})
+                getting = asyncio.ensure_future(queue.get())
+            if receiving in done:
+                event = receiving.result()
+                if event["type"] == "websocket.disconnect":
+                    break
+                if event.get("text") == "ping":
+                    await send({"type": "websocket.send", "text": json.dumps({"type": "pong"})})
+                receiving = asyncio.ensure_future(receive())
+    finally:
+        broker.unsubscribe(group, queue)
+        receiving.cancel()
+        getting.cancel()
@@ -1,15 +1,27 @@
 from __future__ import annotations
 
 from django.contrib.auth import get_user_model
+from django.db import models
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from ads import fastpath
 from ads.models import Ad
 from .models import ChatMessage, ChatThread
 
 User = get_user_model()
 
 
+class ChatMessageListSerializer(serializers.ListSerializer):
+    """Render a page of messages with ``ads.fastpath.render_messages``."""
+
+    def to_representation(self, data):
+        if not fastpath.supported():
+            return super().to_representation(data)
+        messages = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return fastpath.render_messages(message.__dict__ for message in messages)
+
+
 class ChatMessageSerializer(serializers.ModelSerializer):
     """Serialize chat messages."""
 
@@ -18,6 +30,7 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
         fields = ["id", "sender", "content", "created_at"]
+        list_serializer_class = ChatMessageListSerializer
 
 
 class ChatThreadSerializer(serializers.ModelSerializer):
@@ -25,16 +38,17 @@ class ChatThreadSerializer(serializers.ModelSerializer):
 
     participants = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     ad = serializers.PrimaryKeyRelatedField(read_only=True)
-    last_message = serializers.SerializerMethodField()
+    last_message = ChatMessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatThread
-        fields = ["id", "ad", "participants", "created_at", "last_message"]
+        fields = ["id", "ad", "participants", "created_at", "last_message", "unread_count"]
 
-    @extend_schema_field(ChatMessageSerializer)
-    def get_last_message(self, obj: ChatThread):
-        msg = obj.messages.order_by("-created_at").first()
-        return ChatMessageSerializer(msg).data if msg else None
+    @extend_schema_field(serializers.IntegerField())
+    def get_unread_count(self, obj: ChatThread) -> int:
+        """Annotated by ``ChatThread.objects.for_inbox``; zero otherwise."""
+        return getattr(obj, "unread_count", 0)
 
 
 class ChatThreadCreateSerializer(serializers.Serializer):
@@ -42,3 +56,9 @@ class ChatThreadCreateSerializer(serializers.Serializer):
 
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
     ad = serializers.PrimaryKeyRelatedField(queryset=Ad.objects.all(), required=False, allow_null=True)
+
+
+class ChatReadSerializer(serializers.Serializer):
+    """Validate a read receipt; defaults to the thread's latest message."""
+
+    message = serializers.IntegerField(required=False, min_value=1)
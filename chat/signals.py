@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ChatMessage, ChatReadMarker, ChatThread
+from .realtime import publish_message
+
+
+@receiver(post_save, sender=ChatMessage)
+def update_thread_last_message(sender, instance: ChatMessage, created: bool, **kwargs) -> None:
+    """Advance the thread's ``last_message`` and the sender's read marker."""
+    if not created:
+        return
+    ChatThread.objects.filter(
+        Q(last_message__isnull=True) | Q(last_message_id__lt=instance.pk),
+        pk=instance.thread_id,
+    ).update(last_message=instance)
+    ChatReadMarker.objects.update_or_create(
+        thread_id=instance.thread_id,
+        user_id=instance.sender_id,
+        defaults={"last_read_message": instance},
+    )
+
+
+@receiver(post_save, sender=ChatMessage)
+def push_new_message(sender, instance: ChatMessage, created: bool, **kwargs) -> None:
+    """Deliver new messages to connected WebSocket clients after commit."""
+    if created:
+        transaction.on_commit(lambda: publish_message(instance), robust=True)
@@ -1,9 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ads.fastpath import render_messages
+from chat.models import ChatMessage, ChatThread
+from chat.realtime import WEBSOCKET_PATH, get_broker, websocket_application
+from chat.serializers import ChatMessageSerializer
+from uyqidir_backend.asgi import ASYNC_URLCONF
 
 User = get_user_model()
 
@@ -38,5 +58,199 @@ class ChatTests(APITestCase):
         self.assertEqual(resp_msg.status_code, status.HTTP_201_CREATED)
         resp_list = self.client.get(messages_url)
         self.assertEqual(resp_list.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(resp_list.data), 1)
-        self.assertEqual(resp_list.data[0]["content"], "Hello")
+        self.assertEqual(len(resp_list.data["results"]), 1)
+        self.assertEqual(resp_list.data["results"][0]["content"], "Hello")
+
+    def test_thread_list_has_last_message_and_unread_counts_in_fixed_queries(self):
+        def start_thread(other, *contents):
+            thread = ChatThread.objects.create()
+            thread.participants.add(self.user1, other)
+            for content in contents:
+                ChatMessage.objects.create(thread=thread, sender=other, content=content)
+            return thread
+
+        first = start_thread(self.user2, "Hi", "Still there?")
+        second = start_thread(self.user2, "Hello")
+
+        resp = self.client.get(self.chat_list_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["id"] for t in resp.data["results"]], [second.id, first.id])
+        self.assertEqual(resp.data["results"][1]["last_message"]["content"], "Still there?")
+        self.assertEqual(resp.data["results"][1]["unread_count"], 2)
+
+        # Own messages advance the marker; replies from others stay unread.
+        ChatMessage.objects.create(thread=first, sender=self.user1, content="Yes")
+        ChatMessage.objects.create(thread=first, sender=self.user2, content="Great")
+        resp = self.client.get(self.chat_list_url)
+        self.assertEqual(resp.data["results"][0]["id"], first.id)
+        self.assertEqual(resp.data["results"][0]["unread_count"], 1)
+
+        resp = self.client.post(reverse("chat-read", args=[first.id]))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["last_read_message"], first.messages.last().id)
+        resp = self.client.get(self.chat_list_url)
+        self.assertEqual(resp.data["results"][0]["unread_count"], 0)
+
+        for i in range(5):
+            start_thread(User.objects.create_user(email=f"x{i}@example.com", full_name="X", password="p"), "Hey")
+        # Auth, count, page of threads and participants.
+        with self.assertNumQueries(4):
+            resp = self.client.get(self.chat_list_url)
+        self.assertEqual(resp.data["count"], 7)
+
+    def test_websocket_pushes_new_messages_to_participants(self):
+        thread = ChatThread.objects.create()
+        thread.participants.add(self.user1, self.user2)
+        token = str(AccessToken.for_user(self.user2))
+
+        def post_message():
+            with self.captureOnCommitCallbacks(execute=True):
+                ChatMessage.objects.create(thread=thread, sender=self.user1, content="Hi")
+
+        async def session(query_string: bytes):
+            inbox: asyncio.Queue = asyncio.Queue()
+            outbox: asyncio.Queue = asyncio.Queue()
+            scope = {"type": "websocket", "path": WEBSOCKET_PATH, "query_string": query_string}
+            inbox.put_nowait({"type": "websocket.connect"})
+            task = asyncio.ensure_future(websocket_application(scope, inbox.get, outbox.put))
+            events = [await asyncio.wait_for(outbox.get(), 5)]
+            if events[0]["type"] == "websocket.accept":
+                await sync_to_async(post_message)()
+                events.append(await asyncio.wait_for(outbox.get(), 5))
+                inbox.put_nowait({"type": "websocket.receive", "text": "ping"})
+                events.append(await asyncio.wait_for(outbox.get(), 5))
+                inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+            await asyncio.wait_for(task, 5)
+            return events
+
+        accept, pushed, pong = async_to_sync(session)(f"token={token}".encode())
+        self.assertEqual(accept["type"], "websocket.accept")
+        payload = json.loads(pushed["text"])
+        self.assertEqual(payload["thread"], thread.id)
+        self.assertEqual(payload["message"]["content"], "Hi")
+        self.assertEqual(json.loads(pong["text"]), {"type": "pong"})
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+        (closed,) = async_to_sync(session)(b"token=invalid")
+        self.assertEqual(closed, {"type": "websocket.close", "code": 4401})
+
+    # More requests than the default ``ad_post`` rate allows per user.
+    @mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {"ad_post": None})
+    def test_message_history_cursors(self):
+        thread = ChatThread.objects.create()
+        thread.participants.add(self.user1, self.user2)
+        messages = [
+            ChatMessage.objects.create(thread=thread, sender=self.user2, content=str(i))
+            for i in range(5)
+        ]
+        url = reverse("chat-messages", args=[thread.id])
+
+        resp = self.client.get(url, {"limit": 2})
+        self.assertEqual([m["content"] for m in resp.data["results"]], ["3", "4"])
+        resp = self.client.get(resp.data["previous"])
+        self.assertEqual([m["content"] for m in resp.data["results"]], ["1", "2"])
+        resp = self.client.get(resp.data["previous"])
+        self.assertEqual([m["content"] for m in resp.data["results"]], ["0"])
+        self.assertIsNone(resp.data["previous"])
+
+        resp = self.client.get(url, {"after": messages[2].id})
+        self.assertEqual([m["content"] for m in resp.data["results"]], ["3", "4"])
+        poll_url = resp.data["next"]
+        # Auth, thread membership and one range scan of the history index.
+        with self.assertNumQueries(3):
+            resp = self.client.get(poll_url)
+        self.assertEqual(resp.data["results"], [])
+        self.assertEqual(resp.data["next"], poll_url)
+        ChatMessage.objects.create(thread=thread, sender=self.user2, content="5")
+        resp = self.client.get(poll_url)
+        self.assertEqual([m["content"] for m in resp.data["results"]], ["5"])
+
+        self.assertEqual(self.client.get(url, {"after": "x"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {"limit": 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = ChatThread.objects.create()
+        other.participants.add(self.user1, self.user2)
+        foreign = ChatMessage.objects.create(thread=other, sender=self.user2, content="elsewhere")
+        for param in ("after", "before"):
+            for anchor in (foreign.id, 999999):
+                resp = self.client.get(url, {param: anchor})
+                self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(param, resp.data)
+
+    # More requests than the default ``ad_post`` rate allows per user.
+    @mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {"ad_post": None})
+    def test_async_message_history_matches_sync(self):
+        thread = ChatThread.objects.create()
+        thread.participants.add(self.user1, self.user2)
+        messages = [
+            ChatMessage.objects.create(thread=thread, sender=self.user2, content=str(i))
+            for i in range(4)
+        ]
+        outsider = ChatThread.objects.create()
+        outsider.participants.add(self.user2)
+        url = reverse("chat-messages", args=[thread.id])
+        requests = [
+            (url, {}),
+            (url, {"limit": 2}),
+            (url, {"after": messages[1].id}),
+            (url, {"before": messages[2].id, "limit": 1}),
+            (url, {"limit": 0}),
+            (url, {"after": 999999}),
+            (reverse("chat-messages", args=[outsider.id]), {}),
+        ]
+        expected = [self.client.get(path, params) for path, params in requests]
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            for (path, params), sync in zip(requests, expected):
+                resp = self.client.get(path, params)
+                self.assertEqual((resp.status_code, resp.json()), (sync.status_code, sync.json()))
+            resp = self.client.post(url, {"content": "Posted"}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+            self.client.credentials()
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_fast_message_rendering_matches_serializer(self):
+        thread = ChatThread.objects.create()
+        thread.participants.add(self.user1, self.user2)
+        for sender, content in [(self.user1, "Salom"), (self.user2, 'Quote " and emoji \U0001f3e0'), (self.user2, "")]:
+            ChatMessage.objects.create(thread=thread, sender=sender, content=content)
+        messages = list(thread.messages.all())
+        serializer = ChatMessageSerializer(messages, many=True)
+        golden = JSONRenderer().render(ListSerializer.to_representation(serializer, messages))
+
+        self.assertEqual(JSONRenderer().render(serializer.data), golden)
+        rows = thread.messages.values("id", "sender_id", "content", "created_at")
+        self.assertEqual(JSONRenderer().render(render_messages(rows)), golden)
+        resp = self.client.get(reverse("chat-messages", args=[thread.id]))
+        self.assertEqual(JSONRenderer().render(resp.data["results"]), golden)
+
+
+class ChatConcurrencyTests(APITransactionTestCase):
+    def test_parallel_creates_make_one_thread(self):
+        buyer = User.objects.create_user(email="b@example.com", full_name="Buyer", password="p")
+        seller = User.objects.create_user(email="s@example.com", full_name="Seller", password="p")
+        workers = 8
+        barrier = threading.Barrier(workers)
+
+        def contact_seller(_):
+            barrier.wait()
+            try:
+                for _ in range(50):
+                    try:
+                        return ChatThread.objects.get_or_create_for_pair(buyer, seller)[1]
+                    except OperationalError:
+                        # The shared-cache in-memory SQLite test database reports
+                        # lock contention immediately instead of waiting.
+                        if connection.vendor != "sqlite":
+                            raise
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            created = list(pool.map(contact_seller, range(workers)))
+
+        self.assertEqual(ChatThread.objects.count(), 1)
+        self.assertEqual(sorted(created), [False] * (workers - 1) + [True])
+        thread = ChatThread.objects.get()
+        self.assertEqual(thread.participant_key, ChatThread.pair_key(seller.id, buyer.id))
+        self.assertEqual(thread.participants.count(), 2)
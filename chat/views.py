@@ -1,20 +1,30 @@
 from __future__ import annotations
 
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .models import ChatMessage, ChatThread
+from uyqidir_backend.async_views import AsyncReadMixin
+
+from .models import ChatMessage, ChatReadMarker, ChatThread
+from .pagination import MessageCursorPagination
 from .serializers import (
     ChatMessageSerializer,
+    ChatReadSerializer,
     ChatThreadCreateSerializer,
     ChatThreadSerializer,
 )
 
 
-class ChatThreadViewSet(viewsets.ModelViewSet):
-    """Manage chat threads for the authenticated user."""
+class ChatThreadViewSet(AsyncReadMixin, viewsets.ModelViewSet):
+    """Manage chat threads for the authenticated user.
+
+    ``amessages`` serves the message history GET under ASGI, see
+    ``uyqidir_backend/async_views.py``.
+    """
 
     serializer_class = ChatThreadSerializer
     permission_classes = [IsAuthenticated]
@@ -22,36 +32,67 @@ class ChatThreadViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False) or not self.request.user.is_authenticated:
             return ChatThread.objects.none()
-        return ChatThread.objects.filter(participants=self.request.user).prefetch_related(
-            "participants", "messages"
-        )
+        if self.action in {"list", "retrieve", "create"}:
+            return ChatThread.objects.for_inbox(self.request.user)
+        return ChatThread.objects.filter(participants=self.request.user)
 
     def create(self, request, *args, **kwargs):  # type: ignore[override]
         serializer = ChatThreadCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         other_user = serializer.validated_data["user"]
         ad = serializer.validated_data.get("ad")
-        thread = (
-            ChatThread.objects.filter(ad=ad)
-            .filter(participants=request.user)
-            .filter(participants=other_user)
-            .first()
-        )
-        created = False
-        if not thread:
-            thread = ChatThread.objects.create(ad=ad)
-            thread.participants.add(request.user, other_user)
-            created = True
-        data = ChatThreadSerializer(thread).data
+        thread, created = ChatThread.objects.get_or_create_for_pair(request.user, other_user, ad)
+        data = ChatThreadSerializer(self.get_queryset().get(pk=thread.pk)).data
         return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
-    @action(detail=True, methods=["get", "post"], serializer_class=ChatMessageSerializer)
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("after", OpenApiTypes.INT, description="Only messages newer than this ID."),
+            OpenApiParameter("before", OpenApiTypes.INT, description="Only messages older than this ID."),
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description=f"Page size, at most {MessageCursorPagination.max_limit}.",
+            ),
+        ]
+    )
+    @action(
+        detail=True,
+        methods=["get", "post"],
+        serializer_class=ChatMessageSerializer,
+        pagination_class=MessageCursorPagination,
+    )
     def messages(self, request, pk=None):
         thread = self.get_object()
         if request.method == "GET":
-            serializer = ChatMessageSerializer(thread.messages.all(), many=True)
-            return Response(serializer.data)
+            page = self.paginate_queryset(thread.messages.all())
+            serializer = ChatMessageSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = ChatMessageSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(thread=thread, sender=request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    async def amessages(self, request, pk=None):
+        thread = await self.aget_object()
+        page = await self.apaginate_queryset(thread.messages.all())
+        return self.get_paginated_response(ChatMessageSerializer(page, many=True).data)
+
+    @action(detail=True, methods=["post"], serializer_class=ChatReadSerializer)
+    def read(self, request, pk=None):
+        """Mark the thread as read up to ``message`` (default: the latest one)."""
+        thread = self.get_object()
+        serializer = ChatReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message_id = serializer.validated_data.get("message", thread.last_message_id)
+        if message_id is None:
+            return Response({"last_read_message": None})
+        if not thread.messages.filter(pk=message_id).exists():
+            return Response({"message": ["Message not found in this thread."]}, status=400)
+        marker, created = ChatReadMarker.objects.get_or_create(
+            thread=thread, user=request.user, defaults={"last_read_message_id": message_id}
+        )
+        if not created and (marker.last_read_message_id or 0) < message_id:
+            marker.last_read_message_id = message_id
+            marker.save(update_fields=["last_read_message", "updated_at"])
+        return Response({"last_read_message": marker.last_read_message_id})
@@ -1,10 +1,38 @@
-"""ASGI config for uyqidir_backend project."""
+"""ASGI config for uyqidir_backend project.
+
+HTTP requests go to Django and are resolved against
+``uyqidir_backend.async_urls``, which serves the hot read endpoints with
+async views (see ``uyqidir_backend.async_views``). WebSocket connections are
+served by the chat delivery app (see ``chat.realtime``).
+"""
 from __future__ import annotations
 
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.handlers.asgi import ASGIRequest
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "uyqidir_backend.settings")
+# Connections are per request thread under ASGI; see CONN_MAX_AGE in settings.
+os.environ.setdefault("CONN_MAX_AGE", "0")
+
+ASYNC_URLCONF = "uyqidir_backend.async_urls"
+
+
+class AsyncURLConfRequest(ASGIRequest):
+    """Request resolved against :data:`ASYNC_URLCONF` instead of ``ROOT_URLCONF``."""
+
+    urlconf = ASYNC_URLCONF
+
+
+django_application = get_asgi_application()
+django_application.request_class = AsyncURLConfRequest
+
+from chat.realtime import websocket_application  # noqa: E402  (needs configured apps)
+
 
-application = get_asgi_application()
+async def application(scope, receive, send) -> None:
+    if scope["type"] == "websocket":
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
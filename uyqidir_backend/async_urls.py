@@ -0,0 +1,39 @@
+"""URLconf of the ASGI app: async read endpoints ahead of the regular API.
+
+Selected per request by ``uyqidir_backend.asgi``; see
+``uyqidir_backend/async_views.py``.
+"""
+from __future__ import annotations
+
+from django.urls import path
+
+from ads.views import AdViewSet
+from chat.views import ChatThreadViewSet
+
+from .async_views import async_action
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("api/ads/", async_action(AdViewSet, "list", basename="ad", detail=False), name="ad-list"),
+    path(
+        "api/ads/stats/",
+        async_action(AdViewSet, "stats", basename="ad", detail=False),
+        name="ad-stats",
+    ),
+    path(
+        "api/ads/locations/",
+        async_action(AdViewSet, "locations", basename="ad", detail=False),
+        name="ad-locations",
+    ),
+    path(
+        "api/ads/<int:pk>/",
+        async_action(AdViewSet, "retrieve", basename="ad", detail=True),
+        name="ad-detail",
+    ),
+    path(
+        "api/chats/<int:pk>/messages/",
+        async_action(ChatThreadViewSet, "messages", basename="chat", detail=True),
+        name="chat-messages",
+    ),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,82 @@
+"""Async-native read endpoints for the ASGI app.
+
+Under ASGI a sync view holds a worker thread for the whole request, including
+every database round trip. ``uyqidir_backend.asgi`` resolves requests against
+``uyqidir_backend.async_urls``, which mounts :func:`async_action` views for
+the hot GET endpoints in front of the regular routes. Each one drives the
+same DRF viewset, so authentication, permissions, filters, serializers and
+error responses are shared, and awaits the viewset's ``a<action>`` method,
+which reads through the async ORM. Other methods on those URLs are handed to
+the regular view.
+"""
+from __future__ import annotations
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.urls import resolve
+from django.views.decorators.csrf import csrf_exempt
+
+READ_METHODS = ("GET", "HEAD")
+# Extended by ``async_urls``; serves every other method.
+SYNC_URLCONF = "uyqidir_backend.urls"
+
+
+class AsyncReadMixin:
+    """Async counterparts of the ``GenericAPIView`` helpers used by ``a<action>`` methods."""
+
+    async def afilter_queryset(self, queryset):
+        # Filter backends may read the database, e.g. django-filter checks
+        # ``ModelMultipleChoiceFilter`` choices while validating the query.
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+
+def async_action(viewset, action: str, **initkwargs):
+    """Serve GET and HEAD for ``viewset``'s ``action`` with its ``a<action>`` coroutine."""
+    actions = {"get": action, "head": action}
+    # Like the router, apply the ``@action`` overrides such as ``pagination_class``.
+    initkwargs = {**getattr(getattr(viewset, action), "kwargs", {}), **initkwargs}
+
+    async def view(request, *args, **kwargs):
+        if request.method not in READ_METHODS:
+            match = resolve(request.path_info, urlconf=SYNC_URLCONF)
+            return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+        self = viewset(**initkwargs)
+        self.action_map = actions
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            if "HTTP_AUTHORIZATION" in request.META:
+                # Resolving the token's user reads the database.
+                await sync_to_async(self.initial)(request, *args, **kwargs)
+            else:
+                self.initial(request, *args, **kwargs)
+            response = await getattr(self, f"a{action}")(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response, *args, **kwargs)
+
+    # Read by the request metrics middleware to tag the endpoint.
+    view.cls = viewset
+    view.actions = actions
+    view.initkwargs = initkwargs
+    return csrf_exempt(view)
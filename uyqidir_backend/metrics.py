@@ -0,0 +1,283 @@
+"""Per-request query and latency instrumentation.
+
+``RequestMetricsMiddleware`` counts SQL queries and measures database,
+serialization, rendering and total time of every request, tags it with the
+viewset action (``AdViewSet.list``, ``ChatThreadViewSet.messages``...), adds a
+``Server-Timing`` header and keeps a bounded window of samples per endpoint
+for the staff-only ``/api/metrics/requests/`` report. Samples live in process
+memory, so each worker reports its own traffic. Serialization is the time
+spent building serializer ``.data`` (less the queries it runs), measured by
+:func:`instrument_serializers`; rendering time is reported by
+``uyqidir_backend.renderers.TimedJSONRenderer``.
+
+Configured through ``settings.REQUEST_METRICS``::
+
+    {"ENABLED": True, "SAMPLES": 1000, "QUERY_BUDGETS": {"AdViewSet.list": 6}, "STRICT": False}
+
+When disabled the middleware removes itself at startup. Requests exceeding
+their ``QUERY_BUDGETS`` entry are logged, or raise
+:class:`QueryBudgetExceeded` with ``STRICT`` on, which tests can use to
+enforce budgets.
+"""
+from __future__ import annotations
+
+import logging
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import serializers
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLES = 1000
+UNTAGGED = "other"
+
+# Metrics of the request being handled, for the serializer hook.
+current_metrics: ContextVar[RequestMetrics | None] = ContextVar("current_metrics", default=None)
+
+
+def metrics_settings() -> dict:
+    return getattr(settings, "REQUEST_METRICS", {})
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request runs more queries than budgeted."""
+
+
+@dataclass
+class RequestMetrics:
+    """Measurements of a single request; doubles as a database execute wrapper."""
+
+    endpoint: str = UNTAGGED
+    queries: int = 0
+    db_ms: float = 0.0
+    serialize_ms: float = 0.0
+    render_ms: float = 0.0
+    total_ms: float = 0.0
+    serializing: bool = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+
+    @property
+    def app_ms(self) -> float:
+        """Time outside the database, serializers and renderer: view code and middleware."""
+        return max(self.total_ms - self.db_ms - self.serialize_ms - self.render_ms, 0.0)
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            [
+                f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"',
+                f"app;dur={self.app_ms:.1f}",
+                f"serialize;dur={self.serialize_ms:.1f}",
+                f"render;dur={self.render_ms:.1f}",
+                f"total;dur={self.total_ms:.1f}",
+            ]
+        )
+
+
+class MetricsRegistry:
+    """Bounded per-endpoint sample windows with percentile summaries."""
+
+    fields = ("total_ms", "db_ms", "app_ms", "serialize_ms", "render_ms", "queries")
+
+    def __init__(self) -> None:
+        self._samples: dict[str, deque] = defaultdict(self._window)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _window() -> deque:
+        return deque(maxlen=metrics_settings().get("SAMPLES", DEFAULT_SAMPLES))
+
+    def record(self, metrics: RequestMetrics) -> None:
+        sample = tuple(getattr(metrics, field) for field in self.fields)
+        with self._lock:
+            self._samples[metrics.endpoint].append(sample)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            samples = {endpoint: list(window) for endpoint, window in self._samples.items()}
+        return {
+            endpoint: {
+                "count": len(rows),
+                **{
+                    field: summarize([row[i] for row in rows])
+                    for i, field in enumerate(self.fields)
+                },
+            }
+            for endpoint, rows in sorted(samples.items())
+        }
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    if len(values) > 1:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = values[0]
+    return {
+        "p50": round(p50, 2),
+        "p95": round(p95, 2),
+        "p99": round(p99, 2),
+        "max": round(max(values), 2),
+    }
+
+
+registry = MetricsRegistry()
+
+
+def _timed_data(data: property) -> property:
+    getter = data.fget
+
+    def timed(serializer):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return getter(serializer)
+        metrics.serializing = True
+        db_ms, start = metrics.db_ms, time.perf_counter()
+        try:
+            return getter(serializer)
+        finally:
+            metrics.serializing = False
+            # Lazy relation loads are database time, counted once in ``db_ms``.
+            elapsed = (time.perf_counter() - start) * 1000
+            metrics.serialize_ms += max(elapsed - (metrics.db_ms - db_ms), 0.0)
+
+    timed.timed = True
+    return property(timed)
+
+
+def instrument_serializers() -> None:
+    """Time ``.data`` of every serializer built during a measured request."""
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, "timed", False):
+            cls.data = _timed_data(cls.data)
+
+
+def endpoint_name(view_func, method: str) -> str:
+    """Tag a view as ``<ViewSet>.<action>`` or ``<View>.<method>``."""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{cls.__name__}.{actions.get(method.lower(), method.lower())}"
+
+
+class RequestMetricsMiddleware:
+    """Record query count and timings of each request.
+
+    Runs natively in both handler modes so async views are not pushed back
+    onto a thread when metrics are on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        if not metrics_settings().get("ENABLED"):
+            raise MiddlewareNotUsed
+        instrument_serializers()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        request.request_metrics = metrics
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with self.wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(metrics, response, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        request.request_metrics = metrics
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        # Async ORM queries run on the request's sync thread, whose
+        # connections are separate from the event loop's.
+        wrappers = await sync_to_async(self.wrap_connections)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+            current_metrics.reset(token)
+        return self.finish(metrics, response, start)
+
+    @staticmethod
+    def wrap_connections(metrics: RequestMetrics) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def finish(self, metrics: RequestMetrics, response, start: float):
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        response["Server-Timing"] = metrics.server_timing()
+        response.request_metrics = metrics
+        registry.record(metrics)
+        self.check_budget(metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs) -> None:
+        request.request_metrics.endpoint = endpoint_name(view_func, request.method)
+
+    def check_budget(self, metrics: RequestMetrics) -> None:
+        config = metrics_settings()
+        budget = config.get("QUERY_BUDGETS", {}).get(metrics.endpoint)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = f"{metrics.endpoint} ran {metrics.queries} queries, budget is {budget}"
+        if config.get("STRICT"):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class RequestMetricsView(APIView):
+    """Percentiles of recorded request metrics per endpoint (staff only)."""
+
+    permission_classes = [IsAdminUser]
+    throttle_classes: list = []
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response(
+            {
+                "enabled": bool(metrics_settings().get("ENABLED")),
+                "endpoints": registry.snapshot(),
+            }
+        )
+
+    @extend_schema(responses={204: None})
+    def delete(self, request):
+        registry.reset()
+        return Response(status=204)
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer that reports its time to the request's metrics."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get("request")
+        metrics = getattr(request, "request_metrics", None)
+        if metrics is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            metrics.render_ms += (time.perf_counter() - start) * 1000
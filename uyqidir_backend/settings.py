@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 
 # Middleware
 MIDDLEWARE = [
+    "uyqidir_backend.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -71,7 +72,29 @@ WSGI_APPLICATION = "uyqidir_backend.wsgi.application"
 
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
-DATABASES = {"default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)}
+# The ASGI app runs each request's queries on a fresh thread, so it defaults
+# to 0 there: persistent connections would pile up instead of being reused.
+CONN_MAX_AGE = int(os.getenv("CONN_MAX_AGE", 600))
+DATABASES = {"default": dj_database_url.parse(DATABASE_URL, conn_max_age=CONN_MAX_AGE)}
+
+# Cache: local memory by default, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# with CACHE_LOCATION=redis://127.0.0.1:6379/1 in production.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "uyqidir"),
+    }
+}
+
+# Response cache for public ad/amenity reads, see ads/cache.py
+ADS_RESPONSE_CACHE = {
+    "ENABLED": os.getenv("ADS_RESPONSE_CACHE_ENABLED", "True") == "True",
+    "TIMEOUT": int(os.getenv("ADS_RESPONSE_CACHE_TIMEOUT", "60")),
+    # Endpoint names to skip, e.g. "ad-stats,amenity-list"
+    "BYPASS": [
+        e.strip() for e in os.getenv("ADS_RESPONSE_CACHE_BYPASS", "").split(",") if e.strip()
+    ],
+}
 
 # Authentication
 AUTH_USER_MODEL = "accounts.User"
@@ -100,7 +123,7 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
-    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+    "DEFAULT_RENDERER_CLASSES": ("uyqidir_backend.renderers.TimedJSONRenderer",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -110,7 +133,18 @@ REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_CLASSES": (
         "ads.throttles.AdPostRateThrottle",
     ),
-    "DEFAULT_THROTTLE_RATES": {"ad_post": "10/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "ad_post": os.getenv("AD_POST_RATE", "10/day"),
+        "agency_import": os.getenv("AGENCY_IMPORT_RATE", "50/day"),
+    },
+}
+
+# Per-request query and latency metrics, see uyqidir_backend/metrics.py
+REQUEST_METRICS = {
+    "ENABLED": os.getenv("REQUEST_METRICS", "False") == "True",
+    "SAMPLES": int(os.getenv("REQUEST_METRICS_SAMPLES", 1000)),
+    "QUERY_BUDGETS": {},
+    "STRICT": False,
 }
 
 # Simple JWT
@@ -139,6 +173,14 @@ CSRF_TRUSTED_ORIGINS = [o.strip() for o in csrf_origins.split(",") if o.strip()]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Ad image upload limits in bytes
+ADS_MAX_IMAGE_BYTES = int(os.getenv("ADS_MAX_IMAGE_BYTES", 10 * 1024 * 1024))
+ADS_MAX_REQUEST_IMAGE_BYTES = int(os.getenv("ADS_MAX_REQUEST_IMAGE_BYTES", 40 * 1024 * 1024))
+# Decoded base64 images larger than this are spooled to a temporary file.
+ADS_IMAGE_MEMORY_BYTES = int(os.getenv("ADS_IMAGE_MEMORY_BYTES", 512 * 1024))
+# JSON clients send images base64-encoded in the body (4/3 of the raw size).
+DATA_UPLOAD_MAX_MEMORY_SIZE = ADS_MAX_REQUEST_IMAGE_BYTES * 4 // 3 + 1024 * 1024
+
 # Optional S3 storage configuration
 if os.getenv("USE_S3") == "True":
     DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
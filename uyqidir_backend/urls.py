@@ -10,11 +10,14 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from .metrics import RequestMetricsView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("accounts.urls")),
     path("api/", include("ads.urls")),
     path("api/", include("chat.urls")),
+    path("api/metrics/requests/", RequestMetricsView.as_view(), name="request-metrics"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"